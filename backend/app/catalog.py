@@ -0,0 +1,154 @@
+"""Materialized machine/part catalog behind /metrics/machine-parts-history.
+
+MachinePart holds every distinct (machine, part) pair seen in report entries,
+rate standards or calculated metrics, with the machine's board display name
+(`normalize_machine_name`) computed once when the pair is first stored.
+
+Writers keep it current in their own transaction: uploads, manual entries,
+calculations and rate writes call `add_pairs`; deletes and edits that may
+remove the last row behind a pair call `prune_pairs`. Every change bumps the
+"machine_parts" DataVersion, which keys the endpoint's in-memory cache, so a
+worker serves from memory until any worker changes the catalog.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from .cache import TTLCache
+from .db import DataVersion, MachinePart, Oeemetric, RateEntry, ReportEntry
+
+CATALOG_VERSION = "machine_parts"
+
+# Keyed by catalog version, so entries never go stale; the TTL only frees memory
+machine_parts_cache = TTLCache("machine_parts", ttl_seconds=3600, max_entries=4)
+
+_CODED = re.compile(r'^(ASY|ASSY|INJ|CMP|INSP)\s*(\d+)$', re.IGNORECASE)
+_DISPLAY_PREFIX = {"asy": "Assy", "assy": "Assy", "inj": "Inj", "cmp": "Cmp", "insp": "Insp"}
+
+
+def normalize_machine_name(raw: str) -> str:
+    """Normalize coded machine names to match Production Board display names.
+    Examples: ASY01 -> Assy 1, INJ34 -> Inj 34, CMP09 -> Cmp 9, INSP1 -> Insp 1.
+    Display names map to themselves (Inj 34 -> Inj 34), so board input can be
+    normalized the same way.
+    """
+    raw = raw.strip()
+    m = _CODED.match(raw)
+    if m:
+        return f"{_DISPLAY_PREFIX[m.group(1).lower()]} {int(m.group(2))}"
+    return raw
+
+
+# ── Data versions ──
+
+def bump_version(session: Session, name: str):
+    """Increment a named data version in the caller's transaction."""
+    result = session.exec(update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1))
+    if result.rowcount == 0:
+        session.add(DataVersion(name=name, version=1))
+
+
+def read_version(session: Session, name: str) -> int:
+    return session.exec(select(DataVersion.version).where(DataVersion.name == name)).first() or 0
+
+
+# ── Catalog maintenance ──
+
+Pair = Tuple[Optional[str], Optional[str]]
+
+
+def _clean(pairs: Iterable[Pair]) -> set:
+    return {(m, p) for m, p in pairs if m and p and m.strip() and p.strip()}
+
+
+def add_pairs(session: Session, pairs: Iterable[Pair]) -> int:
+    """Store pairs not yet in the catalog (caller commits). Returns how many were new."""
+    pairs = _clean(pairs)
+    if not pairs:
+        return 0
+    parts = {p for _, p in pairs}
+    known = set(session.exec(
+        select(MachinePart.machine_raw, MachinePart.part_raw).where(MachinePart.part_raw.in_(parts))
+    ).all())
+    new = pairs - known
+    if new:
+        _insert_missing(session, [_row(machine, part) for machine, part in sorted(new)])
+        bump_version(session, CATALOG_VERSION)
+    return len(new)
+
+
+def _row(machine: str, part: str) -> dict:
+    return {"machine_raw": machine, "part_raw": part, "machine": normalize_machine_name(machine), "part_number": part.strip()}
+
+
+def _insert_missing(session: Session, rows: List[dict]):
+    """INSERT that skips pairs another transaction stored first, so two uploads
+    of the same pair don't fail each other."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            session.add(MachinePart(**row))
+        return
+    for i in range(0, len(rows), 500):
+        session.exec(insert(MachinePart).values(rows[i:i + 500]).on_conflict_do_nothing())
+
+
+def prune_pairs(session: Session, pairs: Iterable[Pair]) -> int:
+    """Drop pairs no longer backed by any entry, rate or metric. Call after the
+    deletes/edits are flushed, within the same transaction."""
+    pairs = _clean(pairs)
+    if not pairs:
+        return 0
+    session.flush()
+    parts = {p for _, p in pairs}
+    remaining = set()
+    for model in (ReportEntry, RateEntry, Oeemetric):
+        remaining.update(session.exec(
+            select(model.machine, model.part_number).where(model.part_number.in_(parts)).distinct()
+        ).all())
+    gone = pairs - remaining
+    for machine, part in gone:
+        session.exec(delete(MachinePart).where(MachinePart.machine_raw == machine, MachinePart.part_raw == part))
+    if gone:
+        bump_version(session, CATALOG_VERSION)
+    return len(gone)
+
+
+def rebuild_catalog(session: Session) -> int:
+    """Refill the catalog from the source tables (migration / repair)."""
+    from sqlalchemy import inspect
+    inspector = inspect(session.connection())
+    pairs = set()
+    for model in (Oeemetric, RateEntry, ReportEntry):
+        columns = {c["name"] for c in inspector.get_columns(model.__tablename__)}
+        if not {"machine", "part_number"} <= columns:
+            continue  # very old schema without these columns
+        pairs.update(session.exec(select(model.machine, model.part_number).distinct()).all())
+    pairs = _clean(pairs)
+    session.exec(delete(MachinePart))
+    for machine, part in pairs:
+        session.add(MachinePart(**_row(machine, part)))
+    bump_version(session, CATALOG_VERSION)
+    return len(pairs)
+
+
+def machine_parts(session: Session) -> Dict[str, List[str]]:
+    """Display machine name -> sorted parts, from memory unless the catalog changed."""
+    version = read_version(session, CATALOG_VERSION)
+    cached = machine_parts_cache.get(version)
+    if cached is not None:
+        return cached
+    history: Dict[str, List[str]] = {}
+    rows = session.exec(
+        select(MachinePart.machine, MachinePart.part_number).distinct().order_by(MachinePart.machine, MachinePart.part_number)
+    ).all()
+    for machine, part in rows:
+        history.setdefault(machine, []).append(part)
+    machine_parts_cache.set(version, history)
+    return history
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .engine_config import build_engine, build_async_engine
 
 # Robust Path Handling: Ensure DB file is always in `backend/` folder
 # independant of where the command is run from.
@@ -15,11 +17,12 @@ database_url = os.getenv("DATABASE_URL", f"sqlite:///{sqlite_file_name}")
 if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 
-connect_args = {}
-if database_url.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
+# Dialect-specific tuning (SQLite pragmas / Postgres pool) lives in engine_config
+engine = build_engine(database_url, echo=False)
 
-engine = create_engine(database_url, echo=False, connect_args=connect_args)
+# Async engine for read-only endpoints (analytics, weekly), so waiting on the
+# DB does not hold one of the threadpool's threads per viewer
+async_engine = build_async_engine(database_url, echo=False)
 
 def create_db_and_tables():
     """Create database tables based on SQLModel models."""
@@ -29,3 +32,8 @@ def get_session() -> Session:
     """Provide a new database session."""
     with Session(engine) as session:
         yield session
+
+async def get_async_session() -> AsyncSession:
+    """Provide a new async database session (read paths)."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime, date
 from typing import Optional, List
 
@@ -32,14 +33,50 @@ class RunMode(SQLModel, table=True):
     description: Optional[str] = None
     active: bool = Field(default=True)
 
+class Machine(SQLModel, table=True):
+    """Canonical machine; names in uploads resolve to it through its aliases (see app/machines.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(unique=True)        # machine_key() of the name it was registered under
+    display_name: str
+    machine_type: Optional[str] = None   # assembly, injection, compression, inspection
+    aliases: str = Field(default="[]")   # JSON list of alternative spellings
+
+class Operator(SQLModel, table=True):
+    """Interned operator name; spellings resolve to it by key or alias (see app/dimensions.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(unique=True)   # operator_key(): lower-case words in sorted order
+    name: str                       # display form, "First Last"
+
+class Part(SQLModel, table=True):
+    """Interned part number (see app/dimensions.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(unique=True)
+    name: str
+
+class Job(SQLModel, table=True):
+    """Interned job number (see app/dimensions.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(unique=True)
+    name: str
+
+class DimensionAlias(SQLModel, table=True):
+    """Extra key that resolves to an operator, part or job (e.g. after merging two spellings)."""
+    kind: str = Field(primary_key=True)  # operator, part, job
+    key: str = Field(primary_key=True)
+    target_id: int
+
 class RateEntry(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     run_mode_id: int = Field(default=1, foreign_key="runmode.id") # Default to STANDARD
 
     operator: Optional[str] = Field(default=None, index=True)
+    operator_id: Optional[int] = Field(default=None, foreign_key="operator.id", index=True)
     machine: Optional[str] = Field(default=None, index=True)
+    machine_id: Optional[int] = Field(default=None, foreign_key="machine.id", index=True)
     part_number: Optional[str] = Field(default=None, index=True)
+    part_id: Optional[int] = Field(default=None, foreign_key="part.id", index=True)
     job: Optional[str] = Field(default=None, index=True)
+    job_id: Optional[int] = Field(default=None, foreign_key="job.id", index=True)
     ideal_units_per_hour: Optional[float] = None
     ideal_cycle_time_seconds: Optional[float] = None
     start_date: date
@@ -76,18 +113,22 @@ class ProductionReport(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     filename: str
     uploaded_by: Optional[int] = Field(default=None, foreign_key="user.id")
-    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    uploaded_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 class ReportEntry(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    report_id: int = Field(foreign_key="productionreport.id")
+    report_id: int = Field(foreign_key="productionreport.id", index=True)
     run_mode_id: int = Field(default=1, foreign_key="runmode.id") # Default to STANDARD
 
     date: date
     operator: Optional[str] = None
+    operator_id: Optional[int] = Field(default=None, foreign_key="operator.id", index=True)
     machine: Optional[str] = None
+    machine_id: Optional[int] = Field(default=None, foreign_key="machine.id", index=True)
     part_number: Optional[str] = None
+    part_id: Optional[int] = Field(default=None, foreign_key="part.id", index=True)
     job: Optional[str] = None
+    job_id: Optional[int] = Field(default=None, foreign_key="job.id", index=True)
     planned_production_time_min: Optional[float] = None
     run_time_min: Optional[float] = None
     downtime_min: Optional[float] = None
@@ -100,11 +141,15 @@ class ReportEntry(SQLModel, table=True):
 
 class Oeemetric(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    report_id: int = Field(foreign_key="productionreport.id")
+    report_id: int = Field(foreign_key="productionreport.id", index=True)
     operator: Optional[str] = None
+    operator_id: Optional[int] = Field(default=None, foreign_key="operator.id", index=True)
     machine: Optional[str] = None
+    machine_id: Optional[int] = Field(default=None, foreign_key="machine.id", index=True)
     part_number: Optional[str] = None
+    part_id: Optional[int] = Field(default=None, foreign_key="part.id", index=True)
     job: Optional[str] = None
+    job_id: Optional[int] = Field(default=None, foreign_key="job.id", index=True)
     shift: Optional[str] = None
     date: date
     availability: Optional[float] = None
@@ -113,6 +158,68 @@ class Oeemetric(SQLModel, table=True):
     oee: Optional[float] = None
     confidence: Optional[str] = None
     diagnostics_json: Optional[str] = None
+    # Volumes/times also kept in diagnostics_json, as columns so SQL can aggregate them
+    good_count: Optional[int] = None
+    reject_count: Optional[int] = None
+    run_time_min: Optional[float] = None
+    downtime_min: Optional[float] = None
+    excluded: bool = Field(default=False, index=True)  # operator matches an excluded_operators pattern (app/operators.py)
+
+    # Declared here: a Field() default on `date` would shadow the type annotation
+    __table_args__ = (Index("ix_oeemetric_date", "date"),)
+
+class WeekVersion(SQLModel, table=True):
+    """Bumped whenever metrics in the ISO week starting `week_start` change."""
+    week_start: date = Field(primary_key=True)
+    version: int = Field(default=0)
+
+class WeeklySnapshot(SQLModel, table=True):
+    """Frozen /weekly/summary payload of a closed week, valid while `version` matches WeekVersion."""
+    week_start: date = Field(primary_key=True)
+    shift: str = Field(primary_key=True)  # "All" or a shift name
+    version: int
+    payload: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class BoardRecord(SQLModel, table=True):
+    """One piece of Production Board state (a machine card, a machine's operator
+    for one shift, one shift's notes, a category, the board layout)."""
+    kind: str = Field(primary_key=True)  # board, category, machine, machine_shift, notes
+    key: str = Field(primary_key=True)
+    data: str = Field(default="{}")      # JSON object
+    version: int = Field(default=1)      # per record, for optimistic concurrency
+    revision: int = Field(default=0, index=True)  # board-wide change counter at last write
+    deleted: bool = Field(default=False)
+    updated_by: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class DataVersion(SQLModel, table=True):
+    """Change counter for a derived dataset (e.g. "machine_parts"); keys in-memory caches."""
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+class MachinePart(SQLModel, table=True):
+    """Distinct machine/part pairs seen in entries, rates and metrics (see app/catalog.py)."""
+    machine_raw: str = Field(primary_key=True)   # as stored in the source tables
+    part_raw: str = Field(primary_key=True)
+    machine: str = Field(index=True)             # board display name
+    part_number: str
+
+class OperatorSkill(SQLModel, table=True):
+    """Per board machine x part x operator run totals from calculated metrics (see app/skills.py)."""
+    machine: str = Field(primary_key=True)
+    part_number: str = Field(primary_key=True)
+    operator: str = Field(primary_key=True)
+    runs: int = Field(default=0)
+    oee_sum: float = Field(default=0.0)
+    quality_sum: float = Field(default=0.0)
+
+class ChangeEvent(SQLModel, table=True):
+    """Outbox of small change notifications streamed by /events (see app/events.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    type: str            # board, report_calculated, report_deleted, rates_changed
+    payload: str         # JSON object
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 class Setting(SQLModel, table=True):
     key: str = Field(primary_key=True)
@@ -0,0 +1,199 @@
+"""Interned operator, part and job dimensions.
+
+Entries, rates and metrics keep their free-text operator, part number and
+job for display and export, and also reference an Operator, Part and Job row
+by integer id (operator_id, part_id, job_id). Writers resolve the texts in
+one batch per upload or calculation with `assign_dimensions`:
+
+- a text reduces to a key: operators to their lower-case words in sorted
+  order ("Brown,Shirley" and "Shirley Brown" -> "brown shirley"), parts and
+  jobs to upper case with whitespace collapsed;
+- the key is looked up in the dimension table, then in DimensionAlias
+  (spellings an admin attached with POST /dimensions/{kind}/{id}/aliases);
+- unknown keys are inserted, skipping rows another writer inserted first.
+
+Analytics then group by the ids and join names only for the rows they return.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from .db import DimensionAlias, Job, Oeemetric, Operator, Part, RateEntry, ReportEntry
+
+# Placeholders written by uploads and rate sheets, not real operators
+_OPERATOR_PLACEHOLDERS = {"", "unknown", "any", "new operator"}
+
+
+def operator_key(raw: Optional[str]) -> str:
+    words = re.findall(r"[a-z0-9]+", (raw or "").lower())
+    key = " ".join(sorted(words))
+    return "" if key in _OPERATOR_PLACEHOLDERS else key
+
+
+def operator_name(raw: str) -> str:
+    """Display form: "Brown,Shirley" -> "Shirley Brown". Names that start with
+    a badge number ("2765 Carter, Evan") keep their order."""
+    raw = " ".join(raw.split())
+    if raw.count(",") == 1 and not raw[0].isdigit():
+        last, first = (p.strip() for p in raw.split(","))
+        if last and first:
+            return f"{first} {last}"
+    return raw
+
+
+def code_key(raw: Optional[str]) -> str:
+    key = " ".join((raw or "").upper().split())
+    return "" if key in ("UNKNOWN", "NAN") else key
+
+
+def code_name(raw: str) -> str:
+    return " ".join(raw.split())
+
+
+class Dimension:
+    def __init__(self, kind: str, model, attr: str, id_attr: str, key_fn, name_fn):
+        self.kind = kind
+        self.model = model
+        self.attr = attr        # text column on the fact tables
+        self.id_attr = id_attr  # id column on the fact tables
+        self.key = key_fn
+        self.name = name_fn
+
+
+DIMENSIONS: Dict[str, Dimension] = {
+    "operator": Dimension("operator", Operator, "operator", "operator_id", operator_key, operator_name),
+    "part": Dimension("part", Part, "part_number", "part_id", code_key, code_name),
+    "job": Dimension("job", Job, "job", "job_id", code_key, code_name),
+}
+
+FACT_MODELS = (ReportEntry, RateEntry, Oeemetric)
+
+
+def _insert_ignore(session: Session, model, rows: List[dict]):
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            session.add(model(**row))
+        session.flush()
+        return
+    for i in range(0, len(rows), 500):
+        session.exec(insert(model).values(rows[i:i + 500]).on_conflict_do_nothing(index_elements=["key"]))
+
+
+def _lookup(session: Session, dim: Dimension, keys: List[str]) -> Dict[str, int]:
+    found: Dict[str, int] = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        found.update(session.exec(select(dim.model.key, dim.model.id).where(dim.model.key.in_(chunk))).all())
+        missing = [k for k in chunk if k not in found]
+        if missing:
+            found.update(session.exec(
+                select(DimensionAlias.key, DimensionAlias.target_id)
+                .where(DimensionAlias.kind == dim.kind, DimensionAlias.key.in_(missing))
+            ).all())
+    return found
+
+
+def lookup(session: Session, kind: str, raws: Iterable[Optional[str]]) -> Dict[str, int]:
+    """Raw text -> dimension id for texts already registered (read only)."""
+    dim = DIMENSIONS[kind]
+    keys = {raw: dim.key(raw) for raw in set(raws)}
+    ids = _lookup(session, dim, sorted({k for k in keys.values() if k}))
+    return {raw: ids[key] for raw, key in keys.items() if key in ids}
+
+
+def resolve(session: Session, kind: str, raws: Iterable[Optional[str]]) -> Dict[str, int]:
+    """Raw text -> dimension id for every non-placeholder text, registering new
+    ones (caller commits)."""
+    dim = DIMENSIONS[kind]
+    raws = set(raws)
+    by_key: Dict[str, str] = {}
+    for raw in raws:
+        key = dim.key(raw)
+        if key:
+            by_key.setdefault(key, raw)
+    if not by_key:
+        return {}
+    ids = _lookup(session, dim, sorted(by_key))
+    new = [{"key": k, "name": dim.name(by_key[k])} for k in sorted(by_key) if k not in ids]
+    if new:
+        _insert_ignore(session, dim.model, new)
+        ids.update(_lookup(session, dim, [row["key"] for row in new]))
+    result = {}
+    for raw in raws:
+        key = dim.key(raw)
+        if key in ids:
+            result[raw] = ids[key]
+    return result
+
+
+def assign_dimensions(session: Session, rows: List, kinds: Iterable[str] = ("operator", "part", "job")):
+    """Set operator_id / part_id / job_id on entries, rates or metrics from
+    their text columns, with one lookup per dimension."""
+    for kind in kinds:
+        dim = DIMENSIONS[kind]
+        ids = resolve(session, kind, (getattr(r, dim.attr) for r in rows))
+        for r in rows:
+            setattr(r, dim.id_attr, ids.get(getattr(r, dim.attr)))
+
+
+def dimension_names(session: Session, kind: str, ids: Iterable[int]) -> Dict[int, str]:
+    model = DIMENSIONS[kind].model
+    ids = [i for i in set(ids) if i is not None]
+    if not ids:
+        return {}
+    return dict(session.exec(select(model.id, model.name).where(model.id.in_(ids))).all())
+
+
+def add_aliases(session: Session, kind: str, target_id: int, names: List[str]) -> List[int]:
+    """Make `names` resolve to `target_id`. A name that already has its own row
+    is merged: facts move to the target and the row becomes an alias. Returns
+    the merged ids (caller commits)."""
+    dim = DIMENSIONS[kind]
+    merged = []
+    for raw in names:
+        key = dim.key(raw)
+        if not key:
+            continue
+        existing = session.exec(select(dim.model).where(dim.model.key == key)).first()
+        if existing is not None and existing.id != target_id:
+            for model in FACT_MODELS:
+                column = getattr(model, dim.id_attr)
+                session.exec(update(model).where(column == existing.id).values({dim.id_attr: target_id}))
+            session.exec(update(DimensionAlias).where(DimensionAlias.kind == kind, DimensionAlias.target_id == existing.id)
+                         .values(target_id=target_id))
+            session.delete(existing)
+            session.flush()
+            merged.append(existing.id)
+        if existing is None or existing.id != target_id:
+            alias = session.get(DimensionAlias, (kind, key))
+            if alias is None:
+                session.add(DimensionAlias(kind=kind, key=key, target_id=target_id))
+            else:
+                alias.target_id = target_id
+                session.add(alias)
+    return merged
+
+
+def backfill_dimensions(session: Session, table: str, columns: List[str]) -> int:
+    """Link existing rows of a fact table to the dimensions (migration)."""
+    from sqlalchemy import text
+    linked = 0
+    for dim in DIMENSIONS.values():
+        if dim.attr not in columns:
+            continue
+        raws = [r for (r,) in session.exec(text(
+            f"SELECT DISTINCT {dim.attr} FROM {table} WHERE {dim.id_attr} IS NULL AND {dim.attr} IS NOT NULL"
+        )).all()]
+        ids = resolve(session, dim.kind, raws)
+        if ids:
+            session.exec(text(f"UPDATE {table} SET {dim.id_attr} = :id WHERE {dim.attr} = :raw AND {dim.id_attr} IS NULL"),
+                         params=[{"id": i, "raw": raw} for raw, i in ids.items()])
+            linked += len(ids)
+    return linked
@@ -0,0 +1,137 @@
+"""Per-dialect engine settings, read from the environment.
+
+Both the sync engine (routers using Session) and the async engine (read-only
+analytics/weekly endpoints) are built here with the same settings.
+
+SQLite (local): WAL so upload commits don't block dashboard readers, plus
+synchronous/busy_timeout/mmap/cache pragmas applied on every new connection.
+Postgres (Render): a sized pool with pre-ping and recycle, so connections
+dropped while the service idles are replaced instead of failing a request.
+"""
+import os
+from typing import Any, Dict
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def sqlite_settings() -> Dict[str, Any]:
+    return {
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "mmap_size": _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        # Negative = size in KiB (here 64 MiB) rather than pages
+        "cache_size": _env_int("SQLITE_CACHE_SIZE", -64000),
+    }
+
+
+def postgres_settings() -> Dict[str, Any]:
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def _apply_sqlite_pragmas(engine, settings: Dict[str, Any]):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            # journal_mode is persistent in the file; the rest are per connection
+            cursor.execute(f"PRAGMA journal_mode={settings['journal_mode']}")
+            cursor.execute(f"PRAGMA synchronous={settings['synchronous']}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings['busy_timeout'])}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings['mmap_size'])}")
+            cursor.execute(f"PRAGMA cache_size={int(settings['cache_size'])}")
+        finally:
+            cursor.close()
+
+
+def build_engine(database_url: str, echo: bool = False):
+    """Create the engine for `database_url` with the tuning for its dialect."""
+    if database_url.startswith("sqlite"):
+        settings = sqlite_settings()
+        engine = create_engine(
+            database_url, echo=echo,
+            connect_args={"check_same_thread": False, "timeout": settings["busy_timeout"] / 1000},
+        )
+        _apply_sqlite_pragmas(engine, settings)
+    elif database_url.startswith("postgresql"):
+        settings = postgres_settings()
+        engine = create_engine(database_url, echo=echo, **settings)
+    else:
+        settings = {}
+        engine = create_engine(database_url, echo=echo)
+    engine.info = {"configured": settings}
+    return engine
+
+
+def async_database_url(database_url: str):
+    """Map a sync URL to its async driver: aiosqlite locally, asyncpg on Postgres.
+    Returns (url, connect_args); asyncpg takes ssl as an argument, not sslmode."""
+    url = make_url(database_url)
+    connect_args: Dict[str, Any] = {}
+    if url.drivername.startswith("sqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif url.drivername.startswith("postgresql"):
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = "require"
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    return url, connect_args
+
+
+def build_async_engine(database_url: str, echo: bool = False):
+    """Async counterpart of build_engine, with the same per-dialect tuning."""
+    url, connect_args = async_database_url(database_url)
+    if url.drivername.startswith("sqlite"):
+        settings = sqlite_settings()
+        connect_args["timeout"] = settings["busy_timeout"] / 1000
+        engine = create_async_engine(url, echo=echo, connect_args=connect_args)
+        _apply_sqlite_pragmas(engine.sync_engine, settings)
+    else:
+        settings = postgres_settings()
+        engine = create_async_engine(url, echo=echo, connect_args=connect_args, **settings)
+    engine.sync_engine.info = {"configured": settings}
+    return engine
+
+
+def effective_settings(engine) -> Dict[str, Any]:
+    """Configured settings plus what the database/pool actually report."""
+    info: Dict[str, Any] = {
+        "dialect": engine.dialect.name,
+        "configured": getattr(engine, "info", {}).get("configured", {}),
+    }
+    if engine.dialect.name == "sqlite":
+        actual = {}
+        with engine.connect() as conn:
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size"):
+                actual[pragma] = conn.execute(text(f"PRAGMA {pragma}")).scalar()
+        info["actual"] = actual
+    else:
+        pool = engine.pool
+        info["pool"] = {
+            "class": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return info
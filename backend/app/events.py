@@ -0,0 +1,208 @@
+"""Change events pushed to clients over /events (server-sent events).
+
+Writers call `publish(session, type, data)` inside their transaction, so the
+event is stored as a ChangeEvent row and commits or rolls back together with
+the change itself. Once the session commits, the in-process `broadcaster` is
+woken and fans the new rows out to every stream connected to this worker.
+Other workers see the rows on their next poll (EVENTS_POLL_SECONDS), so
+multi-worker deployments get the same events without a message bus, just a
+little later.
+
+Each worker runs one poll query per interval while it has listeners, however
+many tablets are connected. Events are small: they say what changed (board
+records with their versions, a report id, part numbers), and clients re-fetch
+only that.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import delete, event as sa_event, or_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import ChangeEvent
+from .metrics_export import EVENT_STREAMS
+
+EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", "2"))
+EVENTS_RETENTION_HOURS = float(os.environ.get("EVENTS_RETENTION_HOURS", "24"))
+# Comment line sent on idle streams so proxies don't close them
+EVENTS_KEEPALIVE_SECONDS = float(os.environ.get("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Events a slow client may fall behind by before it is told to resync
+SUBSCRIBER_QUEUE = 256
+# How long an id skipped by a concurrent, not yet committed insert is retried
+GAP_GRACE_SECONDS = 10.0
+PRUNE_EVERY_SECONDS = 600.0
+
+# Sent to a subscriber that fell too far behind: re-fetch everything
+RESYNC = {"id": None, "type": "resync", "data": {}}
+
+
+def event_dict(row: ChangeEvent) -> Dict[str, Any]:
+    return {"id": row.id, "type": row.type, "data": json.loads(row.payload)}
+
+
+def publish(session: Session, type: str, data: Dict[str, Any]):
+    """Record a change event in the caller's transaction (caller commits)."""
+    session.add(ChangeEvent(type=type, payload=json.dumps(data, default=str)))
+    if not sa_event.contains(session, "after_commit", _wake_after_commit):
+        sa_event.listen(session, "after_commit", _wake_after_commit)
+
+
+def _wake_after_commit(session):
+    broadcaster.wake()
+
+
+async def fetch_events(engine, after_id: int, gaps=(), limit: int = 500) -> List[ChangeEvent]:
+    condition = ChangeEvent.id > after_id
+    if gaps:
+        condition = or_(condition, ChangeEvent.id.in_(list(gaps)))
+    async with AsyncSession(engine) as session:
+        return (await session.exec(select(ChangeEvent).where(condition).order_by(ChangeEvent.id).limit(limit))).all()
+
+
+class Broadcaster:
+    """One DB poller per worker, fanning events out to per-connection queues."""
+
+    def __init__(self, poll_seconds: float = EVENTS_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.engine = None  # AsyncEngine; app.database.async_engine unless set
+        self.last_id: Optional[int] = None
+        self._gaps: Dict[int, float] = {}  # id -> first time it was missing
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at = 0.0
+
+    def _engine(self):
+        if self.engine is None:
+            from .database import async_engine
+            return async_engine
+        return self.engine
+
+    def wake(self):
+        """Poll now instead of at the next interval. Safe from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # loop shut down meanwhile
+
+    def subscribe(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # First listener on this loop (or the poller stopped): start polling from here
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._subscribers = set()
+            self._gaps = {}
+            self._task = loop.create_task(self._run())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._wake is not None:
+            self._wake.set()  # let the poller notice and stop
+
+    async def latest_id(self) -> int:
+        from sqlalchemy import func
+        async with AsyncSession(self._engine()) as session:
+            return (await session.exec(select(func.max(ChangeEvent.id)))).one() or 0
+
+    def _deliver(self, item: Dict[str, Any]):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def poll(self):
+        """Fetch events newer than the last one delivered and fan them out."""
+        now = time.monotonic()
+        self._gaps = {i: t for i, t in self._gaps.items() if now - t < GAP_GRACE_SECONDS}
+        rows = await fetch_events(self._engine(), self.last_id or 0, self._gaps)
+        for row in rows:
+            if row.id in self._gaps:
+                del self._gaps[row.id]
+            elif row.id > self.last_id + 1:
+                # Ids in between may belong to transactions that have not committed yet
+                for missing in range(self.last_id + 1, min(row.id, self.last_id + 1 + SUBSCRIBER_QUEUE)):
+                    self._gaps.setdefault(missing, now)
+            self.last_id = max(self.last_id, row.id)
+            self._deliver(event_dict(row))
+
+    async def prune(self):
+        cutoff = datetime.utcnow() - timedelta(hours=EVENTS_RETENTION_HOURS)
+        async with AsyncSession(self._engine()) as session:
+            await session.exec(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff))
+            await session.commit()
+
+    async def _run(self):
+        self.last_id = await self.latest_id()
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._subscribers:
+                break
+            try:
+                await self.poll()
+                if time.monotonic() - self._pruned_at > PRUNE_EVERY_SECONDS:
+                    self._pruned_at = time.monotonic()
+                    await self.prune()
+            except Exception as e:
+                # Keep streams open through a DB hiccup; the next poll retries
+                print(f"Event poll failed: {e}")
+
+
+broadcaster = Broadcaster()
+
+
+def format_sse(item: Dict[str, Any]) -> str:
+    lines = []
+    if item.get("id") is not None:
+        lines.append(f"id: {item['id']}")
+    lines.append(f"event: {item['type']}")
+    lines.append(f"data: {json.dumps(item['data'], default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(after_id: Optional[int] = None):
+    """SSE body for one client. With `after_id` (the Last-Event-ID a
+    reconnecting EventSource sends) missed events are replayed first."""
+    queue = broadcaster.subscribe()
+    EVENT_STREAMS.inc()
+    try:
+        yield "retry: 5000\n\n"
+        replayed = set()
+        if after_id is not None:
+            rows = await fetch_events(broadcaster._engine(), after_id)
+            if len(rows) >= 500:
+                yield format_sse(RESYNC)
+            else:
+                for row in rows:
+                    replayed.add(row.id)
+                    yield format_sse(event_dict(row))
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item["id"] in replayed:
+                continue
+            yield format_sse(item)
+    finally:
+        EVENT_STREAMS.dec()
+        broadcaster.unsubscribe(queue)
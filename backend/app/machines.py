@@ -0,0 +1,108 @@
+"""Canonical machine registry.
+
+Machine names arrive in many spellings ("INJ34", "Inj 34", "Inj34", "600T
+Comp"). Each Machine row has a display name, a machine type and a list of
+aliases; `machine_key` reduces any spelling to a comparison key (board
+display form, upper-cased, without spaces or punctuation), and every key of
+the display name and aliases resolves to the machine id.
+
+Uploads and rate writes resolve names once through a `MachineRegistry` and
+store `machine_id` on ReportEntry, RateEntry and Oeemetric, so rate matching
+and grouping compare integers. Unknown names register a new machine with the
+type guessed from its name; an admin can later rename it, add aliases or
+merge duplicates (see routers/machines.py).
+"""
+import json
+import re
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from .catalog import normalize_machine_name
+from .db import Machine
+
+MACHINE_TYPES = ("assembly", "injection", "compression", "inspection")
+
+
+def machine_key(raw: Optional[str]) -> str:
+    if not raw:
+        return ""
+    return re.sub(r"[^A-Z0-9]", "", normalize_machine_name(raw).upper())
+
+
+def infer_machine_type(name: str) -> Optional[str]:
+    lowered = normalize_machine_name(name).lower()
+    if lowered.startswith("assy") or "asy" in lowered or "assembly" in lowered:
+        return "assembly"
+    if lowered.startswith("inj") or "injection" in lowered:
+        return "injection"
+    if lowered.startswith("cmp") or "comp" in lowered:
+        return "compression"
+    if lowered.startswith("insp"):
+        return "inspection"
+    return None
+
+
+def machine_aliases(machine: Machine) -> List[str]:
+    try:
+        return json.loads(machine.aliases or "[]")
+    except ValueError:
+        return []
+
+
+class MachineRegistry:
+    """Name -> machine id lookups for one unit of work (an upload, a calculation).
+    Loads the whole registry once; it is small."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.ids: Dict[str, int] = {}
+        self.types: Dict[int, Optional[str]] = {}
+        self.names: Dict[int, str] = {}
+        for machine in session.exec(select(Machine)).all():
+            self._index(machine)
+
+    def _index(self, machine: Machine):
+        self.types[machine.id] = machine.machine_type
+        self.names[machine.id] = machine.display_name
+        for name in [machine.key, machine.display_name, *machine_aliases(machine)]:
+            key = machine_key(name)
+            if key:
+                self.ids.setdefault(key, machine.id)
+
+    def lookup(self, raw: Optional[str]) -> Optional[int]:
+        return self.ids.get(machine_key(raw))
+
+    def resolve(self, raw: Optional[str]) -> Optional[int]:
+        """Machine id for a raw name, registering unknown machines (caller commits)."""
+        key = machine_key(raw)
+        if not key:
+            return None
+        if key not in self.ids:
+            self._register(raw.strip(), key)
+        return self.ids[key]
+
+    def _register(self, raw: str, key: str):
+        row = {
+            "key": key,
+            "display_name": normalize_machine_name(raw),
+            "machine_type": infer_machine_type(raw),
+            "aliases": json.dumps([raw]),
+        }
+        dialect = self.session.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            # Another upload may register the same machine concurrently
+            self.session.exec(insert(Machine).values(row).on_conflict_do_nothing(index_elements=["key"]))
+        else:
+            self.session.add(Machine(**row))
+            self.session.flush()
+        machine = self.session.exec(select(Machine).where(Machine.key == key)).one()
+        self._index(machine)
+        self.ids[key] = machine.id
+
+    def same_type(self, a: Optional[int], b: Optional[int]) -> bool:
+        return self.types.get(a) == self.types.get(b)
@@ -1,11 +1,13 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlmodel import Session, select
-from .database import create_db_and_tables, engine
+from .database import engine, async_engine
 from .db import RateEntry, User, RunMode, AuditLog
-from .seeds import get_seed_rates, get_seed_users
+from .migrations import run_migrations, current_version, latest_version
+from .perf import PerfMiddleware, instrument_engine, perf_summary
 
-from .routers import rates, reports, metrics, auth, settings, analytics, weekly
+from .routers import rates, reports, metrics, auth, settings, analytics, weekly, board, events, machines, dimensions
 
 import os
 app = FastAPI(title="OEE Analytics API", version="1.1.6")
@@ -13,178 +15,8 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey-dev-only")
 
 @app.on_event("startup")
 def on_startup():
-    # Schema Migration Check for "job" column
-    from sqlalchemy import inspect, text
-    try:
-        insp = inspect(engine)
-        if insp.has_table("reportentry"):
-            cols = [c["name"] for c in insp.get_columns("reportentry")]
-            if "job" not in cols:
-                print("DETECTED OLD SCHEMA (Missing 'job'). Dropping tables to rebuild...")
-                with Session(engine) as session:
-                    # Drop in dependency order (metrics -> entries -> reports) usually,
-                    # but sqlite foreign keys might be off or cascading.
-                    # Safest to just hammer them.
-                    session.exec(text("DROP TABLE IF EXISTS oeemetric"))
-                    session.exec(text("DROP TABLE IF EXISTS reportentry"))
-                    session.exec(text("DROP TABLE IF EXISTS productionreport"))
-                    session.commit()
-                print("Tables dropped. Re-creating...")
-    except Exception as e:
-        print(f"Migration check failed: {e}")
-
-    # Schema Migration Check for "RateEntry" (Cavity Count / Entry Mode)
-    try:
-        print("STARTUP: Checking Schema for Cavity Columns...")
-        insp = inspect(engine)
-        if insp.has_table("rateentry"):
-            cols = [c["name"] for c in insp.get_columns("rateentry")]
-            with Session(engine) as session:
-                if "cavity_count" not in cols:
-                    print("Migrating RateEntry: Adding 'cavity_count'...")
-                    session.exec(text("ALTER TABLE rateentry ADD COLUMN cavity_count INTEGER DEFAULT 1"))
-                    session.commit()
-                if "entry_mode" not in cols:
-                    print("Migrating RateEntry: Adding 'entry_mode'...")
-                    session.exec(text("ALTER TABLE rateentry ADD COLUMN entry_mode VARCHAR DEFAULT 'seconds'"))
-                    session.commit()
-                if "machine_cycle_time" not in cols:
-                    print("Migrating RateEntry: Adding 'machine_cycle_time'...")
-                    session.exec(text("ALTER TABLE rateentry ADD COLUMN machine_cycle_time FLOAT"))
-                    session.commit()
-    except Exception as e:
-        print(f"RateEntry Migration check failed: {e}")
-
-    # Schema Migration Check for "User" (is_pro, role, shift_scope)
-    try:
-        insp = inspect(engine)
-        if insp.has_table("user"):
-            cols = [c["name"] for c in insp.get_columns("user")]
-            with Session(engine) as session:
-                if "is_pro" not in cols:
-                    print("Migrating User: Adding 'is_pro'...")
-                    session.exec(text("ALTER TABLE \"user\" ADD COLUMN is_pro BOOLEAN DEFAULT 0"))
-                    session.commit()
-                if "role" not in cols:
-                    print("Migrating User: Adding 'role'...")
-                    session.exec(text("ALTER TABLE \"user\" ADD COLUMN role VARCHAR DEFAULT 'viewer'"))
-                    session.commit()
-                if "shift_scope" not in cols:
-                    print("Migrating User: Adding 'shift_scope'...")
-                    session.exec(text("ALTER TABLE \"user\" ADD COLUMN shift_scope VARCHAR"))
-                    session.commit()
-                if "allowed_pages" not in cols:
-                    print("Migrating User: Adding 'allowed_pages'...")
-                    session.exec(text("ALTER TABLE \"user\" ADD COLUMN allowed_pages TEXT"))
-                    session.commit()
-    except Exception as e:
-        print(f"User Migration check failed: {e}")
-
-    # Schema Migration Check for "ReportEntry" (downtime_events)
-    try:
-        insp = inspect(engine)
-        if insp.has_table("reportentry"):
-            cols = [c["name"] for c in insp.get_columns("reportentry")]
-            if "downtime_events" not in cols:
-                print("Migrating ReportEntry: Adding 'downtime_events'...")
-                with Session(engine) as session:
-                    # SQLite TEXT fits JSON string
-                    session.exec(text("ALTER TABLE reportentry ADD COLUMN downtime_events TEXT"))
-                    session.commit()
-    except Exception as e:
-        print(f"ReportEntry Migration check failed: {e}")
-
-    # Schema Migration Check for "OeeMetric" (diagnostics_json)
-    try:
-        insp = inspect(engine)
-        if insp.has_table("oeemetric"):
-            cols = [c["name"] for c in insp.get_columns("oeemetric")]
-            if "diagnostics_json" not in cols:
-                print("Migrating OeeMetric: Adding 'diagnostics_json'...")
-                with Session(engine) as session:
-                    session.exec(text("ALTER TABLE oeemetric ADD COLUMN diagnostics_json TEXT"))
-                    session.commit()
-    except Exception as e:
-        print(f"OeeMetric Migration check failed: {e}")
-
-    # Schema Migration Check for "RunMode" (Table and Columns)
-    try:
-        insp = inspect(engine)
-        
-        # 0. Ensure Tables Exist (SQLModel's create_all handles dialects provided)
-        # This will create 'runmode' table if missing.
-        create_db_and_tables()
-
-        # 1. Ensure Data Exists (Idempotent Seed)
-        with Session(engine) as session:
-            # Check for STANDARD mode by Name first
-            std_mode = session.exec(select(RunMode).where(RunMode.name == "STANDARD")).first()
-            if not std_mode:
-                 # Insert Standard Mode. We want it to be likely ID 1 if possible, but mainly it must exist.
-                 # If we are the first insert into a new table, it will be 1 (or close).
-                 # If we really needed ID 1, we could try force it: session.add(RunMode(id=1, ...))
-                 # But postgres SERIAL logic might not like explicit ID insert unless properly handled.
-                 # Let's trust standard insert order for an empty table.
-                 print("Seeding RunMode: STANDARD")
-                 session.add(RunMode(name="STANDARD", description="Standard Operation", active=True))
-                 
-            # Check other modes
-            modes = [
-                {"name": "COMBO_1OP_2PRESS", "description": "1 Operator running 2 Presses"},
-                {"name": "COMBO_1OP_3PRESS", "description": "1 Operator running 3 Presses"},
-                {"name": "TEAM_2OP_4MOLDS", "description": "2 Operators running 4 Molds"},
-            ]
-            for m in modes:
-                if not session.exec(select(RunMode).where(RunMode.name == m["name"])).first():
-                    session.add(RunMode(**m))
-            session.commit()
-            
-            # Re-fetch Standard Mode to get its ID for the Default Value
-            std_mode = session.exec(select(RunMode).where(RunMode.name == "STANDARD")).first()
-            std_id = std_mode.id if std_mode else 1 # Fallback to 1 if something weird happened
-
-        # 2. Add run_mode_id to RateEntry
-        if insp.has_table("rateentry"):
-            cols = [c["name"] for c in insp.get_columns("rateentry")]
-            if "run_mode_id" not in cols:
-                print("Migrating RateEntry: Adding 'run_mode_id'...")
-                with Session(engine) as session:
-                    # Use std_id for default
-                    session.exec(text(f"ALTER TABLE rateentry ADD COLUMN run_mode_id INTEGER DEFAULT {std_id} REFERENCES runmode(id)"))
-                    session.commit()
-
-        # 3. Add run_mode_id to ReportEntry
-        if insp.has_table("reportentry"):
-            cols = [c["name"] for c in insp.get_columns("reportentry")]
-            if "run_mode_id" not in cols:
-                print("Migrating ReportEntry: Adding 'run_mode_id'...")
-                with Session(engine) as session:
-                    session.exec(text(f"ALTER TABLE reportentry ADD COLUMN run_mode_id INTEGER DEFAULT {std_id} REFERENCES runmode(id)"))
-                    session.commit()
-
-
-
-    except Exception as e:
-        print(f"RunMode Migration check failed: {e}")
-
-
-    # Seed data if empty
-    with Session(engine) as session:
-        if not session.exec(select(User)).first():
-            print("Seeding database with default users...")
-            users = get_seed_users()
-            for u in users:
-                session.add(u)
-            session.commit()
-            print(f"User seeding complete.")
-    
-        if not session.exec(select(RateEntry)).first():
-            print("Seeding database with default rates...")
-            rates = get_seed_rates()
-            for r in rates:
-                session.add(r)
-            session.commit()
-            print(f"Seeding complete: Added {len(rates)} rates.")
+    # Single schema_version check; pending migrations are applied once, in order
+    run_migrations(engine)
 
 # CORS (allow all for demo; tighten in production)
 app.add_middleware(
@@ -193,8 +25,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Gzip large payloads (dashboard stats, report entries) for the floor tablets.
+# Small responses are sent as-is; compressing them costs more than it saves.
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1024"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=5)
+
+# Outermost, so timings cover the whole stack and sizes are what goes on the wire
+app.add_middleware(PerfMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Global exception handler — ensures we ALWAYS see the real error
 # (Without this, unhandled exceptions return bare "Internal Server Error" without CORS headers)
 from fastapi.responses import JSONResponse
@@ -221,6 +64,10 @@ app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
 app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 app.include_router(weekly.router, prefix="/weekly", tags=["weekly"])
+app.include_router(board.router, prefix="/board", tags=["board"])
+app.include_router(events.router, prefix="/events", tags=["events"])
+app.include_router(machines.router, prefix="/machines", tags=["machines"])
+app.include_router(dimensions.router, prefix="/dimensions", tags=["dimensions"])
 
 @app.get("/health")
 async def health_check():
@@ -248,36 +95,29 @@ async def debug_db():
         "missing_diagnostics": "diagnostics_json" not in metric_cols
     }
 
-@app.get("/fix-db")
-async def fix_db():
-    from sqlalchemy import text
-    logs = []
-
-    def run_migration(name, sql):
-        try:
-            # Open a NEW session for each command to isolate transactions
-            with Session(engine) as session:
-                session.exec(text(sql))
-                session.commit()
-            return f"SUCCESS: {name}"
-        except Exception as e:
-            err_str = str(e).lower()
-            if "already exists" in err_str or "duplicate column" in err_str:
-                return f"SKIPPED: {name} (Already exists)"
-            return f"FAILED: {name} - {str(e)}"
-
-    # 1. ReportEntry
-    logs.append(run_migration("Add downtime_events to reportentry", "ALTER TABLE reportentry ADD COLUMN downtime_events TEXT"))
+@app.get("/debug-engine")
+def debug_engine():
+    """Effective engine settings: SQLite pragmas or Postgres pool configuration."""
+    from .engine_config import effective_settings
+    return effective_settings(engine)
 
-    # 2. OeeMetric
-    logs.append(run_migration("Add diagnostics_json to oeemetric", "ALTER TABLE oeemetric ADD COLUMN diagnostics_json TEXT"))
+@app.get("/debug/perf", dependencies=[Depends(auth.require_role("admin"))])
+async def debug_perf():
+    """Rolling per-route wall/DB time percentiles, SQL statement and row counts."""
+    return perf_summary()
 
-    # 3. RateEntry
-    logs.append(run_migration("Add cavity_count to rateentry", "ALTER TABLE rateentry ADD COLUMN cavity_count INTEGER DEFAULT 1"))
-    logs.append(run_migration("Add entry_mode to rateentry", "ALTER TABLE rateentry ADD COLUMN entry_mode VARCHAR DEFAULT 'seconds'"))
-    logs.append(run_migration("Add machine_cycle_time to rateentry", "ALTER TABLE rateentry ADD COLUMN machine_cycle_time FLOAT"))
+@app.get("/metrics-export")
+async def metrics_export():
+    """Prometheus text exposition: request latency, in-flight, DB pool, recalc queue, uploads, caches."""
+    from fastapi.responses import PlainTextResponse
+    from .metrics_export import render
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-    return {"status": "completed", "logs": logs}
+@app.get("/fix-db")
+async def fix_db():
+    """Apply any pending schema migrations and report the schema version."""
+    logs = run_migrations(engine)
+    return {"status": "completed", "version": current_version(engine), "latest": latest_version(), "logs": logs}
     
 @app.post("/seed-remote")
 async def seed_remote(secret: str):
@@ -320,7 +160,7 @@ async def force_hash(secret: str, email: str, new_password: str):
         
     from sqlmodel import Session, select
     from .db import User
-    from .routers.auth import get_password_hash
+    from .routers.auth import get_password_hash, invalidate_principal
     
     with Session(engine) as session:
         user = session.exec(select(User).where(User.email == email)).first()
@@ -330,6 +170,7 @@ async def force_hash(secret: str, email: str, new_password: str):
         user.hashed_password = get_password_hash(new_password)
         session.add(user)
         session.commit()
+    invalidate_principal(email)
     return {"status": "success", "message": f"Password re-hashed for {email}"}
 
 # ==========================================
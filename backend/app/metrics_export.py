@@ -0,0 +1,188 @@
+"""Prometheus text exposition for /metrics-export.
+
+A few small thread-safe Counter/Gauge/Histogram types (no client library
+needed) plus collectors that read DB pool and cache state at scrape time.
+Values are per worker process; Prometheus aggregates across workers/targets.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECALC_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Unlabelled series start at 0 so they are exported before first use
+        self._values: Dict[Tuple, float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+def collector(fn: Callable[[], Iterable[str]]):
+    """Register a function that yields exposition lines at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for fn in _collectors:
+        try:
+            lines.extend(fn())
+        except Exception as e:
+            # A broken collector must not take the whole scrape down
+            print(f"metrics-export collector {fn.__name__} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Application metrics ──
+
+REQUEST_LATENCY = Histogram("oee_http_request_duration_seconds", "Request wall time by route template.", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("oee_http_requests_in_flight", "Requests currently being served.")
+
+RECALC_QUEUED = Gauge("oee_recalc_queue_depth", "Background recalculations scheduled but not started.")
+RECALC_RUNNING = Gauge("oee_recalc_in_progress", "Background recalculations currently running.")
+RECALC_DURATION = Histogram("oee_recalc_duration_seconds", "Duration of one background recalculation (all reports for a part).", buckets=RECALC_BUCKETS)
+RECALC_REPORTS = Counter("oee_recalc_reports_total", "Reports recalculated in the background, by outcome.", ("outcome",))
+
+UPLOAD_ROWS = Counter("oee_upload_rows_total", "Rows stored by uploads.", ("kind",))
+UPLOAD_DURATION = Histogram("oee_upload_duration_seconds", "Upload request processing time.", ("kind",), buckets=RECALC_BUCKETS)
+UPLOAD_ROWS_PER_SECOND = Gauge("oee_upload_rows_per_second", "Throughput of the most recent upload.", ("kind",))
+
+EVENT_STREAMS = Gauge("oee_event_streams", "Open /events server-sent event streams.")
+
+
+def record_upload(kind: str, rows: int, seconds: float):
+    UPLOAD_ROWS.inc(rows, kind)
+    UPLOAD_DURATION.observe(seconds, kind)
+    if seconds > 0:
+        UPLOAD_ROWS_PER_SECOND.set(rows / seconds, kind)
+
+
+@collector
+def _cache_lines():
+    from .cache import CACHES
+    lines = [
+        "# HELP oee_cache_hits_total Cache lookups answered from the cache.", "# TYPE oee_cache_hits_total counter",
+    ]
+    caches = sorted(CACHES.items())
+    lines += [f'oee_cache_hits_total{{cache="{_escape(n)}"}} {c.hits}' for n, c in caches]
+    lines += ["# HELP oee_cache_misses_total Cache lookups that fell through.", "# TYPE oee_cache_misses_total counter"]
+    lines += [f'oee_cache_misses_total{{cache="{_escape(n)}"}} {c.misses}' for n, c in caches]
+    lines += ["# HELP oee_cache_hit_ratio Hits over lookups since start.", "# TYPE oee_cache_hit_ratio gauge"]
+    for n, c in caches:
+        total = c.hits + c.misses
+        lines.append(f'oee_cache_hit_ratio{{cache="{_escape(n)}"}} {_number(c.hits / total if total else 0.0)}')
+    lines += ["# HELP oee_cache_entries Entries currently held.", "# TYPE oee_cache_entries gauge"]
+    lines += [f'oee_cache_entries{{cache="{_escape(n)}"}} {len(c)}' for n, c in caches]
+    return lines
+
+
+@collector
+def _pool_lines():
+    from .database import engine, async_engine
+    pools = [("sync", engine.pool), ("async", async_engine.sync_engine.pool)]
+    lines = []
+    for metric, method, doc in (
+        ("oee_db_pool_size", "size", "Configured pool size."),
+        ("oee_db_pool_checked_out", "checkedout", "Connections currently checked out."),
+        ("oee_db_pool_overflow", "overflow", "Connections open beyond pool_size (negative while the pool is still filling)."),
+    ):
+        lines += [f"# HELP {metric} {doc}", f"# TYPE {metric} gauge"]
+        for name, pool in pools:
+            if hasattr(pool, method):
+                lines.append(f'{metric}{{engine="{name}"}} {getattr(pool, method)()}')
+    return lines
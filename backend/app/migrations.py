@@ -0,0 +1,305 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in order, and is recorded in the `schema_version`
+table. On startup `run_migrations` does a single version check and returns
+immediately when the database is current.
+
+Migrations must be idempotent. Deployed databases already carry some of the
+changes made before this runner existed, and on a fresh database migration 1
+creates every table from the current models, so later migrations find their
+columns and tables already in place (inspect first, CREATE ... IF NOT EXISTS,
+or create_all(tables=[...])).
+
+To change the schema, append a new `@migration(N, "...")` function with the
+next version number. Never edit or reorder an applied migration.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import SQLModel, Session, select
+
+from .db import BoardRecord, ChangeEvent, DataVersion, DimensionAlias, Job, Machine, MachinePart, Operator, OperatorSkill, Part, RateEntry, RunMode, Setting, User, WeekVersion, WeeklySnapshot
+from .seeds import get_seed_rates, get_seed_users
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Session], None]]] = []
+
+
+def migration(version: int, description: str):
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise RuntimeError(f"Migration {version} registered out of order")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _columns(session: Session, table: str) -> List[str]:
+    insp = inspect(session.connection())
+    if not insp.has_table(table):
+        return []
+    return [c["name"] for c in insp.get_columns(table)]
+
+
+def _add_column(session: Session, table: str, column: str, ddl: str):
+    cols = _columns(session, table)
+    if cols and column not in cols:
+        print(f"Migrating {table}: Adding '{column}'...")
+        quoted = '"user"' if table == "user" else table
+        session.exec(text(f"ALTER TABLE {quoted} ADD COLUMN {column} {ddl}"))
+
+
+# ── Migrations ──
+
+@migration(1, "Create tables")
+def _create_tables(session: Session):
+    # Creates any missing table; existing tables are left alone
+    SQLModel.metadata.create_all(session.connection())
+
+
+@migration(2, "Legacy columns: reportentry.job, rateentry cavity/entry mode")
+def _legacy_columns(session: Session):
+    # Older builds dropped the report tables when 'job' was missing;
+    # adding the column keeps the data.
+    _add_column(session, "reportentry", "job", "VARCHAR")
+    _add_column(session, "oeemetric", "job", "VARCHAR")
+    _add_column(session, "rateentry", "cavity_count", "INTEGER DEFAULT 1")
+    _add_column(session, "rateentry", "entry_mode", "VARCHAR DEFAULT 'seconds'")
+    _add_column(session, "rateentry", "machine_cycle_time", "FLOAT")
+
+
+@migration(3, "User RBAC columns")
+def _user_columns(session: Session):
+    _add_column(session, "user", "is_pro", "BOOLEAN DEFAULT FALSE")
+    _add_column(session, "user", "role", "VARCHAR DEFAULT 'viewer'")
+    _add_column(session, "user", "shift_scope", "VARCHAR")
+    _add_column(session, "user", "allowed_pages", "TEXT")
+
+
+@migration(4, "Downtime events and diagnostics")
+def _diagnostics_columns(session: Session):
+    _add_column(session, "reportentry", "downtime_events", "TEXT")
+    _add_column(session, "oeemetric", "diagnostics_json", "TEXT")
+
+
+@migration(5, "Run modes")
+def _run_modes(session: Session):
+    modes = [
+        {"name": "STANDARD", "description": "Standard Operation"},
+        {"name": "COMBO_1OP_2PRESS", "description": "1 Operator running 2 Presses"},
+        {"name": "COMBO_1OP_3PRESS", "description": "1 Operator running 3 Presses"},
+        {"name": "TEAM_2OP_4MOLDS", "description": "2 Operators running 4 Molds"},
+    ]
+    existing = set(session.exec(select(RunMode.name)).all())
+    for m in modes:
+        if m["name"] not in existing:
+            print(f"Seeding RunMode: {m['name']}")
+            session.add(RunMode(**m))
+    session.flush()
+
+    std_id = session.exec(select(RunMode.id).where(RunMode.name == "STANDARD")).first() or 1
+    _add_column(session, "rateentry", "run_mode_id", f"INTEGER DEFAULT {std_id} REFERENCES runmode(id)")
+    _add_column(session, "reportentry", "run_mode_id", f"INTEGER DEFAULT {std_id} REFERENCES runmode(id)")
+
+
+@migration(6, "Keyset pagination indexes")
+def _pagination_indexes(session: Session):
+    session.exec(text("CREATE INDEX IF NOT EXISTS ix_productionreport_uploaded_at ON productionreport (uploaded_at)"))
+    session.exec(text("CREATE INDEX IF NOT EXISTS ix_reportentry_report_id ON reportentry (report_id)"))
+    session.exec(text("CREATE INDEX IF NOT EXISTS ix_oeemetric_report_id ON oeemetric (report_id)"))
+    session.exec(text("CREATE INDEX IF NOT EXISTS ix_oeemetric_date ON oeemetric (date)"))
+
+
+@migration(7, "Seed default users and rates")
+def _seed_defaults(session: Session):
+    if not session.exec(select(User.id)).first():
+        print("Seeding database with default users...")
+        for u in get_seed_users():
+            session.add(u)
+    if not session.exec(select(RateEntry.id)).first():
+        rates = get_seed_rates()
+        print(f"Seeding database with {len(rates)} default rates...")
+        for r in rates:
+            session.add(r)
+
+
+@migration(8, "Oeemetric volume/time columns, backfilled from diagnostics")
+def _metric_volume_columns(session: Session):
+    import json
+    for column, ddl in (("good_count", "INTEGER"), ("reject_count", "INTEGER"),
+                        ("run_time_min", "FLOAT"), ("downtime_min", "FLOAT")):
+        _add_column(session, "oeemetric", column, ddl)
+
+    rows = session.exec(text(
+        "SELECT id, diagnostics_json FROM oeemetric WHERE good_count IS NULL AND diagnostics_json IS NOT NULL"
+    )).all()
+    updates = []
+    for metric_id, raw in rows:
+        try:
+            diag = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        updates.append({
+            "id": metric_id,
+            "good": diag.get("good_count"),
+            "reject": diag.get("reject_count"),
+            "run": diag.get("run_time_min"),
+            "down": diag.get("downtime_min"),
+        })
+    if updates:
+        print(f"Backfilling volume columns on {len(updates)} metrics...")
+        session.exec(
+            text("UPDATE oeemetric SET good_count = :good, reject_count = :reject, "
+                 "run_time_min = :run, downtime_min = :down WHERE id = :id"),
+            params=updates,
+        )
+
+
+@migration(9, "Weekly snapshot tables")
+def _weekly_snapshots(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[WeekVersion.__table__, WeeklySnapshot.__table__])
+
+
+@migration(10, "Production board records")
+def _board_records(session: Session):
+    import json
+    SQLModel.metadata.create_all(session.connection(), tables=[BoardRecord.__table__])
+    if session.exec(select(BoardRecord)).first() is not None:
+        return
+    legacy = session.get(Setting, "production_board_state")
+    if legacy is None:
+        return
+    try:
+        state = json.loads(legacy.value)
+    except ValueError:
+        print("Legacy production board state is not valid JSON; starting with an empty board")
+        return
+    from .routers.board import import_legacy_state
+    print(f"Imported {import_legacy_state(session, state)} production board records")
+
+
+@migration(11, "Change event log")
+def _change_events(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[ChangeEvent.__table__])
+
+
+@migration(12, "Machine/part catalog")
+def _machine_part_catalog(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[DataVersion.__table__, MachinePart.__table__])
+    from .catalog import rebuild_catalog
+    print(f"Machine/part catalog: {rebuild_catalog(session)} pairs")
+
+
+@migration(13, "Operator skill matrix")
+def _operator_skills(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[OperatorSkill.__table__])
+    if "machine" not in {c["name"] for c in inspect(session.connection()).get_columns("oeemetric")}:
+        return
+    from .skills import rebuild_skills
+    print(f"Operator skill matrix: {rebuild_skills(session)} rows")
+
+
+@migration(14, "Machine registry and machine_id columns")
+def _machine_registry(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[Machine.__table__])
+    from .machines import MachineRegistry
+    registry = MachineRegistry(session)
+    for table in ("reportentry", "rateentry", "oeemetric"):
+        columns = _columns(session, table)
+        if not columns:
+            continue
+        _add_column(session, table, "machine_id", "INTEGER REFERENCES machine(id)")
+        session.exec(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_machine_id ON {table} (machine_id)"))
+        if "machine" not in columns:
+            continue
+        names = session.exec(text(f"SELECT DISTINCT machine FROM {table} WHERE machine_id IS NULL AND machine IS NOT NULL")).all()
+        updates = [{"id": registry.resolve(name), "name": name} for (name,) in names]
+        updates = [u for u in updates if u["id"] is not None]
+        if updates:
+            print(f"Linking {len(updates)} machine names in {table} to the registry...")
+            session.exec(text(f"UPDATE {table} SET machine_id = :id WHERE machine = :name AND machine_id IS NULL"), params=updates)
+
+
+@migration(15, "Configurable operator exclusions")
+def _operator_exclusions(session: Session):
+    from .operators import DEFAULT_EXCLUDED_OPERATORS, EXCLUDED_OPERATORS_KEY, refresh_excluded
+    import json
+    if not _columns(session, "oeemetric"):
+        return
+    _add_column(session, "oeemetric", "excluded", "BOOLEAN DEFAULT FALSE")
+    session.exec(text("UPDATE oeemetric SET excluded = FALSE WHERE excluded IS NULL"))
+    session.exec(text("CREATE INDEX IF NOT EXISTS ix_oeemetric_excluded ON oeemetric (excluded)"))
+    if session.get(Setting, EXCLUDED_OPERATORS_KEY) is None:
+        session.add(Setting(key=EXCLUDED_OPERATORS_KEY, value=json.dumps(DEFAULT_EXCLUDED_OPERATORS),
+                            description="Operators left out of operator comparisons"))
+        session.flush()
+    if "operator" in _columns(session, "oeemetric"):
+        print(f"Excluded operators: {refresh_excluded(session)} names")
+
+
+@migration(16, "Operator, part and job dimensions")
+def _dimensions(session: Session):
+    SQLModel.metadata.create_all(session.connection(), tables=[
+        Operator.__table__, Part.__table__, Job.__table__, DimensionAlias.__table__,
+    ])
+    from .dimensions import backfill_dimensions
+    for table in ("reportentry", "rateentry", "oeemetric"):
+        if not _columns(session, table):
+            continue
+        for column, target in (("operator_id", "operator"), ("part_id", "part"), ("job_id", "job")):
+            _add_column(session, table, column, f"INTEGER REFERENCES {target}(id)")
+            session.exec(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+        linked = backfill_dimensions(session, table, _columns(session, table))
+        if linked:
+            print(f"Linked {linked} operator/part/job names in {table}")
+
+
+# ── Runner ──
+
+def current_version(engine) -> int:
+    """Single query against schema_version; 0 when the table does not exist yet."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except SQLAlchemyError:
+        return 0
+
+
+def run_migrations(engine) -> List[str]:
+    """Apply pending migrations in order. Each one commits together with its
+    schema_version row, so a failure leaves the database at the last good version."""
+    version = current_version(engine)
+    if version >= latest_version():
+        return []
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, description VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+    logs = []
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        with Session(engine) as session:
+            try:
+                fn(session)
+                session.exec(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    params={"v": number, "d": description, "t": datetime.utcnow()},
+                )
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logs.append(f"FAILED: {number} {description} - {e}")
+                print(f"Migration {number} failed: {e}")
+                break
+        logs.append(f"APPLIED: {number} {description}")
+        print(f"Migration {number} applied: {description}")
+    return logs
@@ -0,0 +1,72 @@
+"""Operators left out of operator comparisons (quality personnel, trainers).
+
+The patterns live in the "excluded_operators" Setting as a JSON list and are
+edited through PUT /settings/excluded_operators. A pattern matches an
+operator name when all of its words appear in the name, in any order and
+ignoring case and punctuation, so "Shirley Brown" also covers
+"Brown,Shirley" and "Brown Shirley".
+
+Oeemetric.excluded holds the result: calculation sets it for new metrics and
+`refresh_excluded` rewrites it whenever the list changes, so analytics filter
+with an indexed `excluded = false` instead of matching names row by row.
+"""
+import json
+import re
+from typing import FrozenSet, Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from .db import Oeemetric, Setting
+
+EXCLUDED_OPERATORS_KEY = "excluded_operators"
+
+# Quality personnel, not machine operators
+DEFAULT_EXCLUDED_OPERATORS = ["Shirley Brown", "Elliot Ison"]
+
+
+def name_tokens(name: Optional[str]) -> FrozenSet[str]:
+    return frozenset(re.findall(r"[a-z0-9]+", (name or "").lower()))
+
+
+def parse_patterns(raw: str) -> List[str]:
+    """Validate a stored or submitted list; raises ValueError."""
+    patterns = json.loads(raw)
+    if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+        raise ValueError("excluded_operators must be a JSON list of names")
+    return patterns
+
+
+def load_patterns(session: Session) -> List[FrozenSet[str]]:
+    setting = session.get(Setting, EXCLUDED_OPERATORS_KEY)
+    try:
+        patterns = parse_patterns(setting.value) if setting else DEFAULT_EXCLUDED_OPERATORS
+    except ValueError:
+        print("excluded_operators setting is not a JSON list; using the defaults")
+        patterns = DEFAULT_EXCLUDED_OPERATORS
+    return list(dict.fromkeys(tokens for tokens in map(name_tokens, patterns) if tokens))
+
+
+def is_excluded(operator: Optional[str], patterns: List[FrozenSet[str]]) -> bool:
+    tokens = name_tokens(operator)
+    return any(pattern <= tokens for pattern in patterns)
+
+
+def refresh_excluded(session: Session, patterns: Optional[List[FrozenSet[str]]] = None) -> int:
+    """Recompute Oeemetric.excluded for every distinct operator (caller commits).
+    Returns the number of excluded operator names."""
+    if patterns is None:
+        patterns = load_patterns(session)
+    operators = session.exec(select(Oeemetric.operator).where(Oeemetric.operator.is_not(None)).distinct()).all()
+    excluded = [op for op in operators if is_excluded(op, patterns)]
+    session.exec(update(Oeemetric).where(Oeemetric.excluded == True, Oeemetric.operator.not_in(excluded)).values(excluded=False))
+    if excluded:
+        session.exec(update(Oeemetric).where(Oeemetric.operator.in_(excluded), Oeemetric.excluded == False).values(excluded=True))
+    return len(excluded)
+
+
+def mark_excluded(session: Session, metrics: Iterable[Oeemetric]):
+    """Set the flag on metrics about to be written."""
+    patterns = load_patterns(session)
+    for m in metrics:
+        m.excluded = is_excluded(m.operator, patterns)
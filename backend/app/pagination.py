@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Response header carrying the opaque cursor for the next page.
+# Bodies stay plain lists so existing clients keep working.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort-key values of the last row into an opaque URL-safe cursor."""
+    raw = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """Decode a cursor back into typed values matching the keyset columns."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("cursor length mismatch")
+        values = []
+        for col, v in zip(columns, raw):
+            py_type = col.type.python_type
+            if v is not None and py_type is datetime:
+                v = datetime.fromisoformat(v)
+            elif v is not None and py_type is date:
+                v = date.fromisoformat(v)
+            values.append(v)
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_select(stmt, columns: Sequence[Any], cursor: Optional[str], limit: Optional[int], descending: bool = True):
+    """Add the seek condition, ordering and limit (one extra row to detect a next page)."""
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        # (a, b) < (x, y)  ==  a < x OR (a = x AND b < y), expanded for portability
+        clauses = []
+        for i, col in enumerate(columns):
+            prefix = [columns[j] == values[j] for j in range(i)]
+            step = col < values[i] if descending else col > values[i]
+            clauses.append(and_(*prefix, step))
+        stmt = stmt.where(or_(*clauses))
+
+    stmt = stmt.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def keyset_result(rows: list, columns: Sequence[Any], limit: Optional[int]) -> Tuple[list, Optional[str]]:
+    """Trim the extra row and build the cursor pointing after the last returned row."""
+    if limit is None or len(rows) <= limit:
+        return list(rows), None
+    rows = list(rows[:limit])
+    return rows, encode_cursor([getattr(rows[-1], c.key) for c in columns])
+
+
+def keyset_page(session, stmt, columns: Sequence[Any], cursor: Optional[str], limit: Optional[int], descending: bool = True) -> Tuple[list, Optional[str]]:
+    """Apply keyset (seek) pagination to a select.
+
+    `columns` is the ordering key, most significant first, and must end in a
+    unique column (usually the primary key) so the order is stable. Each page
+    seeks past the last key instead of using OFFSET, so deep pages cost the
+    same as the first one. Returns (rows, next_cursor); next_cursor is None on
+    the last page or when no limit was given.
+    """
+    rows = session.exec(keyset_select(stmt, columns, cursor, limit, descending)).all()
+    return keyset_result(rows, columns, limit)
+
+
+async def keyset_page_async(session, stmt, columns: Sequence[Any], cursor: Optional[str], limit: Optional[int], descending: bool = True) -> Tuple[list, Optional[str]]:
+    """keyset_page for an AsyncSession."""
+    result = await session.exec(keyset_select(stmt, columns, cursor, limit, descending))
+    return keyset_result(result.all(), columns, limit)
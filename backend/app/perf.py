@@ -0,0 +1,239 @@
+"""Per-request performance instrumentation.
+
+`PerfMiddleware` (pure ASGI, so it adds no extra task per request) records for
+every request the route template, wall time, response size, and - through the
+SQLAlchemy hooks installed by `instrument_engine` - DB time, SQL statement
+count and rows fetched. Samples go into a rolling window per route, reported
+as percentiles by `perf_summary()` (served at /debug/perf), and feed the
+Prometheus latency histogram and in-flight gauge in metrics_export.
+
+With PERF_SERVER_TIMING=1 each response also carries a `Server-Timing` header
+(app / db durations and statement count), shown by the browser dev tools
+under Network > Timing.
+
+Server-sent event streams (/events/) are not timed: they stay open for as
+long as a client is connected.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+
+from .metrics_export import REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+
+PERF_WINDOW = int(os.environ.get("PERF_WINDOW", "500"))
+SERVER_TIMING = os.environ.get("PERF_SERVER_TIMING", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+class RequestStats:
+    __slots__ = ("db_ms", "statements", "rows")
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.statements = 0
+        self.rows = 0
+
+
+# Set by the middleware; the DB hooks add to it. Threadpool endpoints and
+# async-engine greenlets run with a copy of the request's context, so they
+# see the same RequestStats object.
+_current: ContextVar[Optional[RequestStats]] = ContextVar("perf_request_stats", default=None)
+
+
+# ── SQLAlchemy hooks ──
+
+class _CountingCursor:
+    """Wraps a DBAPI cursor to count rows as the result is fetched."""
+
+    def __init__(self, cursor, stats: RequestStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("perf_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or not conn.info.get("perf_started"):
+        return
+    stats.db_ms += (time.perf_counter() - conn.info["perf_started"].pop()) * 1000
+    stats.statements += 1
+    if context is not None and cursor.description is not None:
+        context.cursor = _CountingCursor(cursor, stats)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so the pooled connection's next statement isn't timed against it
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("perf_started"):
+        conn.info["perf_started"].pop()
+
+
+def instrument_engine(engine):
+    """Attach timing/statement/row hooks to a sync Engine (or AsyncEngine.sync_engine)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ── Rolling per-route samples ──
+
+_samples: Dict[str, Deque[tuple]] = {}
+_totals: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def record(route: str, wall_ms: float, stats: RequestStats, response_bytes: int):
+    with _lock:
+        window = _samples.get(route)
+        if window is None:
+            window = _samples[route] = deque(maxlen=PERF_WINDOW)
+        window.append((wall_ms, stats.db_ms, stats.statements, stats.rows, response_bytes))
+        _totals[route] = _totals.get(route, 0) + 1
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def perf_summary() -> Dict[str, Any]:
+    """Percentiles over the last PERF_WINDOW requests of each route, slowest p95 first."""
+    with _lock:
+        snapshot = {route: list(window) for route, window in _samples.items()}
+        totals = dict(_totals)
+
+    routes = []
+    for route, samples in snapshot.items():
+        n = len(samples)
+        wall = sorted(s[0] for s in samples)
+        db = sorted(s[1] for s in samples)
+        routes.append({
+            "route": route,
+            "total_requests": totals.get(route, n),
+            "window": n,
+            "wall_ms": {p: round(_percentile(wall, q), 2) for p, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99))},
+            "wall_ms_max": round(wall[-1], 2),
+            "db_ms": {"p50": round(_percentile(db, 50), 2), "p95": round(_percentile(db, 95), 2)},
+            "avg_statements": round(sum(s[2] for s in samples) / n, 1),
+            "avg_rows": round(sum(s[3] for s in samples) / n, 1),
+            "avg_response_bytes": int(sum(s[4] for s in samples) / n),
+        })
+    routes.sort(key=lambda r: r["wall_ms"]["p95"], reverse=True)
+    return {"window_size": PERF_WINDOW, "routes": routes}
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+
+
+# ── Middleware ──
+
+def route_template(scope) -> str:
+    """Route template (e.g. /reports/{report_id}/entries) so ids don't split the stats."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Depending on the FastAPI version, an included router's route carries its
+    # own path without the include prefix; recover the prefix from the request path.
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is not None:
+        for i, ch in enumerate(path):
+            if ch == "/" and regex.match(path[i:]):
+                return path[:i] + template
+    return template
+
+
+def route_label(scope) -> str:
+    return f"{scope.get('method', '')} {route_template(scope)}"
+
+
+class PerfMiddleware:
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        size = 0
+        status = 500
+        streaming = False
+        REQUESTS_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal size, status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                streaming = content_type.startswith(b"text/event-stream")
+            if message["type"] == "http.response.start" and self.server_timing:
+                app_ms = (time.perf_counter() - started) * 1000
+                value = (
+                    f'app;dur={app_ms:.1f}, db;dur={stats.db_ms:.1f}, '
+                    f'sql;desc="{stats.statements} statements, {stats.rows} rows"'
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            REQUESTS_IN_FLIGHT.dec()
+            # Server-sent event streams stay open for hours; their duration
+            # is not a response time
+            if not streaming:
+                elapsed = time.perf_counter() - started
+                record(route_label(scope), elapsed * 1000, stats, size)
+                REQUEST_LATENCY.observe(elapsed, scope.get("method", ""), route_template(scope), str(status))
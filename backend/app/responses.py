@@ -0,0 +1,15 @@
+from typing import Any, Dict, List
+
+from fastapi.responses import ORJSONResponse  # noqa: F401 - shared by the bulk endpoints
+from sqlmodel import Session, select
+
+
+def table_rows(session: Session, model, *where, order_by=None) -> List[Dict[str, Any]]:
+    """Fetch rows of a table model as plain dicts (column-only select, no ORM objects).
+    The rows are trusted DB data so they can go straight to ORJSONResponse."""
+    stmt = select(*model.__table__.columns)
+    for clause in where:
+        stmt = stmt.where(clause)
+    if order_by is not None:
+        stmt = stmt.order_by(order_by)
+    return [dict(r) for r in session.exec(stmt).mappings().all()]
@@ -1,183 +1,194 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_
-from sqlmodel import Session, select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import Integer, String, case, literal, or_, tuple_, union_all
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date
 
-from ..db import Oeemetric
-from ..database import get_session
+from ..db import DimensionAlias, Machine, Oeemetric, Operator, Part
+from ..dimensions import DIMENSIONS
+from ..distributions import QUANTILES, distribution, group_distributions
+from ..database import get_async_session
+from ..pagination import keyset_page_async, NEXT_CURSOR_HEADER
 
 router = APIRouter(tags=["analytics"])
 
-EXCLUDED_OPERATORS = [
-    "Shirley Brown", "Brown Shirley", "Brown,Shirley",
-    "Ison Elliot", "Elliot Ison", "Ison,Elliot"
-]
+# ── Grouping ──
+
+# group_by -> (id column, text column, dimension model, name column); None ids
+# for rows written before the dimensions existed fall back to the text
+GROUP_DIMENSIONS = {
+    "operator": (Oeemetric.operator_id, Oeemetric.operator, Operator, Operator.name),
+    "part": (Oeemetric.part_id, Oeemetric.part_number, Part, Part.name),
+    "machine": (Oeemetric.machine_id, Oeemetric.machine, Machine, Machine.display_name),
+}
+
+
+def group_columns(group_by: str) -> list:
+    """GROUP BY columns: (id, text of rows without an id) for a dimension,
+    the text itself for plain columns such as shift."""
+    unknown = lambda col: func.coalesce(func.nullif(col, ""), "Unknown")
+    if group_by not in GROUP_DIMENSIONS:
+        return [unknown(getattr(Oeemetric, group_by)).label("group_id")]
+    id_col, text_col, _, _ = GROUP_DIMENSIONS[group_by]
+    return [id_col.label("group_id"), case((id_col.is_(None), unknown(text_col))).label("group_text")]
+
+
+async def group_names(session: AsyncSession, group_by: str, rows) -> List[str]:
+    """Display names for grouped rows, looking up only the ids being returned."""
+    if group_by not in GROUP_DIMENSIONS:
+        return [row.group_id for row in rows]
+    _, _, model, name_col = GROUP_DIMENSIONS[group_by]
+    ids = {row.group_id for row in rows if row.group_id is not None}
+    names = dict((await session.exec(select(model.id, name_col).where(model.id.in_(ids)))).all()) if ids else {}
+    return [names.get(row.group_id, "Unknown") if row.group_id is not None else row.group_text for row in rows]
+
+
+async def dimension_filter(session: AsyncSession, kind: str, raw: str):
+    """WHERE clause for one operator/part: every spelling that resolves to the
+    same dimension row, plus rows not yet linked that carry the exact text."""
+    dim = DIMENSIONS[kind]
+    text_col, id_col = getattr(Oeemetric, dim.attr), getattr(Oeemetric, dim.id_attr)
+    key = dim.key(raw)
+    ids = []
+    if key:
+        ids = (await session.exec(select(dim.model.id).where(dim.model.key == key))).all()
+        ids += (await session.exec(
+            select(DimensionAlias.target_id).where(DimensionAlias.kind == kind, DimensionAlias.key == key)
+        )).all()
+    return or_(text_col == raw, id_col.in_(ids)) if ids else text_col == raw
+
 
 @router.get("/compare", response_model=List[Dict[str, Any]])
-def compare_metrics(
+async def compare_metrics(
     group_by: str = Query(..., pattern="^(shift|part|machine|operator)$"), 
     limit: int = 100,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     shifts: Optional[List[str]] = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Compare OEE metrics grouped by a specific dimension (e.g., Shift, Part).
     Returns average OEE, Availability, Performance, Quality for each group.
+    Grouped in SQL on the dimension ids; names are joined for the top `limit` only.
     """
-    
-    stmt = select(Oeemetric)
+    keys = group_columns(group_by)
+    avg_oee = func.avg(func.coalesce(Oeemetric.oee, 0))
+    good = func.coalesce(Oeemetric.good_count, 0)
+    stmt = select(
+        *keys,
+        avg_oee.label("oee"),
+        func.avg(func.coalesce(Oeemetric.availability, 0)).label("availability"),
+        func.avg(func.coalesce(Oeemetric.performance, 0)).label("performance"),
+        func.avg(func.coalesce(Oeemetric.quality, 0)).label("quality"),
+        func.sum(good + func.coalesce(Oeemetric.reject_count, 0)).label("total_produced"),
+        func.sum(good).label("total_good"),
+        func.count().label("sample_size"),
+    )
     if start_date:
         stmt = stmt.where(Oeemetric.date >= start_date)
     if end_date:
         stmt = stmt.where(Oeemetric.date <= end_date)
     if shifts:
         stmt = stmt.where(Oeemetric.shift.in_(shifts))
-        
-    met_list = session.exec(stmt).all()
-    
-    # Filter excluded operators if grouping by operator
-    # Robust filtering: Check if any excluded pattern is a substring of the operator name
+    # Excluded operators (app/operators.py) are flagged when metrics are written
     if group_by == "operator":
-        met_list = [
-            m for m in met_list 
-            if m.operator and not any(ex in m.operator for ex in EXCLUDED_OPERATORS)
-        ]
-    
-    # ... aggregation logic ...
+        stmt = stmt.where(Oeemetric.operator.is_not(None), Oeemetric.excluded == False)
+    stmt = stmt.group_by(*keys).order_by(avg_oee.desc()).limit(limit)
+
     try:
-        grouped_data = {}
-        for m in met_list:
-            # Safe attribute access
-            col_name = "part_number" if group_by == "part" else group_by
-            metric_val = getattr(m, col_name)
-            key = metric_val if metric_val else "Unknown"
-            
-            if key not in grouped_data:
-                grouped_data[key] = {
-                    "name": key,
-                    "oee_sum": 0.0,
-                    "avail_sum": 0.0,
-                    "perf_sum": 0.0,
-                    "qual_sum": 0.0,
-                    "produced_sum": 0,
-                    "good_sum": 0,
-                    "count": 0
-                }
-            
-            # Parse Volume from Diagnostics
-            run_produced = 0
-            run_good = 0
-            if m.diagnostics_json:
-                try:
-                    import json
-                    diag = json.loads(m.diagnostics_json)
-                    run_good = int(diag.get("good_count", 0))
-                    run_reject = int(diag.get("reject_count", 0))
-                    run_produced = run_good + run_reject
-                except:
-                    pass
-
-            grouped_data[key]["oee_sum"] += (m.oee or 0)
-            grouped_data[key]["avail_sum"] += (m.availability or 0)
-            grouped_data[key]["perf_sum"] += (m.performance or 0)
-            grouped_data[key]["qual_sum"] += (m.quality or 0)
-            grouped_data[key]["produced_sum"] += run_produced
-            grouped_data[key]["good_sum"] += run_good
-            grouped_data[key]["count"] += 1
-            
-        results = []
-        
-        for key, data in grouped_data.items():
-            count = data["count"]
-            results.append({
-                "name": key,
-                "oee": round(data["oee_sum"] / count, 4),
-                "availability": round(data["avail_sum"] / count, 4),
-                "performance": round(data["perf_sum"] / count, 4),
-                "quality": round(data["qual_sum"] / count, 4),
-                "total_produced": data["produced_sum"],
-                "total_good": data["good_sum"],
-                "sample_size": count
-            })
-            
-        return sorted(results, key=lambda x: x["oee"], reverse=True)[:limit]
+        rows = (await session.exec(stmt)).all()
+        names = await group_names(session, group_by, rows)
+        return [
+            {
+                "name": name,
+                "oee": round(row.oee, 4),
+                "availability": round(row.availability, 4),
+                "performance": round(row.performance, 4),
+                "quality": round(row.quality, 4),
+                "total_produced": int(row.total_produced or 0),
+                "total_good": int(row.total_good or 0),
+                "sample_size": row.sample_size,
+            }
+            for row, name in zip(rows, names)
+        ]
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Analytics Error: {str(e)}")
 
 
+QUALITY_GROUP_FIELDS = {"part": "part_number", "machine": "machine", "operator": "operator", "shift": "shift"}
+
+
 @router.get("/quality", response_model=List[Dict[str, Any]])
-def quality_analysis(
-    limit: int = 10, 
+async def quality_analysis(
+    limit: int = Query(10, ge=1),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     shifts: Optional[List[str]] = Query(None),
-    session: Session = Depends(get_session)
+    group_by: str = Query("part", pattern="^(part|machine|operator|shift)$"),
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
-    Analyze Quality/Rejects by Part Number.
-    Returns Total Good, Total Rejects, Reject Rate %.
+    Analyze Quality/Rejects by Part Number (or machine, operator, shift).
+    Returns Total Good, Total Rejects, Reject Rate %, and each group's share of
+    all rejects plus the cumulative (Pareto) share, worst group first.
+    Totals, shares and the top `limit` are computed in SQL.
     """
-    stmt = select(Oeemetric)
+    keys = group_columns(group_by)
+    good = func.coalesce(Oeemetric.good_count, 0)
+    rejects = func.coalesce(Oeemetric.reject_count, 0)
+    stmt = select(*keys, func.sum(rejects).label("rejects"), func.sum(good + rejects).label("produced"))
     if start_date:
         stmt = stmt.where(Oeemetric.date >= start_date)
     if end_date:
         stmt = stmt.where(Oeemetric.date <= end_date)
     if shifts:
         stmt = stmt.where(Oeemetric.shift.in_(shifts))
-        
-    metrics = session.exec(stmt).all()
-    
-    part_stats = {}
-    
-    for m in metrics:
-        part = m.part_number or "Unknown"
-        
-        run_good = 0
-        run_reject = 0
-        
-        if m.diagnostics_json:
-            try:
-                import json
-                diag = json.loads(m.diagnostics_json)
-                run_good = diag.get("good_count", 0)
-                run_reject = diag.get("reject_count", 0)
-            except:
-                pass
-                
-        if part not in part_stats:
-            part_stats[part] = {"good": 0, "reject": 0}
-            
-        part_stats[part]["good"] += run_good
-        part_stats[part]["reject"] += run_reject
-        
+    if group_by == "operator":
+        stmt = stmt.where(Oeemetric.operator.is_not(None), Oeemetric.excluded == False)
+    grouped = stmt.group_by(*keys).subquery()
+
+    worst_first = [grouped.c.rejects.desc(), grouped.c.produced.desc(), *[grouped.c[k.name] for k in keys]]
+    ranked = (
+        select(
+            *grouped.c,
+            func.sum(grouped.c.rejects).over().label("all_rejects"),
+            func.sum(grouped.c.rejects).over(order_by=worst_first, rows=(None, 0)).label("cumulative"),
+        )
+        .order_by(*worst_first)
+        .limit(limit)
+    )
+    rows = (await session.exec(ranked)).all()
+    names = await group_names(session, group_by, rows)
+
+    field = QUALITY_GROUP_FIELDS[group_by]
     results = []
-         
-    for part, stats in part_stats.items():
-        total = stats["good"] + stats["reject"]
-        reject_rate = (stats["reject"] / total) if total > 0 else 0
-        
+    for row, name in zip(rows, names):
+        total = int(row.produced or 0)
+        total_rejects = int(row.rejects or 0)
+        all_rejects = row.all_rejects or 0
         results.append({
-            "part_number": part,
+            field: name,
+            "name": name,
             "total_produced": total,
-            "total_rejects": stats["reject"],
-            "reject_rate": round(reject_rate * 100, 2)
+            "total_rejects": total_rejects,
+            "reject_rate": round(total_rejects / total * 100, 2) if total > 0 else 0,
+            "reject_share": round(total_rejects / all_rejects * 100, 2) if all_rejects else 0,
+            "cumulative_share": round((row.cumulative or 0) / all_rejects * 100, 2) if all_rejects else 0,
         })
-        
-    return sorted(results, key=lambda x: x["total_rejects"], reverse=True)[:limit]
+    return results
 
 
 @router.get("/downtime", response_model=List[Dict[str, Any]])
-def downtime_analysis(
+async def downtime_analysis(
     limit: int = 10,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     shifts: Optional[List[str]] = Query(None),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Analyze Downtime by Machine.
@@ -191,17 +202,18 @@ def downtime_analysis(
     if shifts:
         stmt = stmt.where(Oeemetric.shift.in_(shifts))
         
-    metrics = session.exec(stmt).all()
+    metrics = (await session.exec(stmt)).all()
     
     # Pre-fetch Rates to calculate Parts Lost
     # Optimization: Fetch all active rates
     from ..db import RateEntry
-    all_rates = session.exec(select(RateEntry).where(RateEntry.active == True)).all()
+    all_rates = (await session.exec(select(RateEntry).where(RateEntry.active == True))).all()
     rate_map = {} # (part, machine) -> cycle_time
     part_rate_map = {} # part -> cycle_time (fallback)
     
+    machine_names = dict((await session.exec(select(Machine.id, Machine.display_name))).all())
     for r in all_rates:
-        key = (r.part_number, r.machine)
+        key = (r.part_number, r.machine_id if r.machine_id is not None else r.machine)
         ct = r.ideal_cycle_time_seconds
         if not ct and r.ideal_units_per_hour:
             ct = 3600.0 / r.ideal_units_per_hour
@@ -214,7 +226,7 @@ def downtime_analysis(
     machine_stats = {}
     
     for m in metrics:
-        machine = m.machine or "Unknown"
+        machine = m.machine_id if m.machine_id is not None else (m.machine or "Unknown")
         part = m.part_number
         
         downtime = 0
@@ -290,7 +302,7 @@ def downtime_analysis(
         sorted_details = sorted(stats["details"], key=lambda x: x["date"] or date.min, reverse=True)
 
         results.append({
-            "machine": machine,
+            "machine": machine_names.get(machine, machine) if isinstance(machine, int) else machine,
             "total_downtime": round(stats["downtime"], 1),
             "event_count": stats["events"],
             "avg_event_min": round(avg_len, 1),
@@ -302,30 +314,35 @@ def downtime_analysis(
     return sorted(results, key=lambda x: x["total_downtime"], reverse=True)[:limit]
         
 @router.get("/history", response_model=List[Dict[str, Any]])
-def get_operator_history(
+async def get_operator_history(
+    response: Response,
     operator: Optional[str] = None,
     part_number: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    limit: int = 100,
-    session: Session = Depends(get_session)
+    limit: int = Query(100, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Get raw OEE history entries for detailed analysis.
     Useful for 'Operator History' view.
+    Newest first; continue with the X-Next-Cursor header value as `cursor`.
     """
-    stmt = select(Oeemetric).order_by(Oeemetric.date.desc())
+    stmt = select(Oeemetric)
     
     if operator:
-        stmt = stmt.where(Oeemetric.operator == operator)
+        stmt = stmt.where(await dimension_filter(session, "operator", operator))
     if part_number:
-        stmt = stmt.where(Oeemetric.part_number == part_number)
+        stmt = stmt.where(await dimension_filter(session, "part", part_number))
     if start_date:
         stmt = stmt.where(Oeemetric.date >= start_date)
     if end_date:
         stmt = stmt.where(Oeemetric.date <= end_date)
         
-    metrics = session.exec(stmt.limit(limit)).all()
+    metrics, next_cursor = await keyset_page_async(session, stmt, [Oeemetric.date, Oeemetric.id], cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     results = []
     for m in metrics:
@@ -344,75 +361,67 @@ def get_operator_history(
     return results
 
 @router.get("/part-performance", response_model=Dict[str, Any])
-def get_part_performance(
+async def get_part_performance(
     part_number: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Compare operators for a specific part.
     Returns:
-    - box_plot: global average oee for this part
-    - operators: list of {name, average_oee, sample_size}
+    - global_average_oee and global_distribution (min, q1, median, q3, p90, max)
+    - operators: list of {operator, average_oee, sample_size, distribution}
+    Only (operator, oee) columns are fetched; the statistics for all operators
+    come from one NumPy pass (app/distributions.py).
     """
-    # 1. Get all metrics for this part in range
-    stmt = select(Oeemetric).where(Oeemetric.part_number == part_number)
+    stmt = select(Oeemetric.operator_id, Oeemetric.operator, func.coalesce(Oeemetric.oee, 0.0)).where(
+        await dimension_filter(session, "part", part_number)
+    )
     if start_date:
         stmt = stmt.where(Oeemetric.date >= start_date)
     if end_date:
         stmt = stmt.where(Oeemetric.date <= end_date)
-        
-    metrics = session.exec(stmt).all()
-    
-    # Filter excluded operators
-    # Filter excluded operators
-    metrics = [
-        m for m in metrics 
-        if m.operator and not any(ex in m.operator for ex in EXCLUDED_OPERATORS)
-    ]
-    
-    if not metrics:
+    # Excluded operators are flagged when metrics are written (app/operators.py)
+    stmt = stmt.where(Oeemetric.operator.is_not(None), Oeemetric.excluded == False)
+
+    rows = (await session.exec(stmt)).all()
+    if not rows:
         return {"global_average": 0, "operators": []}
-        
-    # 2. Calculate Global Average
-    global_sum = sum(m.oee or 0 for m in metrics)
-    global_count = len(metrics)
-    global_avg = global_sum / global_count if global_count > 0 else 0
-    
-    # 3. Group by Operator
-    op_stats = {}
-    for m in metrics:
-        op = m.operator or "Unknown"
-        if op not in op_stats:
-            op_stats[op] = {"sum": 0.0, "count": 0}
-        op_stats[op]["sum"] += (m.oee or 0)
-        op_stats[op]["count"] += 1
-        
-    # 4. Format Results
-    operator_results = []
-    for op, stats in op_stats.items():
-        operator_results.append({
-            "operator": op,
-            "average_oee": round(stats["sum"] / stats["count"], 4),
-            "sample_size": stats["count"]
-        })
-        
+
+    # Spellings of one operator share an id; unlinked rows group by their text
+    keys = [operator_id if operator_id is not None else name for operator_id, name, _ in rows]
+    values = [oee for _, _, oee in rows]
+    per_operator = group_distributions(keys, values)
+    overall = distribution(values)
+
+    ids = [k for k in per_operator if isinstance(k, int)]
+    names = dict((await session.exec(select(Operator.id, Operator.name).where(Operator.id.in_(ids)))).all()) if ids else {}
+    operator_results = [
+        {
+            "operator": names.get(key, key),
+            "average_oee": stats["mean"],
+            "sample_size": stats["count"],
+            "distribution": {name: stats[name] for name, _ in QUANTILES},
+        }
+        for key, stats in per_operator.items()
+    ]
     # Sort best to worst
     operator_results.sort(key=lambda x: x["average_oee"], reverse=True)
-    
+
     return {
         "part_number": part_number,
-        "global_average_oee": round(global_avg, 4),
-        "total_runs": global_count,
+        "global_average_oee": overall["mean"],
+        "global_distribution": {name: overall[name] for name, _ in QUANTILES},
+        "total_runs": overall["count"],
         "operators": operator_results
     }
 
 
 @router.get("/debug", response_model=Dict[str, Any])
-def debug_analytics(session: Session = Depends(get_session)):
+async def debug_analytics(session: AsyncSession = Depends(get_async_session)):
     """Debug Quality Logic trace."""
-    metrics = session.exec(select(Oeemetric).limit(50)).all()
+    metrics = (await session.exec(select(Oeemetric).limit(50))).all()
     
     details = []
     
@@ -441,50 +450,85 @@ def debug_analytics(session: Session = Depends(get_session)):
         
     return {"count": len(metrics), "details": details}
 
+def _breakdown_bucket(rows: Dict[Any, Dict[str, Any]], key, weighted_num, parts, oee_sum, count):
+    bucket = rows.setdefault(key, {"weighted_num": 0.0, "parts": 0, "oee_sum": 0.0, "samples": 0})
+    bucket["weighted_num"] += weighted_num or 0.0
+    bucket["parts"] += int(parts or 0)
+    bucket["oee_sum"] += oee_sum or 0.0
+    bucket["samples"] += count
+
+
+def _breakdown_row(name, bucket: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "oee": round(bucket["oee_sum"] / bucket["samples"], 4),
+        "weighted_oee": round(bucket["weighted_num"] / bucket["parts"], 4) if bucket["parts"] > 0 else 0.0,
+        "samples": bucket["samples"],
+        "total_parts": bucket["parts"],
+    }
+
+
 @router.get("/operator-breakdown", response_model=Dict[str, Any])
-def get_operator_breakdown(
+async def get_operator_breakdown(
     operator: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    query = select(Oeemetric).where(Oeemetric.operator == operator)
+    """
+    One operator's OEE per shift and per part (top 10 parts): simple mean,
+    OEE weighted by parts produced (as in /weekly), sample and part counts.
+    Both groupings come from one query: GROUPING SETS on Postgres, a UNION ALL
+    of the two GROUP BYs elsewhere.
+    """
+    parts = func.coalesce(Oeemetric.good_count, 0) + func.coalesce(Oeemetric.reject_count, 0)
+    oee = func.coalesce(Oeemetric.oee, 0.0)
+    sums = [func.sum(oee * parts).label("weighted_num"), func.sum(parts).label("parts"),
+            func.sum(oee).label("oee_sum"), func.count().label("samples")]
+    part_text = case((Oeemetric.part_id.is_(None), Oeemetric.part_number)).label("part_text")
+
+    filters = [await dimension_filter(session, "operator", operator)]
     if start_date:
-        query = query.where(Oeemetric.date >= start_date)
+        filters.append(Oeemetric.date >= start_date)
     if end_date:
-        query = query.where(Oeemetric.date <= end_date)
-    
-    metrics = session.exec(query).all()
-    
-    if not metrics:
+        filters.append(Oeemetric.date <= end_date)
+
+    if session.bind.dialect.name == "postgresql":
+        stmt = (
+            select(func.grouping(Oeemetric.shift).label("by_part"), Oeemetric.shift, Oeemetric.part_id, part_text, *sums)
+            .where(*filters)
+            .group_by(func.grouping_sets(tuple_(Oeemetric.shift), tuple_(Oeemetric.part_id, part_text)))
+        )
+    else:
+        no_id = literal(None, type_=Integer)
+        stmt = union_all(
+            select(literal(0).label("by_part"), Oeemetric.shift, no_id.label("part_id"), literal(None, type_=String).label("part_text"), *sums)
+            .where(*filters).group_by(Oeemetric.shift),
+            select(literal(1), literal(None, type_=String), Oeemetric.part_id, part_text, *sums)
+            .where(*filters).group_by(Oeemetric.part_id, part_text),
+        )
+    rows = (await session.exec(stmt)).all()
+
+    shifts: Dict[str, Dict[str, Any]] = {}
+    part_groups: Dict[Any, Dict[str, Any]] = {}
+    for by_part, shift, part_id, text, *values in rows:
+        if by_part:
+            _breakdown_bucket(part_groups, part_id if part_id is not None else (text or "Unknown"), *values)
+        else:
+            _breakdown_bucket(shifts, shift or "Unknown", *values)
+
+    if not shifts:
         return {"shift_performance": [], "part_performance": []}
 
-    # Shift Analysis
-    shifts = {}
-    for m in metrics:
-        s = m.shift or "Unknown"
-        if s not in shifts: shifts[s] = []
-        shifts[s].append(m.oee or 0)
-    
-    shift_data = []
-    for s, vals in shifts.items():
-        shift_data.append({"name": s, "oee": sum(vals)/len(vals)})
-    
-    # Part Analysis
-    parts = {}
-    for m in metrics:
-        p = m.part_number
-        if p not in parts: parts[p] = []
-        parts[p].append(m.oee or 0)
-        
-    part_data = []
-    for p, vals in parts.items():
-        part_data.append({"name": p, "oee": sum(vals)/len(vals), "samples": len(vals)})
-    
-    # Sort parts by OEE desc
-    part_data.sort(key=lambda x: x["oee"], reverse=True)
-    
+    shift_data = [_breakdown_row(name, bucket) for name, bucket in shifts.items()]
+
+    # Sort parts by OEE desc; names are looked up for the top 10 only
+    top = sorted(part_groups.items(), key=lambda item: item[1]["oee_sum"] / item[1]["samples"], reverse=True)[:10]
+    part_ids = [key for key, _ in top if isinstance(key, int)]
+    names = dict((await session.exec(select(Part.id, Part.name).where(Part.id.in_(part_ids)))).all()) if part_ids else {}
+    part_data = [_breakdown_row(names.get(key, key), bucket) for key, bucket in top]
+
     return {
         "shift_performance": shift_data,
-        "part_performance": part_data[:10] # Top 10 parts
+        "part_performance": part_data
     }
@@ -1,15 +1,21 @@
 import os
 import json
+import asyncio
+import threading
+import time
 import bcrypt
 import jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from sqlmodel import Session, select
 from app.database import get_session
 from app.db import User, AuditLog
+from app.cache import TTLCache
 
 router = APIRouter(tags=["auth"])
 
@@ -19,9 +25,57 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 7 days
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
+# Authenticated principals keyed by token subject (email), so protected calls
+# skip the User lookup. Entries are detached snapshots; user edits invalidate them.
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+principal_cache = TTLCache("principals", PRINCIPAL_CACHE_TTL)
+
 # ── Password Hashing Helpers ──
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt runs in its own small executor so a burst of logins at shift change
+# cannot take over the request threadpool the dashboards use.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", "64"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_lock = threading.Lock()
+_password_stats = {"pending": 0, "running": 0, "completed": 0, "rejected": 0, "max_pending": 0, "total_seconds": 0.0}
+
+def password_hash_stats() -> dict:
+    """Snapshot of the bcrypt executor: queue depth, in-flight jobs and totals."""
+    with _password_lock:
+        stats = dict(_password_stats)
+    stats["queued"] = stats["pending"] - stats["running"]
+    stats["workers"] = PASSWORD_HASH_WORKERS
+    stats["rounds"] = BCRYPT_ROUNDS
+    return stats
+
+def _submit_password_job(fn, *args):
+    """Queue a bcrypt call on the dedicated executor. Rejects with 503 once the queue is full."""
+    with _password_lock:
+        if _password_stats["pending"] >= PASSWORD_QUEUE_LIMIT:
+            _password_stats["rejected"] += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many sign-in requests, please retry")
+        _password_stats["pending"] += 1
+        _password_stats["max_pending"] = max(_password_stats["max_pending"], _password_stats["pending"])
+
+    def job():
+        with _password_lock:
+            _password_stats["running"] += 1
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with _password_lock:
+                _password_stats["running"] -= 1
+                _password_stats["pending"] -= 1
+                _password_stats["completed"] += 1
+                _password_stats["total_seconds"] += time.perf_counter() - started
+
+    return _password_executor.submit(job)
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     try:
         pw_bytes = plain_password.encode('utf-8')[:72]
         hash_bytes = hashed_password.encode('utf-8')
@@ -30,9 +84,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         print(f"Bcrypt verification error: {e}")
         return False
 
-def get_password_hash(password: str) -> str:
+def _hashpw(password: str) -> str:
     pw_bytes = password.encode('utf-8')[:72]
-    return bcrypt.hashpw(pw_bytes, bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(pw_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit_password_job(_checkpw, plain_password, hashed_password).result()
+
+def get_password_hash(password: str) -> str:
+    return _submit_password_job(_hashpw, password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit_password_job(_checkpw, plain_password, hashed_password))
+
+async def get_password_hash_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit_password_job(_hashpw, password))
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError, AttributeError):
+        return False
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -46,6 +119,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 # ── Dependency Guards ──
 
+def _load_principal(email: str, session: Session) -> Optional[User]:
+    """Resolve a token subject to a User, served from the principal cache when fresh."""
+    cached = principal_cache.get(email)
+    if cached is not None:
+        return cached
+    user = session.exec(select(User).where(User.email == email)).first()
+    if user is None:
+        return None
+    # Snapshot so the cached copy never touches (or is expired by) this session
+    snapshot = User(**user.model_dump())
+    principal_cache.set(email, snapshot)
+    return snapshot
+
+def invalidate_principal(*emails: Optional[str]):
+    for email in emails:
+        if email:
+            principal_cache.invalidate(email)
+
 def get_optional_user(token: Optional[str] = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> Optional[User]:
     if not token:
         return None
@@ -56,8 +147,7 @@ def get_optional_user(token: Optional[str] = Depends(oauth2_scheme), session: Se
             return None
     except jwt.PyJWTError:
         return None
-    user = session.exec(select(User).where(User.email == email)).first()
-    return user
+    return _load_principal(email, session)
 
 def get_current_user(token: Optional[str] = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
     if not token:
@@ -70,7 +160,7 @@ def get_current_user(token: Optional[str] = Depends(oauth2_scheme), session: Ses
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user = session.exec(select(User).where(User.email == email)).first()
+    user = _load_principal(email, session)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
@@ -146,10 +236,18 @@ class UserOut(BaseModel):
 # ── Endpoints ──
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+    # Async so that waiting on bcrypt does not hold a threadpool thread;
+    # DB work is pushed to the threadpool explicitly.
+    user = await run_in_threadpool(lambda: session.exec(select(User).where(User.email == form_data.username)).first())
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Transparent rehash when BCRYPT_ROUNDS changed since this hash was made
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(form_data.password)
+        user.updated_at = datetime.utcnow()
+        session.add(user)  # committed with the login audit entry below
     
     # Parse allowed_pages from JSON string
     allowed_pages = None
@@ -167,14 +265,15 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = D
         "allowed_pages": allowed_pages
     }, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     
-    log_action(session, user, "login")
-    return {
+    result = {
         "access_token": access_token,
         "token_type": "bearer",
         "role": user.role,
         "shift_scope": user.shift_scope,
         "allowed_pages": allowed_pages
     }
+    await run_in_threadpool(log_action, session, user, "login")
+    return result
 
 @router.get("/me")
 def get_me(current_user: User = Depends(get_current_user)):
@@ -196,6 +295,11 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 # ── Admin-Only User CRUD ──
 
+@router.get("/password-pool")
+def get_password_pool_stats(current_user: User = Depends(require_role("admin"))):
+    """Queue depth and throughput of the bcrypt executor (admin only)."""
+    return password_hash_stats()
+
 @router.get("/users", response_model=List[UserOut])
 def list_users(current_user: User = Depends(require_role("admin")), session: Session = Depends(get_session)):
     """List all users (admin only)."""
@@ -257,6 +361,7 @@ def update_user(user_id: int, data: UserUpdate, current_user: User = Depends(req
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    old_email = user.email
     if data.email is not None:
         dup = session.exec(select(User).where(User.email == data.email)).first()
         if dup and dup.id != user_id:
@@ -277,6 +382,7 @@ def update_user(user_id: int, data: UserUpdate, current_user: User = Depends(req
     session.add(user)
     session.commit()
     session.refresh(user)
+    invalidate_principal(old_email, user.email)
     
     log_action(session, current_user, "update_user", details=f"Updated user {user.email} (id={user_id})")
     
@@ -309,6 +415,7 @@ def delete_user(user_id: int, current_user: User = Depends(require_role("admin")
     email = user.email
     session.delete(user)
     session.commit()
+    invalidate_principal(email)
     
     log_action(session, current_user, "delete_user", details=f"Deleted user {email} (id={user_id})")
     
@@ -0,0 +1,224 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session, select
+from sqlalchemy import update
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from pydantic import BaseModel
+import json
+
+from ..db import BoardRecord, User
+from ..database import get_session
+from ..events import publish
+from .auth import get_current_user
+
+router = APIRouter()
+
+# Record kinds. Keys: board -> "main"; category/machine -> their id;
+# machine_shift -> "<machine id>:<shift>"; notes -> "<shift>".
+RECORD_KINDS = {"board", "category", "machine", "machine_shift", "notes"}
+# Holds the board-wide revision counter in `version`; never returned to clients
+_META = ("_meta", "revision")
+
+
+class BoardChange(BaseModel):
+    kind: str
+    key: str
+    # Version the client last saw; omit to create a new record
+    version: Optional[int] = None
+    # Fields to set; a null value removes the field
+    data: Dict[str, Any] = {}
+    delete: bool = False
+
+
+class BoardPatch(BaseModel):
+    changes: List[BoardChange]
+    # Client's last known revision: the response then carries every record
+    # changed since, not just the ones in this patch
+    since: Optional[int] = None
+
+
+def record_dict(record: BoardRecord) -> Dict[str, Any]:
+    return {
+        "kind": record.kind,
+        "key": record.key,
+        "version": record.version,
+        "revision": record.revision,
+        "deleted": record.deleted,
+        "data": json.loads(record.data or "{}"),
+        "updated_by": record.updated_by,
+    }
+
+
+def record_shift(kind: str, key: str) -> Optional[str]:
+    if kind == "machine_shift":
+        return key.rsplit(":", 1)[-1]
+    if kind == "notes":
+        return key
+    return None
+
+
+def current_revision(session: Session) -> int:
+    meta = session.get(BoardRecord, _META)
+    return meta.version if meta else 0
+
+
+def next_revision(session: Session) -> int:
+    """Bump the board-wide counter. The UPDATE row lock serializes concurrent
+    patches until commit, so revisions are handed out in commit order."""
+    result = session.exec(
+        update(BoardRecord)
+        .where(BoardRecord.kind == _META[0], BoardRecord.key == _META[1])
+        .values(version=BoardRecord.version + 1)
+    )
+    if result.rowcount == 0:
+        session.add(BoardRecord(kind=_META[0], key=_META[1], version=1, revision=0))
+        session.flush()
+        return 1
+    return session.exec(select(BoardRecord.version).where(BoardRecord.kind == _META[0], BoardRecord.key == _META[1])).one()
+
+
+def changed_since(session: Session, since: int) -> List[BoardRecord]:
+    return session.exec(
+        select(BoardRecord)
+        .where(BoardRecord.revision > since, BoardRecord.kind != _META[0])
+        .order_by(BoardRecord.revision)
+    ).all()
+
+
+def _authorize(change: BoardChange, user: User):
+    if user.role not in ("admin", "manager", "supervisor"):
+        raise HTTPException(status_code=403, detail="Not authorized to update board state")
+    if change.kind in ("board", "category") and user.role == "supervisor" and change.delete:
+        raise HTTPException(status_code=403, detail="Only managers can remove categories")
+    shift = record_shift(change.kind, change.key)
+    if shift and user.role == "supervisor" and user.shift_scope and user.shift_scope != shift:
+        raise HTTPException(status_code=403, detail=f"You can only modify scope: '{user.shift_scope}'")
+
+
+def apply_changes(session: Session, changes: List[BoardChange], user_email: Optional[str]) -> List[BoardRecord]:
+    """Apply all changes or none. Raises 409 listing the current state of every
+    record whose version no longer matches what the client based its edit on."""
+    keys = [(c.kind, c.key) for c in changes]
+    if len(set(keys)) != len(keys):
+        duplicates = sorted({f"{kind}/{key}" for kind, key in keys if keys.count((kind, key)) > 1})
+        raise HTTPException(status_code=400, detail=f"Board record changed more than once: {', '.join(duplicates)}")
+
+    # Take the revision lock before reading, so the versions checked below
+    # cannot move until this patch commits or rolls back
+    revision = next_revision(session)
+    existing = {(r.kind, r.key): r for r in (session.get(BoardRecord, k, populate_existing=True) for k in keys) if r is not None}
+
+    conflicts = []
+    for change in changes:
+        record = existing.get((change.kind, change.key))
+        live = record is not None and not record.deleted
+        if change.version is None:
+            if live:
+                conflicts.append(record)
+        elif record is None or record.version != change.version:
+            if record is not None:
+                conflicts.append(record)
+            else:
+                raise HTTPException(status_code=404, detail=f"Board record {change.kind}/{change.key} not found")
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Board changed since it was loaded", "conflicts": [record_dict(r) for r in conflicts]},
+        )
+
+    now = datetime.utcnow()
+    written = []
+    for change in changes:
+        record = existing.get((change.kind, change.key))
+        if record is None:
+            record = BoardRecord(kind=change.kind, key=change.key, data="{}", version=0)
+            existing[(change.kind, change.key)] = record
+        if record.deleted and not change.delete:
+            # Re-created after a delete: start from a clean record
+            record.data = "{}"
+        data = json.loads(record.data or "{}")
+        for field, value in change.data.items():
+            if value is None:
+                data.pop(field, None)
+            else:
+                data[field] = value
+        record.data = json.dumps(data)
+        record.deleted = change.delete
+        record.version += 1
+        record.revision = revision
+        record.updated_by = user_email
+        record.updated_at = now
+        session.add(record)
+        written.append(record)
+    return written
+
+
+@router.get("/")
+def get_board(since: Optional[int] = None, session: Session = Depends(get_session)):
+    """Whole board (live records), or with `since` only the records changed
+    after that revision, including deletions."""
+    if since is not None:
+        records = changed_since(session, since)
+    else:
+        records = session.exec(
+            select(BoardRecord).where(BoardRecord.deleted == False, BoardRecord.kind != _META[0])
+        ).all()
+    return {"revision": current_revision(session), "records": [record_dict(r) for r in records]}
+
+
+@router.patch("/")
+def patch_board(patch: BoardPatch, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+    """Create, update or delete board records in one transaction.
+
+    Each change names the record version it was based on; if any record has
+    moved on, nothing is written and 409 returns the current copies.
+    """
+    if not patch.changes:
+        raise HTTPException(status_code=400, detail="No changes")
+    for change in patch.changes:
+        if change.kind not in RECORD_KINDS or not change.key:
+            raise HTTPException(status_code=400, detail=f"Invalid board record {change.kind}/{change.key}")
+        _authorize(change, current_user)
+
+    written = apply_changes(session, patch.changes, current_user.email)
+    publish(session, "board", {
+        "revision": written[0].revision,
+        "records": [{"kind": r.kind, "key": r.key, "version": r.version, "deleted": r.deleted} for r in written],
+    })
+    session.commit()
+
+    records = changed_since(session, patch.since) if patch.since is not None else written
+    return {"revision": current_revision(session), "records": [record_dict(r) for r in records]}
+
+
+def import_legacy_state(session: Session, state: Dict[str, Any]) -> int:
+    """Split the old `production_board_state` Setting blob into board records."""
+    changes: List[BoardChange] = []
+    categories = state.get("categories") or []
+    # Same clean-up the board page used to do on load: 'Day Shift' became '1st Shift'
+    rename = lambda shift: "1st Shift" if shift == "Day Shift" else shift
+    current_shift = rename(state.get("currentShift") or "1st Shift")
+    changes.append(BoardChange(kind="board", key="main", data={
+        "currentShift": current_shift,
+        "categoryOrder": [c["id"] for c in categories],
+    }))
+    for cat in categories:
+        machines = cat.get("machines") or []
+        changes.append(BoardChange(kind="category", key=cat["id"], data={
+            "name": cat.get("name", ""), "machineOrder": [m["id"] for m in machines],
+        }))
+        for mac in machines:
+            fields = {k: mac.get(k) for k in ("name", "status", "notes", "part", "sinceTime")}
+            changes.append(BoardChange(kind="machine", key=mac["id"], data={k: v for k, v in fields.items() if v is not None}))
+            # Boards saved before per-shift operators only have `operator`
+            operators = mac.get("shiftOperators") or ({current_shift: mac["operator"]} if mac.get("operator") else {})
+            merged: Dict[str, str] = {}
+            for shift, operator in sorted(operators.items(), key=lambda kv: kv[0] == "Day Shift"):
+                if operator:
+                    merged.setdefault(rename(shift), operator)
+            for shift, operator in merged.items():
+                changes.append(BoardChange(kind="machine_shift", key=f"{mac['id']}:{shift}", data={"operator": operator}))
+    if state.get("shiftNotes"):
+        changes.append(BoardChange(kind="notes", key=current_shift, data=state["shiftNotes"]))
+    apply_changes(session, changes, "migration")
+    return len(changes)
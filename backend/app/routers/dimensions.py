@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, select
+from typing import List
+from pydantic import BaseModel
+
+from ..db import DimensionAlias
+from ..database import get_session
+from ..dimensions import DIMENSIONS, add_aliases
+from .auth import require_role
+
+router = APIRouter()
+
+
+class AliasRequest(BaseModel):
+    names: List[str]
+
+
+def _dimension(kind: str):
+    if kind not in DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown dimension '{kind}'")
+    return DIMENSIONS[kind]
+
+
+def _with_aliases(session: Session, kind: str, rows) -> List[dict]:
+    aliases = {}
+    ids = [r.id for r in rows]
+    if ids:
+        for key, target in session.exec(
+            select(DimensionAlias.key, DimensionAlias.target_id)
+            .where(DimensionAlias.kind == kind, DimensionAlias.target_id.in_(ids))
+        ).all():
+            aliases.setdefault(target, []).append(key)
+    return [{"id": r.id, "name": r.name, "key": r.key, "aliases": sorted(aliases.get(r.id, []))} for r in rows]
+
+
+@router.get("/{kind}")
+def list_dimension(kind: str, session: Session = Depends(get_session)):
+    """Operators, parts or jobs with the alias keys that resolve to them."""
+    model = _dimension(kind).model
+    rows = session.exec(select(model).order_by(model.name)).all()
+    return _with_aliases(session, kind, rows)
+
+
+@router.post("/{kind}/{item_id}/aliases", dependencies=[Depends(require_role("admin", "manager"))])
+def add_dimension_aliases(kind: str, item_id: int, payload: AliasRequest, session: Session = Depends(get_session)):
+    """Resolve more spellings to this row; spellings with rows of their own are
+    merged into it (their entries, rates and metrics move here)."""
+    model = _dimension(kind).model
+    item = session.get(model, item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+    merged = add_aliases(session, kind, item_id, payload.names)
+    session.commit()
+    session.refresh(item)
+    return {**_with_aliases(session, kind, [item])[0], "merged_ids": merged}
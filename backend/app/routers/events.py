@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from ..events import event_stream
+
+router = APIRouter()
+
+
+@router.get("/")
+async def stream_events(since: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """Server-sent change events: `board`, `report_calculated`, `report_deleted`,
+    `rates_changed`, and `resync` when the client must re-fetch everything.
+
+    A reconnecting EventSource sends Last-Event-ID and gets the events it
+    missed; `since` does the same for a first connection.
+    """
+    after_id = since
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+    return StreamingResponse(
+        event_stream(after_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
+from sqlmodel import Session, select
+from typing import List, Optional
+from pydantic import BaseModel
+import json
+
+from ..db import Machine, Oeemetric, RateEntry, ReportEntry
+from ..database import get_session
+from ..machines import MACHINE_TYPES, MachineRegistry, machine_aliases, machine_key
+from .auth import require_role
+
+router = APIRouter()
+
+
+def machine_dict(machine: Machine) -> dict:
+    return {
+        "id": machine.id,
+        "key": machine.key,
+        "display_name": machine.display_name,
+        "machine_type": machine.machine_type,
+        "aliases": machine_aliases(machine),
+    }
+
+
+class MachineUpdate(BaseModel):
+    display_name: Optional[str] = None
+    machine_type: Optional[str] = None
+    aliases: Optional[List[str]] = None
+
+
+class MachineMerge(BaseModel):
+    source_ids: List[int]
+
+
+def _get_machine(session: Session, machine_id: int) -> Machine:
+    machine = session.get(Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    return machine
+
+
+@router.get("/")
+def list_machines(session: Session = Depends(get_session)):
+    machines = session.exec(select(Machine).order_by(Machine.display_name)).all()
+    return [machine_dict(m) for m in machines]
+
+
+@router.put("/{machine_id}", dependencies=[Depends(require_role("admin", "manager"))])
+def update_machine(machine_id: int, payload: MachineUpdate, session: Session = Depends(get_session)):
+    machine = _get_machine(session, machine_id)
+    if payload.machine_type is not None and payload.machine_type not in MACHINE_TYPES:
+        raise HTTPException(status_code=400, detail=f"machine_type must be one of {', '.join(MACHINE_TYPES)}")
+
+    # A name may only resolve to one machine
+    registry = MachineRegistry(session)
+    names = [payload.display_name or machine.display_name] + (payload.aliases or [])
+    taken = [n for n in names if registry.lookup(n) not in (None, machine.id)]
+    if taken:
+        raise HTTPException(status_code=409, detail=f"Already used by another machine: {', '.join(taken)}")
+
+    if payload.display_name:
+        machine.display_name = payload.display_name.strip()
+    if payload.machine_type is not None:
+        machine.machine_type = payload.machine_type
+    if payload.aliases is not None:
+        machine.aliases = json.dumps([a.strip() for a in payload.aliases if machine_key(a)])
+    session.add(machine)
+    session.commit()
+    session.refresh(machine)
+    return machine_dict(machine)
+
+
+@router.post("/{machine_id}/merge", dependencies=[Depends(require_role("admin", "manager"))])
+def merge_machines(machine_id: int, payload: MachineMerge, session: Session = Depends(get_session)):
+    """Fold duplicate machines into this one: their rows and names move here.
+    Stored metrics keep their values until their reports are recalculated."""
+    target = _get_machine(session, machine_id)
+    sources = [_get_machine(session, i) for i in payload.source_ids if i != machine_id]
+    if not sources:
+        return machine_dict(target)
+
+    source_ids = [s.id for s in sources]
+    for model in (ReportEntry, RateEntry, Oeemetric):
+        session.exec(update(model).where(model.machine_id.in_(source_ids)).values(machine_id=target.id))
+
+    aliases = machine_aliases(target)
+    for source in sources:
+        for name in [source.key, source.display_name, *machine_aliases(source)]:
+            if name not in aliases:
+                aliases.append(name)
+        session.delete(source)
+    target.aliases = json.dumps(aliases)
+    session.add(target)
+    session.commit()
+    session.refresh(target)
+    return machine_dict(target)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, update
 from sqlmodel import Session, select
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date
+from pydantic import BaseModel
 
 from ..db import (
     RateEntry,
@@ -11,6 +13,14 @@ from ..db import (
     Setting,
 )
 from ..database import get_session
+from ..responses import ORJSONResponse, table_rows
+from ..snapshots import invalidate_weeks
+from ..events import publish
+from ..catalog import add_pairs, machine_parts
+from ..machines import MachineRegistry
+from ..dimensions import assign_dimensions
+from ..operators import mark_excluded
+from ..skills import apply_skill_delta, metric_contributions, suggest, suggest_many
 
 router = APIRouter()
 
@@ -58,18 +68,31 @@ def compute_oee(
 
 
 # Helper to match rate candidates
-def match_rate_candidate(candidates: List[RateEntry], target_mode: int, target_machine_norm: str, strict_machine: bool = False) -> Optional[RateEntry]:
+def match_rate_candidate(candidates: List[RateEntry], target_mode: int, target_machine_norm: str, strict_machine: bool = False,
+                         target_machine_id: Optional[int] = None, machine_types: Optional[Dict[int, Optional[str]]] = None) -> Optional[RateEntry]:
+    """Pick the rate for a machine and run mode. With registry ids, machines compare
+    by id and type; rows without ids fall back to the old name comparison."""
+    def same_machine(c: RateEntry) -> bool:
+        if target_machine_id is not None and c.machine_id is not None:
+            return c.machine_id == target_machine_id
+        return (c.machine or "").strip().lower() == target_machine_norm
+
     # 1. Exact Match (Machine + Mode)
     for c in candidates:
         c_mode = c.run_mode_id if hasattr(c, 'run_mode_id') else 1
         if c_mode != target_mode: continue
-        
-        c_machine = (c.machine or "").strip().lower()
-        if c_machine == target_machine_norm:
+        if same_machine(c):
             return c
     
     # 2. Machine Type Match (if not strict)
     if not strict_machine:
+        target_type = (machine_types or {}).get(target_machine_id)
+        if target_type:
+            for c in candidates:
+                c_mode = c.run_mode_id if hasattr(c, 'run_mode_id') else 1
+                if c_mode == target_mode and machine_types.get(c.machine_id) == target_type:
+                    return c
+
         is_assy = "asy" in target_machine_norm or "assembly" in target_machine_norm
         for c in candidates:
             c_mode = c.run_mode_id if hasattr(c, 'run_mode_id') else 1
@@ -81,6 +104,34 @@ def match_rate_candidate(candidates: List[RateEntry], target_mode: int, target_m
                 return c
     return None
 
+# Columns a recalculation writes; id and report_id identify the row
+METRIC_FIELDS = tuple(c.name for c in Oeemetric.__table__.columns if c.name not in ("id", "report_id"))
+
+def metric_key(m: Oeemetric) -> tuple:
+    """The aggregation key of calculate_report_metrics_logic as stored on a metric."""
+    return (m.date, m.operator, m.machine_id if m.machine_id is not None else m.machine, m.part_number, m.shift, m.job)
+
+def diff_metrics(stored: List[Oeemetric], metrics: List[Oeemetric]):
+    """Match freshly computed metrics to a report's stored ones by aggregation key.
+    Returns (metrics to insert, [(stored, new, changed columns with id)] to update,
+    stored metrics to delete); identical rows appear in none of them."""
+    by_key: Dict[tuple, List[Oeemetric]] = {}
+    for m in stored:
+        by_key.setdefault(metric_key(m), []).append(m)
+    inserts, updates = [], []
+    for m in metrics:
+        # Run modes of one shift share a key; they pair up in calculation order
+        same_key = by_key.get(metric_key(m))
+        if not same_key:
+            inserts.append(m)
+            continue
+        old = same_key.pop(0)
+        changes = {f: getattr(m, f) for f in METRIC_FIELDS if getattr(old, f) != getattr(m, f)}
+        if changes:
+            updates.append((old, m, {"id": old.id, **changes}))
+    deletes = [m for rows in by_key.values() for m in rows]
+    return inserts, updates, deletes
+
 def calculate_report_metrics_logic(report_id: int, session: Session):
     """Core logic to calculate metrics for a report. Can be called by API or Background Task."""
 
@@ -89,35 +140,34 @@ def calculate_report_metrics_logic(report_id: int, session: Session):
         print(f"Report {report_id} not found during calculation.")
         return 0, 0, []
 
-    # Cascade delete existing metrics to ensure clean slate (Retroactive Fix)
-    from sqlmodel import delete
-    try:
-        session.exec(delete(Oeemetric).where(Oeemetric.report_id == report_id))
-        session.flush()
-    except Exception as e:
-        print(f"Error clearing metrics for report {report_id}: {e}")
-
-    # Fetch all entries for this report
+    # Fetch all entries for this report (none left: the stored metrics are all deleted below)
     entries = session.exec(select(ReportEntry).where(ReportEntry.report_id == report_id)).all()
-    if not entries:
-        return 0, 0, []
 
     skipped_count = 0
     metrics_to_save = []
     missing_rates_info = set()
     
+    machines = MachineRegistry(session)
+
     # Aggregation Phase
     try:
         aggregated = {}
         for entry in entries:
-            # Key now includes run_mode_id to distinguish modes in same shift
+            if entry.machine_id is None and entry.machine:
+                # Rows stored before the registry existed (or edited outside the API)
+                entry.machine_id = machines.resolve(entry.machine)
+                session.add(entry)
+            # Key now includes run_mode_id to distinguish modes in same shift;
+            # spellings of the same registered machine aggregate together
             run_mode = entry.run_mode_id if hasattr(entry, 'run_mode_id') and entry.run_mode_id else 1
-            key = (entry.date, entry.operator, entry.machine, entry.part_number, entry.shift, entry.job, run_mode)
+            machine_ref = entry.machine_id if entry.machine_id is not None else entry.machine
+            key = (entry.date, entry.operator, machine_ref, entry.part_number, entry.shift, entry.job, run_mode)
             if key not in aggregated:
                 aggregated[key] = {
                     "date": entry.date,
                     "operator": entry.operator,
                     "machine": entry.machine,
+                    "machine_id": entry.machine_id,
                     "part_number": entry.part_number,
                     "shift": entry.shift,
                     "job": entry.job,
@@ -176,12 +226,16 @@ def calculate_report_metrics_logic(report_id: int, session: Session):
         target_machine_norm = (data["machine"] or "").strip().lower()
 
 
+        target_machine_id = data["machine_id"]
+
         # A) Try Specific Run Mode
-        rate = match_rate_candidate(candidates, target_mode, target_machine_norm)
+        rate = match_rate_candidate(candidates, target_mode, target_machine_norm,
+                                    target_machine_id=target_machine_id, machine_types=machines.types)
 
         # B) Try STANDARD Run Mode (Fallback)
         if not rate and target_mode != 1:
-            rate = match_rate_candidate(candidates, 1, target_machine_norm) # Try Standard
+            rate = match_rate_candidate(candidates, 1, target_machine_norm,
+                                        target_machine_id=target_machine_id, machine_types=machines.types) # Try Standard
 
 
             if rate:
@@ -265,6 +319,7 @@ def calculate_report_metrics_logic(report_id: int, session: Session):
             report_id=report_id,
             operator=data["operator"],
             machine=data["machine"],
+            machine_id=data["machine_id"],
             part_number=data["part_number"],
             job=data["job"],
             shift=data["shift"],
@@ -275,15 +330,51 @@ def calculate_report_metrics_logic(report_id: int, session: Session):
             oee=oee_vals["oee"],
             confidence="low" if missing_rate_warning else "high",
             diagnostics_json=json.dumps(diagnostics),
+            good_count=data["good_count"],
+            reject_count=data["reject_count"],
+            run_time_min=data["run_time_min"],
+            downtime_min=data["downtime_min"],
         )
         metrics_to_save.append(metric)
 
     try:
-        session.bulk_save_objects(metrics_to_save)
+        mark_excluded(session, metrics_to_save)
+        assign_dimensions(session, metrics_to_save)
+        stored = session.exec(select(Oeemetric).where(Oeemetric.report_id == report_id).order_by(Oeemetric.id)).all()
+        inserts, updates, deletes = diff_metrics(stored, metrics_to_save)
+
+        # Weeks, skill matrix and listeners only hear about the rows that changed
+        old_rows = [old for old, _, _ in updates] + deletes
+        new_rows = inserts + [new for _, new, _ in updates]
+        changed_dates = {m.date for m in old_rows + new_rows}
+        invalidate_weeks(session, changed_dates)
+        apply_skill_delta(session, metric_contributions(old_rows), metric_contributions(new_rows))
+
+        deleted_ids = [m.id for m in deletes]
+        for i in range(0, len(deleted_ids), 500):
+            session.exec(delete(Oeemetric).where(Oeemetric.id.in_(deleted_ids[i:i + 500])))
+        # Grouped by changed columns so each executemany has one statement shape
+        by_columns = {}
+        for _, _, changes in updates:
+            by_columns.setdefault(tuple(sorted(changes)), []).append(changes)
+        for batch in by_columns.values():
+            session.exec(update(Oeemetric), params=batch)
+        session.bulk_save_objects(inserts)
+
+        add_pairs(session, ((m.machine, m.part_number) for m in metrics_to_save))
+        if changed_dates:
+            publish(session, "report_calculated", {
+                "report_id": report_id,
+                "metrics": len(metrics_to_save),
+                "start_date": min(changed_dates),
+                "end_date": max(changed_dates),
+            })
         session.commit()
-    except Exception as e:
-        print(f"Database Save Error: {str(e)}")
-        
+    except Exception:
+        # Nothing half-written stays in the session; the caller reports the failure
+        session.rollback()
+        raise
+
     return len(metrics_to_save), skipped_count, sorted(list(missing_rates_info))
 
 
@@ -308,10 +399,10 @@ def calculate_metrics(report_id: int, session: Session = Depends(get_session)):
         "missing_rates": missing
     }
 
-@router.get("/report/{report_id}", response_model=List[Oeemetric])
+@router.get("/report/{report_id}", response_model=List[Oeemetric], response_class=ORJSONResponse)
 def get_metrics(report_id: int, session: Session = Depends(get_session)):
-    metrics = session.exec(select(Oeemetric).where(Oeemetric.report_id == report_id)).all()
-    return metrics
+    metrics = table_rows(session, Oeemetric, Oeemetric.report_id == report_id, order_by=Oeemetric.id)
+    return ORJSONResponse(metrics)
 
 def safe_float(val: str, default: float) -> float:
     if not val or val == "undefined" or val == "null":
@@ -321,8 +412,7 @@ def safe_float(val: str, default: float) -> float:
     except ValueError:
         return default
 
-@router.get("/stats", response_model=Dict[str, Any])
-
+@router.get("/stats", response_model=Dict[str, Any], response_class=ORJSONResponse)
 def get_dashboard_stats(report_id: int = None, session: Session = Depends(get_session)):
     """Aggregate metrics for the dashboard. Default: Latest Report. Includes Sparklines & Insights."""
     stmt = select(Oeemetric)
@@ -354,10 +444,10 @@ def get_dashboard_stats(report_id: int = None, session: Session = Depends(get_se
             if report and report.uploaded_at:
                 current_report_date = report.uploaded_at.strftime("%Y-%m-%d")
         else:
-            return {
+            return ORJSONResponse({
                 "oee": 0, "availability": 0, "performance": 0, "quality": 0,
                 "recent_activity": [], "db_row_count": 0, "sparkline_data": {}, "insights": []
-            }
+            })
 
     metrics = session.exec(stmt).all()
     
@@ -695,7 +785,8 @@ def get_dashboard_stats(report_id: int = None, session: Session = Depends(get_se
         if count >= 2:
             action_log['recurring_downtime'].append(f"Investigate {mach}: {count} significant downtime events.")
 
-    return {
+    # Built from trusted DB rows; skip response_model re-validation
+    return ORJSONResponse({
         "oee": round(avg_oee * 100, 1),
         "availability": round(avg_avail * 100, 1),
         "performance": round(avg_perf * 100, 1),
@@ -712,169 +803,37 @@ def get_dashboard_stats(report_id: int = None, session: Session = Depends(get_se
             "performance": perf_target,
             "quality": qual_target
         }
-    }
-
-def _normalize_machine_name(raw: str) -> str:
-    """Normalize coded machine names to match Production Board display names.
-    Examples: ASY01 -> Assy 1, INJ34 -> Inj 34, CMP09 -> Cmp 09, INSP1 -> Insp 1
-    """
-    import re
-    raw = raw.strip()
-    # Try to match common patterns: prefix letters + numeric suffix
-    m = re.match(r'^(ASY|ASSY)(\d+)$', raw, re.IGNORECASE)
-    if m:
-        num = str(int(m.group(2)))  # strip leading zeros
-        return f"Assy {num}"
-    m = re.match(r'^(INJ)(\d+)$', raw, re.IGNORECASE)
-    if m:
-        num = str(int(m.group(2)))
-        return f"Inj {num}"
-    m = re.match(r'^(CMP)(\d+)$', raw, re.IGNORECASE)
-    if m:
-        num = str(int(m.group(2)))
-        return f"Cmp {num}"
-    m = re.match(r'^(INSP)(\d+)$', raw, re.IGNORECASE)
-    if m:
-        num = str(int(m.group(2)))
-        return f"Insp {num}"
-    # Return as-is if no pattern matched
-    return raw
+    })
 
 @router.get("/machine-parts-history", response_model=Dict[str, List[str]])
 def get_machine_parts_history(session: Session = Depends(get_session)):
-    """Returns a dictionary mapping machine names to lists of historical parts run on them.
-    Queries oeemetric, rateentry, and reportentry tables and normalizes machine names."""
-    history: Dict[str, set] = {}
-
-    def _add(machine: str, part: str):
-        if not machine or not part:
-            return
-        machine = _normalize_machine_name(machine)
-        part = part.strip()
-        if not part:
-            return
-        if machine not in history:
-            history[machine] = set()
-        history[machine].add(part)
-
-    # 1. OEE Metrics (computed results)
-    try:
-        stmt1 = select(Oeemetric.machine, Oeemetric.part_number).distinct()
-        for machine, part in session.exec(stmt1).all():
-            _add(machine, part)
-    except Exception:
-        pass
+    """Returns a dictionary mapping board machine names to lists of historical parts run on them.
+    Served from the machine/part catalog (one indexed read, cached per catalog version)."""
+    return machine_parts(session)
 
-    # 2. Rate Entries (rate standards)
-    try:
-        stmt2 = select(RateEntry.machine, RateEntry.part_number).distinct()
-        for machine, part in session.exec(stmt2).all():
-            _add(machine, part)
-    except Exception:
-        pass
+@router.get("/suggest-operator")
+def suggest_operator(machine: str, part: str, limit: Optional[int] = Query(None, ge=1), session: Session = Depends(get_session)):
+    """Suggests the best operators for a specific machine and part combination.
+    Ranked by avg OEE x avg quality x experience (runs, capped at 5) from the operator skill matrix."""
+    return suggest(session, machine, part, limit)
 
-    # 3. Report Entries (raw uploaded data)
-    try:
-        stmt3 = select(ReportEntry.machine, ReportEntry.part_number).distinct()
-        for machine, part in session.exec(stmt3).all():
-            _add(machine, part)
-    except Exception:
-        pass
 
-    # Convert sets to sorted lists
-    return {k: sorted(list(v)) for k, v in history.items()}
+class SuggestPair(BaseModel):
+    machine: str
+    part: str
 
-@router.get("/suggest-operator")
-def suggest_operator(machine: str, part: str, session: Session = Depends(get_session)):
-    """Suggests the best operator for a specific machine and part combination.
-    Queries both oeemetric and reportentry tables, normalizing machine names for matching."""
-    from sqlalchemy import func
-    import re
-
-    # Build a set of possible machine name variants to match against
-    # e.g. "Inj 12" could be stored as "INJ12", "Inj12", "Inj 12", etc.
-    machine_variants = {machine.strip()}
-    # Generate coded variant: "Inj 12" -> "INJ12"
-    m = re.match(r'^(Assy|Inj|Cmp|Insp)\s*(\d+)$', machine.strip(), re.IGNORECASE)
-    if m:
-        prefix_map = {'assy': 'ASY', 'inj': 'INJ', 'cmp': 'CMP', 'insp': 'INSP'}
-        coded = prefix_map.get(m.group(1).lower(), m.group(1).upper()) + m.group(2).zfill(2)
-        machine_variants.add(coded)
-        machine_variants.add(coded.upper())
-        # Also add zero-padded display variant
-        machine_variants.add(f"{m.group(1)} {m.group(2)}")
-
-    operator_stats: dict = {}  # operator -> { total_oee, total_quality, runs }
-
-    def _accumulate(op, oee_val, quality_val, runs_val):
-        if not op or op.strip() == "":
-            return
-        op = op.strip()
-        if op not in operator_stats:
-            operator_stats[op] = {"total_oee": 0, "total_quality": 0, "runs": 0}
-        operator_stats[op]["total_oee"] += (oee_val or 0) * runs_val
-        operator_stats[op]["total_quality"] += (quality_val or 0) * runs_val
-        operator_stats[op]["runs"] += runs_val
-
-    # 1. Query Oeemetric
-    try:
-        for variant in machine_variants:
-            stmt1 = (
-                select(
-                    Oeemetric.operator,
-                    func.avg(Oeemetric.oee).label("avg_oee"),
-                    func.avg(Oeemetric.quality).label("avg_quality"),
-                    func.count(Oeemetric.id).label("runs")
-                )
-                .where(Oeemetric.machine == variant)
-                .where(Oeemetric.part_number == part)
-                .group_by(Oeemetric.operator)
-            )
-            for op, oee, qual, runs in session.exec(stmt1).all():
-                _accumulate(op, oee, qual, runs)
-    except Exception:
-        pass
 
-    # 2. Query ReportEntry (compute pseudo-OEE from raw data)
-    try:
-        for variant in machine_variants:
-            stmt2 = (
-                select(
-                    ReportEntry.operator,
-                    func.count(ReportEntry.id).label("runs"),
-                    func.avg(ReportEntry.run_time_min).label("avg_runtime"),
-                    func.avg(ReportEntry.planned_production_time_min).label("avg_planned"),
-                )
-                .where(ReportEntry.machine == variant)
-                .where(ReportEntry.part_number == part)
-                .where(ReportEntry.operator != None)
-                .group_by(ReportEntry.operator)
-            )
-            for op, runs, avg_run, avg_planned in session.exec(stmt2).all():
-                # Use availability as a proxy for OEE when actual OEE isn't available
-                pseudo_oee = (avg_run / avg_planned) if avg_planned and avg_planned > 0 else 0.8
-                _accumulate(op, pseudo_oee, 0.95, runs)
-    except Exception:
-        pass
-
-    if not operator_stats:
-        return []
-
-    # Score operators: weighted average OEE * quality * experience bonus
-    ranked = []
-    for op, stats in operator_stats.items():
-        runs = stats["runs"]
-        avg_oee = stats["total_oee"] / runs if runs > 0 else 0
-        avg_quality = stats["total_quality"] / runs if runs > 0 else 0
-        score = avg_oee * avg_quality * min(runs, 5)
-        ranked.append({
-            "operator": op,
-            "avg_oee": round(avg_oee, 4),
-            "avg_quality": round(avg_quality, 4),
-            "historical_runs": runs,
-            "score": round(score, 4)
-        })
+class SuggestRequest(BaseModel):
+    pairs: List[SuggestPair]
+    limit: Optional[int] = None
+
 
-    # Sort by score descending
-    ranked.sort(key=lambda x: x["score"], reverse=True)
-    return ranked
+@router.post("/suggest-operators")
+def suggest_operators(request: SuggestRequest, session: Session = Depends(get_session)):
+    """Ranked operators for every machine/part on the board in one call.
+    Returns one entry per requested pair, in request order."""
+    if len(request.pairs) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 pairs per request")
+    pairs = [(p.machine, p.part) for p in request.pairs]
+    ranked = suggest_many(session, pairs, request.limit)
+    return [{"machine": m, "part": p, "suggestions": ranked[(m, p)]} for m, p in pairs]
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, BackgroundTasks, Response, Query
+from sqlalchemy import insert, update
 from sqlmodel import Session, select
-from typing import List
-import pandas as pd
+from typing import List, Optional
 import io
+import time
 from datetime import datetime
 
 from ..db import RateEntry, RateAudit, ReportEntry, RunMode
 from ..database import get_session, engine
 from .auth import require_role
+from ..pagination import keyset_page, NEXT_CURSOR_HEADER
+from ..metrics_export import RECALC_QUEUED, RECALC_RUNNING, RECALC_DURATION, RECALC_REPORTS, record_upload
+from ..events import publish
+from ..catalog import add_pairs, prune_pairs
+from ..machines import MachineRegistry
+from ..dimensions import DIMENSIONS, assign_dimensions, lookup, resolve
 # Import calculation logic (deferred import or direct if safe)
 # Since metrics imports from .db and .database, and rates does too, we can try direct import.
 # Note: routers/metrics.py is a sibling.
@@ -36,44 +43,100 @@ def log_audit(session: Session, rate_id: int, user_id: int, field: str, old: str
     )
     session.add(audit)
 
-def recalculate_affected_reports(part_number: str, session: Session):
-    """Finds all reports containing the part number and recalculates their metrics.
-    Each report is processed in its own transaction for safety."""
-    stmt = select(ReportEntry.report_id).where(ReportEntry.part_number == part_number).distinct()
-    report_ids = session.exec(stmt).all()
+def affected_report_ids(session: Session, part_numbers) -> List[int]:
+    """Reports with entries for any of the parts (any spelling of the part dimension)."""
+    part_numbers = sorted({p for p in part_numbers if p})
+    if not part_numbers:
+        return []
+    part_ids = sorted(set(lookup(session, "part", part_numbers).values()))
+    report_ids = set()
+    for i in range(0, len(part_numbers), 500):
+        report_ids.update(session.exec(
+            select(ReportEntry.report_id).where(ReportEntry.part_number.in_(part_numbers[i:i + 500])).distinct()
+        ).all())
+    for i in range(0, len(part_ids), 500):
+        report_ids.update(session.exec(
+            select(ReportEntry.report_id).where(ReportEntry.part_id.in_(part_ids[i:i + 500])).distinct()
+        ).all())
+    return sorted(report_ids)
 
+def recalculate_reports(report_ids: List[int], session: Session, label: str):
+    """Recalculates each report once, each in its own transaction for safety."""
     results = {"success": [], "failed": [], "total": len(report_ids)}
-    print(f"[RECALC] Part '{part_number}': {len(report_ids)} report(s) to process")
+    print(f"[RECALC] {label}: {len(report_ids)} report(s) to process")
 
     for rid in report_ids:
         try:
             calculate_report_metrics_logic(rid, session)
             session.commit()
             results["success"].append(rid)
+            RECALC_REPORTS.inc(1, "ok")
         except Exception as e:
             session.rollback()
             results["failed"].append({"id": rid, "error": str(e)})
+            RECALC_REPORTS.inc(1, "failed")
             print(f"[RECALC] FAILED report {rid}: {e}")
 
     ok = len(results['success'])
     fail = len(results['failed'])
-    print(f"[RECALC] Complete for '{part_number}': {ok} OK, {fail} failed")
+    print(f"[RECALC] Complete for {label}: {ok} OK, {fail} failed")
     return results
 
-def run_recalc_background(part_number: str):
-    """Background task wrapper with a dedicated session."""
+def recalculate_affected_reports(part_number: str, session: Session):
+    """Finds all reports containing the part number and recalculates their metrics."""
+    return recalculate_reports(affected_report_ids(session, [part_number]), session, f"part '{part_number}'")
+
+def _run_recalc(label: str, work):
+    """Background task body with a dedicated session; `work(session)` returns the results."""
+    started = time.perf_counter()
+    RECALC_RUNNING.inc()
     with Session(engine) as session:
         try:
-            results = recalculate_affected_reports(part_number, session)
+            results = work(session)
             if results["failed"]:
-                print(f"[RECALC] WARNING: {len(results['failed'])} report(s) failed for '{part_number}'")
+                print(f"[RECALC] WARNING: {len(results['failed'])} report(s) failed for {label}")
         except Exception as e:
-            print(f"[RECALC] Background Error for Part '{part_number}': {e}")
+            print(f"[RECALC] Background Error for {label}: {e}")
+        finally:
+            RECALC_RUNNING.dec()
+            RECALC_DURATION.observe(time.perf_counter() - started)
+
+def run_recalc_background(part_number: str):
+    """Background task wrapper with a dedicated session."""
+    _run_recalc(f"part '{part_number}'", lambda session: recalculate_affected_reports(part_number, session))
+
+def run_reports_recalc_background(report_ids: List[int]):
+    _run_recalc(f"{len(report_ids)} report(s)", lambda session: recalculate_reports(report_ids, session, "bulk rate upload"))
+
+def _run_queued_recalc(part_number: str):
+    RECALC_QUEUED.dec()
+    run_recalc_background(part_number)
+
+def _run_queued_reports_recalc(report_ids: List[int]):
+    RECALC_QUEUED.dec()
+    run_reports_recalc_background(report_ids)
+
+def schedule_recalc(background_tasks: BackgroundTasks, part_number: str):
+    """Queue a recalculation to run after the response; tracked as queue depth."""
+    RECALC_QUEUED.inc()
+    background_tasks.add_task(_run_queued_recalc, part_number)
+
+def schedule_reports_recalc(background_tasks: BackgroundTasks, report_ids: List[int]):
+    """Queue one task that recalculates each of the reports once."""
+    RECALC_QUEUED.inc()
+    background_tasks.add_task(_run_queued_reports_recalc, report_ids)
 
 # CRUD endpoints
 @router.get("/", response_model=List[RateEntry])
-def list_rates(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
-    rates = session.exec(select(RateEntry).order_by(RateEntry.id.desc()).offset(skip).limit(limit)).all()
+def list_rates(response: Response, cursor: Optional[str] = None, skip: int = 0, limit: int = Query(100, ge=1, le=5000), session: Session = Depends(get_session)):
+    """List rates, newest first. Page with the X-Next-Cursor header value as `cursor`;
+    `skip` (OFFSET) is kept only for older clients."""
+    stmt = select(RateEntry)
+    if skip and not cursor:
+        stmt = stmt.offset(skip)
+    rates, next_cursor = keyset_page(session, stmt, [RateEntry.id], cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return rates
 
 @router.get("/run-modes", response_model=List[RunMode])
@@ -99,7 +162,11 @@ def create_rate(rate: RateEntry, background_tasks: BackgroundTasks, session: Ses
             # Try ISO format with time if present, or just let error propagate
             pass
 
+    rate.machine_id = MachineRegistry(session).resolve(rate.machine)
+    assign_dimensions(session, [rate])
     session.add(rate)
+    add_pairs(session, [(rate.machine, rate.part_number)])
+    publish(session, "rates_changed", {"part_numbers": [rate.part_number] if rate.part_number else []})
     session.commit()
 
 
@@ -107,7 +174,7 @@ def create_rate(rate: RateEntry, background_tasks: BackgroundTasks, session: Ses
     
     # Retroactive Calculation (Async)
     if rate.part_number:
-        background_tasks.add_task(run_recalc_background, rate.part_number)
+        schedule_recalc(background_tasks, rate.part_number)
 
     return rate
 
@@ -118,6 +185,7 @@ def update_rate(rate_id: int, updated: RateEntry, background_tasks: BackgroundTa
         raise HTTPException(status_code=404, detail="Rate not found")
     
     old_part = db_rate.part_number
+    old_pair = (db_rate.machine, db_rate.part_number)
     
     # Track which fields actually changed
     changed_fields = set()
@@ -130,7 +198,15 @@ def update_rate(rate_id: int, updated: RateEntry, background_tasks: BackgroundTa
                 changed_fields.add(field)
                 log_audit(session, rate_id, user_id, field, str(old_val), str(new_val))
                 setattr(db_rate, field, new_val)
+        if {"operator", "part_number", "job"} & changed_fields:
+            assign_dimensions(session, [db_rate])
         session.add(db_rate)
+        if (db_rate.machine, db_rate.part_number) != old_pair:
+            db_rate.machine_id = MachineRegistry(session).resolve(db_rate.machine)
+            add_pairs(session, [(db_rate.machine, db_rate.part_number)])
+            prune_pairs(session, [old_pair])
+        if changed_fields:
+            publish(session, "rates_changed", {"part_numbers": sorted({p for p in (old_part, db_rate.part_number) if p})})
         session.commit()
     except Exception as e:
         session.rollback()
@@ -147,7 +223,7 @@ def update_rate(rate_id: int, updated: RateEntry, background_tasks: BackgroundTa
         if old_part: impacted_parts.add(old_part)
         if db_rate.part_number: impacted_parts.add(db_rate.part_number)
         for p in impacted_parts:
-            background_tasks.add_task(run_recalc_background, p)
+            schedule_recalc(background_tasks, p)
     else:
         print(f"[RECALC] Rate {rate_id} update skipped recalc (non-impacting fields: {changed_fields})")
 
@@ -161,19 +237,24 @@ def delete_rate(rate_id: int, background_tasks: BackgroundTasks, session: Sessio
     
     part_number = rate.part_number
     session.delete(rate)
+    prune_pairs(session, [(rate.machine, rate.part_number)])
+    publish(session, "rates_changed", {"part_numbers": [part_number] if part_number else []})
     session.commit()
     
     # Recalc (Async)
     if part_number:
-        background_tasks.add_task(run_recalc_background, part_number)
+        schedule_recalc(background_tasks, part_number)
         
     return
 
 # Upload CSV/XLSX with validation and preview
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 def upload_rates(file: UploadFile = File(...), background_tasks: BackgroundTasks = None, session: Session = Depends(get_session)):
+    # pandas/openpyxl are loaded on first upload rather than at API boot
+    import pandas as pd
     if file.content_type not in ["text/csv", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "application/vnd.ms-excel"]:
         raise HTTPException(status_code=400, detail="Unsupported file type")
+    started = time.perf_counter()
     contents = file.file.read()
     if file.filename.endswith('.csv'):
         df = pd.read_csv(io.BytesIO(contents))
@@ -201,8 +282,6 @@ def upload_rates(file: UploadFile = File(...), background_tasks: BackgroundTasks
 
     if "operator" not in df.columns:
         df["operator"] = "Any"
-    if "start_date" not in df.columns:
-        df["start_date"] = datetime.today().date()
     if "active" not in df.columns:
         df["active"] = True
     
@@ -213,47 +292,154 @@ def upload_rates(file: UploadFile = File(...), background_tasks: BackgroundTasks
     if "part_number" not in df.columns: # Critical one
         raise HTTPException(status_code=400, detail=f"Missing required column: Part Number")
 
-    # Save to DB
-    count = 0
-    affected_parts = set()
-    
-    for _, row in df.iterrows():
-        # Basic validation
-        if pd.isna(row.get('part_number')): continue
-        
-        part_num = str(row['part_number'])
-        affected_parts.add(part_num)
-        
-        rate = RateEntry(
-            operator=str(row.get('operator', 'Any')),
-            machine=str(row.get('machine', 'Unknown')),
-            part_number=part_num,
-            job=str(row.get('job', '')),
-            ideal_units_per_hour=float(row.get('ideal_units_per_hour')) if pd.notna(row.get('ideal_units_per_hour')) else None,
-            ideal_cycle_time_seconds=float(row.get('ideal_cycle_time_seconds')) if pd.notna(row.get('ideal_cycle_time_seconds')) else None,
-            start_date=pd.to_datetime(row.get('start_date')).date(),
-            active=bool(row.get('active', True)),
-
-            cavity_count=int(row.get('cavity_count', 1)),
-            entry_mode=str(row.get('entry_mode', 'seconds')),
-            machine_cycle_time=float(row.get('machine_cycle_time')) if pd.notna(row.get('machine_cycle_time')) else None,
-            run_mode_id=mode_map.get(str(row.get('run_mode_name', '')).upper(), standard_id),
-            notes="Bulk Upload"
-        )
-
-        session.add(rate)
-        count += 1
-    
+    rows = _coerce_rate_frame(df, mode_map, standard_id)
+    inserted, updated, unchanged, changed_parts, pairs = _upsert_rates(session, rows)
+
+    add_pairs(session, pairs)
+    if changed_parts:
+        publish(session, "rates_changed", {"part_numbers": sorted(changed_parts)})
+    report_ids = affected_report_ids(session, changed_parts)
     session.commit()
-    
-    # Bulk Recalc (Async)
-    print(f"Bulk Upload: Triggering background recalc for {len(affected_parts)} parts...")
-    if background_tasks:
-        for p in affected_parts:
-             background_tasks.add_task(run_recalc_background, p)
+    record_upload("rates", len(rows), time.perf_counter() - started)
+
+    # Bulk Recalc (Async): every affected report once, however many of its parts changed
+    print(f"Bulk Upload: {inserted} new, {updated} updated, {unchanged} unchanged; "
+          f"recalculating {len(report_ids)} report(s) for {len(changed_parts)} part(s)...")
+    if report_ids:
+        if background_tasks:
+            schedule_reports_recalc(background_tasks, report_ids)
+        else:
+            # Fallback if bg tasks not available (shouldn't happen with correct dependency)
+            run_reports_recalc_background(report_ids)
+
+    return {
+        "message": f"Successfully uploaded {len(rows)} rates ({inserted} new, {updated} updated, {unchanged} unchanged). "
+                   "Metrics usually updated within seconds.",
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "reports_recalculated": len(report_ids),
+    }
+
+
+# Columns a re-uploaded rate may change; the rest of the row is the upsert key
+RATE_UPLOAD_FIELDS = ("operator", "job", "ideal_units_per_hour", "ideal_cycle_time_seconds", "active",
+                      "cavity_count", "entry_mode", "machine_cycle_time")
+
+def _coerce_rate_frame(df, mode_map: dict, standard_id: int) -> List[dict]:
+    """Column-wise type coercion of an uploaded rate sheet; one dict per row with a part number."""
+    import pandas as pd
+
+    df = df[df["part_number"].notna()].copy()
+    df["part_number"] = df["part_number"].astype(str).str.strip()
+    df = df[df["part_number"] != ""]
+
+    def text(column: str, default: str):
+        if column not in df.columns:
+            return pd.Series(default, index=df.index)
+        return df[column].where(df[column].notna(), default).astype(str).str.strip()
+
+    def number(column: str):
+        if column not in df.columns:
+            return pd.Series(float("nan"), index=df.index)
+        return pd.to_numeric(df[column], errors="coerce")
+
+    out = pd.DataFrame({
+        "part_number": df["part_number"],
+        "machine": text("machine", "Unknown"),
+        "operator": text("operator", "Any"),
+        "job": text("job", ""),
+        "entry_mode": text("entry_mode", "seconds"),
+        "ideal_units_per_hour": number("ideal_units_per_hour"),
+        "ideal_cycle_time_seconds": number("ideal_cycle_time_seconds"),
+        "machine_cycle_time": number("machine_cycle_time"),
+        "cavity_count": number("cavity_count").fillna(1).astype(int),
+    })
+    # Same derivation as RateEntry.__init__, for the whole column
+    derive = out["ideal_cycle_time_seconds"].isna() & (out["ideal_units_per_hour"] > 0)
+    out.loc[derive, "ideal_cycle_time_seconds"] = 3600.0 / out.loc[derive, "ideal_units_per_hour"]
+
+    # No start date: the row updates the part's current rate (see _upsert_rates)
+    if "start_date" in df.columns:
+        start = pd.to_datetime(df["start_date"], errors="coerce")
+        out["start_date"] = start.dt.date.where(start.notna(), None)
     else:
-        # Fallback if bg tasks not available (shouldn't happen with correct dependency)
-        for p in affected_parts:
-             run_recalc_background(p)
-         
-    return {"message": f"Successfully uploaded {count} rates. Metrics usually updated within seconds."}
+        out["start_date"] = None
+    active = df["active"]
+    if active.dtype == object:
+        active = ~active.astype(str).str.strip().str.lower().isin(["false", "0", "no", "n", ""])
+    out["active"] = active.fillna(True).astype(bool)
+    modes = text("run_mode_name", "").str.upper().map(mode_map)
+    out["run_mode_id"] = modes.fillna(standard_id).astype(int)
+
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict(orient="records")
+
+def _upsert_rates(session: Session, rows: List[dict]):
+    """Insert new rates and update changed ones, keyed on (part, machine, run
+    mode, start date) with part and machine compared by dimension/registry id.
+    A row without a start date updates the latest rate for its (part, machine,
+    run mode), or is inserted as starting today when there is none.
+    Returns (inserted, updated, unchanged, parts needing recalculation, machine/part pairs)."""
+    machines = MachineRegistry(session)
+    machine_ids = {name: machines.resolve(name) for name in {r["machine"] for r in rows}}
+    for field, kind in (("part_number", "part"), ("operator", "operator"), ("job", "job")):
+        ids = resolve(session, kind, {r[field] for r in rows})
+        id_field = DIMENSIONS[kind].id_attr
+        for r in rows:
+            r[id_field] = ids.get(r[field])
+    for r in rows:
+        r["machine_id"] = machine_ids[r["machine"]]
+
+    def key(part_id, part_number, machine_id, machine, run_mode_id, start_date):
+        return (part_id or part_number, machine_id or machine, run_mode_id, start_date)
+
+    # A sheet that repeats a key: the last row wins
+    rows = list({key(r["part_id"], r["part_number"], r["machine_id"], r["machine"], r["run_mode_id"], r["start_date"]): r
+                 for r in rows}.values())
+
+    # Existing rates for the uploaded parts; with older duplicates the newest row is the one updated
+    part_ids = sorted({r["part_id"] for r in rows if r["part_id"]})
+    part_numbers = sorted({r["part_number"] for r in rows})
+    existing, latest = {}, {}
+    for column, values in ((RateEntry.part_id, part_ids), (RateEntry.part_number, part_numbers)):
+        for i in range(0, len(values), 500):
+            for rate in session.exec(select(RateEntry).where(column.in_(values[i:i + 500])).order_by(RateEntry.id)).all():
+                existing[key(rate.part_id, rate.part_number, rate.machine_id, rate.machine, rate.run_mode_id, rate.start_date)] = rate
+                undated = key(rate.part_id, rate.part_number, rate.machine_id, rate.machine, rate.run_mode_id, None)
+                if undated not in latest or rate.start_date >= latest[undated].start_date:
+                    latest[undated] = rate
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    changed_parts, pairs = set(), set()
+    user_id = 1  # Admin user for audit, as in update_rate
+    for r in rows:
+        pairs.add((r["machine"], r["part_number"]))
+        rate_key = key(r["part_id"], r["part_number"], r["machine_id"], r["machine"], r["run_mode_id"], r["start_date"])
+        rate = existing.get(rate_key) if r["start_date"] else latest.get(rate_key)
+        if rate is None:
+            r["start_date"] = r["start_date"] or datetime.today().date()
+            inserts.append({**r, "notes": "Bulk Upload", "created_at": now, "updated_at": now})
+            changed_parts.add(r["part_number"])
+            continue
+        changes = {f: r[f] for f in RATE_UPLOAD_FIELDS + ("operator_id", "job_id") if getattr(rate, f) != r[f]}
+        if not changes:
+            continue
+        for field in changes:
+            if field in RATE_UPLOAD_FIELDS:
+                log_audit(session, rate.id, user_id, field, str(getattr(rate, field)), str(changes[field]))
+        updates.append({"id": rate.id, **changes, "updated_at": now})
+        if set(changes) & RATE_IMPACTING_FIELDS:
+            changed_parts.update({rate.part_number, r["part_number"]})
+
+    for i in range(0, len(inserts), 500):
+        session.exec(insert(RateEntry), params=inserts[i:i + 500])
+    # Grouped by changed columns so each executemany has one statement shape
+    by_columns = {}
+    for u in updates:
+        by_columns.setdefault(tuple(sorted(u)), []).append(u)
+    for batch in by_columns.values():
+        session.exec(update(RateEntry), params=batch)
+    unchanged = len(rows) - len(inserts) - len(updates)
+    return len(inserts), len(updates), unchanged, {p for p in changed_parts if p}, pairs
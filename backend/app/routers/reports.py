@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Form, BackgroundTasks, Response, Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session, select
 from typing import List, Dict, Any, Optional
-import pandas as pd
 import io
+import time
 from datetime import datetime, date
 from pydantic import BaseModel
 
 
 from ..db import ProductionReport, ReportEntry, Oeemetric
 from ..database import get_session
+from ..responses import ORJSONResponse
+from ..pagination import keyset_page, NEXT_CURSOR_HEADER
+from ..metrics_export import record_upload
+from ..snapshots import invalidate_weeks
+from ..events import publish
+from ..catalog import add_pairs, prune_pairs
+from ..skills import apply_skill_delta, report_contributions
+from ..machines import MachineRegistry
+from ..dimensions import assign_dimensions
 from .auth import require_role
 
 router = APIRouter()
@@ -35,13 +44,17 @@ def parse_date(value) -> date:
         if isinstance(value, (datetime, date)):
             return value if isinstance(value, date) else value.date()
         # Use pandas for robust parsing (handles "2026-01-05 00:00:00", etc)
+        import pandas as pd
         return pd.to_datetime(value).date()
     except Exception:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {value}")
 
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_role("admin", "manager"))])
 def upload_report(file: UploadFile = File(...), session: Session = Depends(get_session)):
+    # pandas/openpyxl are loaded on first upload rather than at API boot
+    import pandas as pd
     
+    started = time.perf_counter()
     contents = file.file.read()
     if file.filename.lower().endswith('.csv'):
         # Auto-detect encoding from BOM bytes
@@ -398,13 +411,17 @@ def upload_report(file: UploadFile = File(...), session: Session = Depends(get_s
                 return default
             return s
         
+        # Each distinct machine spelling is resolved once for the whole file
+        machines = MachineRegistry(session)
         for _, row in df.iterrows():
             try:
+                 machine = safe_str(row.get('machine'), 'Unknown')
                  entry = ReportEntry(
                     report_id=report.id,
                     date=parse_date(row['date']),
                     operator=safe_str(row.get('operator'), 'Unknown'),
-                    machine=safe_str(row.get('machine'), 'Unknown'),
+                    machine=machine,
+                    machine_id=machines.resolve(machine),
                     part_number=safe_str(row.get('part_number'), 'Unknown'),
                     job=safe_str(row.get('job'), ''),
                     planned_production_time_min=safe_float(row.get('planned_production_time_min')),
@@ -424,8 +441,11 @@ def upload_report(file: UploadFile = File(...), session: Session = Depends(get_s
                 # Stop immediately and report the error so fixing is enforced
                 raise HTTPException(status_code=500, detail=f"Failed to process row {row.to_dict()}: {str(e)}")
                 
+        assign_dimensions(session, entries)
         session.bulk_save_objects(entries)
+        add_pairs(session, ((e.machine, e.part_number) for e in entries))
         session.commit()
+        record_upload("report", len(entries), time.perf_counter() - started)
         # Return a simple preview of first few rows (DEPRECATED for frontend display, but kept for legacy compat)
         # Frontend should now use GET /reports/{id}/entries
         preview = df.head().fillna("").to_dict(orient="records")
@@ -438,11 +458,18 @@ def upload_report(file: UploadFile = File(...), session: Session = Depends(get_s
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Server Error: {str(e)}")
 
-@router.get("/{report_id}/entries", response_model=List[ReportEntry])
-def get_report_entries(report_id: int, session: Session = Depends(get_session)):
-    """Fetch all entries for a report to allow editing/review."""
-    entries = session.exec(select(ReportEntry).where(ReportEntry.report_id == report_id)).all()
-    return entries
+@router.get("/{report_id}/entries", response_model=List[ReportEntry], response_class=ORJSONResponse)
+def get_report_entries(report_id: int, cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=5000), session: Session = Depends(get_session)):
+    """Fetch entries for a report to allow editing/review.
+    Without `limit` all entries are returned. With `limit`, pages are keyed on id and
+    the cursor for the next page is sent in the X-Next-Cursor header.
+    Rows come straight from the table, so they are returned without re-validation."""
+    stmt = select(*ReportEntry.__table__.columns).where(ReportEntry.report_id == report_id)
+    rows, next_cursor = keyset_page(session, stmt, [ReportEntry.id], cursor, limit, descending=False)
+    response = ORJSONResponse([dict(r._mapping) for r in rows])
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
 
 @router.put("/entries/{entry_id}", response_model=ReportEntry, dependencies=[Depends(require_role("admin", "manager"))])
 def update_report_entry(entry_id: int, update_data: ReportEntryUpdate, session: Session = Depends(get_session)):
@@ -453,6 +480,7 @@ def update_report_entry(entry_id: int, update_data: ReportEntryUpdate, session:
         
     # Update fields if provided
     update_dict = update_data.dict(exclude_unset=True)
+    old_pair = (entry.machine, entry.part_number)
     for key, value in update_dict.items():
         setattr(entry, key, value)
         
@@ -464,7 +492,14 @@ def update_report_entry(entry_id: int, update_data: ReportEntryUpdate, session:
     if "run_time_min" in update_dict or "downtime_min" in update_dict:
         entry.planned_production_time_min = (entry.run_time_min or 0) + (entry.downtime_min or 0)
         
+    if {"operator", "part_number", "job"} & set(update_dict):
+        assign_dimensions(session, [entry])
+        
     session.add(entry)
+    if (entry.machine, entry.part_number) != old_pair:
+        entry.machine_id = MachineRegistry(session).resolve(entry.machine)
+        add_pairs(session, [(entry.machine, entry.part_number)])
+        prune_pairs(session, [old_pair])
     session.commit()
     session.refresh(entry)
     return entry
@@ -496,8 +531,11 @@ def create_report_entry(report_id: int, entry_data: ReportEntryUpdate, session:
     # Recalculate totals
     entry.total_count = entry.good_count + entry.reject_count
     entry.planned_production_time_min = entry.run_time_min + entry.downtime_min
+    entry.machine_id = MachineRegistry(session).resolve(entry.machine)
+    assign_dimensions(session, [entry])
     
     session.add(entry)
+    add_pairs(session, [(entry.machine, entry.part_number)])
     session.commit()
     session.refresh(entry)
     return entry
@@ -510,13 +548,20 @@ def delete_report_entry(entry_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Entry not found")
         
     session.delete(entry)
+    prune_pairs(session, [(entry.machine, entry.part_number)])
     session.commit()
     return None
 
 @router.get("/", response_model=List[ProductionReport])
-def list_reports(session: Session = Depends(get_session)):
-    """List all available production reports."""
-    reports = session.exec(select(ProductionReport).order_by(ProductionReport.uploaded_at.desc())).all()
+def list_reports(response: Response, cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=1000), session: Session = Depends(get_session)):
+    """List production reports, newest first.
+    Pass `limit` to page through them; the next cursor is in the X-Next-Cursor header."""
+    reports, next_cursor = keyset_page(
+        session, select(ProductionReport),
+        [ProductionReport.uploaded_at, ProductionReport.id], cursor, limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return reports
 
 @router.put("/{report_id}", response_model=ProductionReport, dependencies=[Depends(require_role("admin", "manager"))])
@@ -543,9 +588,14 @@ def delete_report(report_id: int, session: Session = Depends(get_session)):
         
     try:
         from sqlmodel import delete
+        invalidate_weeks(session, session.exec(select(Oeemetric.date).where(Oeemetric.report_id == report_id).distinct()).all())
+        pairs = session.exec(select(ReportEntry.machine, ReportEntry.part_number).where(ReportEntry.report_id == report_id).distinct()).all()
+        apply_skill_delta(session, report_contributions(session, report_id), {})
         session.exec(delete(Oeemetric).where(Oeemetric.report_id == report_id))
         session.exec(delete(ReportEntry).where(ReportEntry.report_id == report_id))
+        prune_pairs(session, pairs)
         session.delete(report)
+        publish(session, "report_deleted", {"report_id": report_id})
         session.commit()
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Failed to delete: {str(e)}")
@@ -561,6 +611,8 @@ def export_report(
     """
     Export report data and metrics to CSV or XLSX.
     """
+    import pandas as pd
+
     # 1. Fetch Report Entries + Metrics
     results = session.exec(
         select(ReportEntry, Oeemetric)
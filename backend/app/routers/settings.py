@@ -7,6 +7,7 @@ import json
 from ..db import Setting, User
 from ..database import get_session
 from .auth import get_current_user
+from ..operators import EXCLUDED_OPERATORS_KEY, parse_patterns, refresh_excluded
 
 router = APIRouter()
 
@@ -38,6 +39,12 @@ def update_setting(key: str, setting_data: SettingUpdate, current_user: User = D
         if current_user.role not in ["admin", "manager"]:
             raise HTTPException(status_code=403, detail="Not authorized to modify settings")
 
+    if key == EXCLUDED_OPERATORS_KEY:
+        try:
+            parse_patterns(setting_data.value)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     setting = session.get(Setting, key)
     if not setting:
         # create if not exists
@@ -47,6 +54,10 @@ def update_setting(key: str, setting_data: SettingUpdate, current_user: User = D
         setting.value = setting_data.value
         if setting_data.description is not None:
             setting.description = setting_data.description
+    if key == EXCLUDED_OPERATORS_KEY:
+        # Re-flag stored metrics in the same transaction as the new list
+        session.flush()
+        refresh_excluded(session)
     session.commit()
     session.refresh(setting)
     return setting
@@ -1,18 +1,20 @@
 from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session, select, func
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Dict, Any, Optional
 from datetime import date, timedelta
 from ..db import Oeemetric
-from ..database import get_session
+from ..database import get_async_session
+from ..snapshots import closed_week, shift_key, load_snapshot, store_snapshot
 
 router = APIRouter(tags=["weekly"])
 
 @router.get("/summary", response_model=Dict[str, Any])
-def get_weekly_summary(
+async def get_weekly_summary(
     start_date: date,
     end_date: date,
     shift: Optional[str] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Calculate Weighted Weekly OEE vs Simple Average OEE.
@@ -21,14 +23,28 @@ def get_weekly_summary(
     Formula:
     Weighted OEE = Sum(Metric * Weight) / Sum(Weight)
     Where Weight = Total Parts Produced (or Run Time)
+
+    A closed Monday-Sunday week is served from its frozen snapshot.
     """
-    
+    week = closed_week(start_date, end_date)
+    if week is None:
+        return await _summarize(start_date, end_date, shift, session)
+
+    key = shift_key(shift)
+    payload, version = await load_snapshot(session, week, key)
+    if payload is None:
+        payload = await _summarize(start_date, end_date, shift, session)
+        await store_snapshot(session, week, key, version, payload)
+    return payload
+
+
+async def _summarize(start_date: date, end_date: date, shift: Optional[str], session: AsyncSession) -> Dict[str, Any]:
     # 1. Fetch Metrics
     stmt = select(Oeemetric).where(Oeemetric.date >= start_date).where(Oeemetric.date <= end_date)
     if shift and shift.lower() != "all":
         stmt = stmt.where(Oeemetric.shift == shift)
         
-    metrics = session.exec(stmt).all()
+    metrics = (await session.exec(stmt)).all()
     
     if not metrics:
         return {
@@ -167,3 +183,127 @@ def get_weekly_summary(
         "operators": operators_final,
         "daily_trend": trend_final
     }
+
+
+def _rollup(bucket: Dict[str, Any], weighted_num: float, parts: int, simple_sum: float, count: int, run_time: float):
+    bucket["weighted_num"] += weighted_num
+    bucket["parts"] += parts
+    bucket["simple_sum"] += simple_sum
+    bucket["count"] += count
+    bucket["run_time"] += run_time
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {"weighted_num": 0.0, "parts": 0, "simple_sum": 0.0, "count": 0, "run_time": 0.0}
+
+
+def _finish(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "weighted_oee": round(bucket["weighted_num"] / bucket["parts"], 4) if bucket["parts"] > 0 else 0.0,
+        "simple_oee": round(bucket["simple_sum"] / bucket["count"], 4) if bucket["count"] > 0 else 0.0,
+        "total_parts": bucket["parts"],
+        "total_run_time": round(bucket["run_time"], 1),
+        "count": bucket["count"],
+    }
+
+
+def iso_week_label(d: date) -> str:
+    year, week, _ = d.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+@router.get("/trend", response_model=Dict[str, Any])
+async def get_weekly_trend(
+    end_date: Optional[date] = None,
+    weeks: int = Query(26, ge=1, le=104),
+    start_date: Optional[date] = None,
+    shift: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Weighted vs simple OEE per ISO week, per operator per week, and per day,
+    for `weeks` weeks ending with the week of `end_date` (default: this week),
+    or from `start_date` when given.
+
+    One grouped query returns SUM(oee * parts), SUM(parts), SUM(oee) and COUNT
+    per (date, operator); weeks, operators and days are rolled up from those
+    sums, so the weighting matches /weekly/summary without loading raw rows.
+    """
+    end_date = end_date or date.today()
+    if start_date is None:
+        week_start = end_date - timedelta(days=end_date.weekday())
+        start_date = week_start - timedelta(weeks=weeks - 1)
+
+    parts = func.coalesce(Oeemetric.good_count, 0) + func.coalesce(Oeemetric.reject_count, 0)
+    oee = func.coalesce(Oeemetric.oee, 0.0)
+    stmt = (
+        select(
+            Oeemetric.date,
+            Oeemetric.operator,
+            func.sum(oee * parts),
+            func.sum(parts),
+            func.sum(oee),
+            func.count(),
+            func.sum(func.coalesce(Oeemetric.run_time_min, 0.0)),
+        )
+        .where(Oeemetric.date >= start_date)
+        .where(Oeemetric.date <= end_date)
+        .group_by(Oeemetric.date, Oeemetric.operator)
+    )
+    if shift and shift.lower() != "all":
+        stmt = stmt.where(Oeemetric.shift == shift)
+
+    rows = (await session.exec(stmt)).all()
+
+    overall = _new_bucket()
+    by_week: Dict[str, Dict[str, Any]] = {}
+    by_day: Dict[date, Dict[str, Any]] = {}
+    by_operator: Dict[str, Dict[str, Any]] = {}
+    by_operator_week: Dict[tuple, Dict[str, Any]] = {}
+    week_starts: Dict[str, date] = {}
+
+    for day, operator, weighted_num, parts_sum, simple_sum, count, run_time in rows:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        values = (weighted_num or 0.0, int(parts_sum or 0), simple_sum or 0.0, count, run_time or 0.0)
+        week = iso_week_label(day)
+        week_starts.setdefault(week, day - timedelta(days=day.weekday()))
+        name = operator or "Unknown"
+        _rollup(overall, *values)
+        _rollup(by_week.setdefault(week, _new_bucket()), *values)
+        _rollup(by_day.setdefault(day, _new_bucket()), *values)
+        _rollup(by_operator.setdefault(name, _new_bucket()), *values)
+        _rollup(by_operator_week.setdefault((name, week), _new_bucket()), *values)
+
+    weeks_final = [
+        {"week": w, "week_start": week_starts[w], **_finish(by_week[w])}
+        for w in sorted(by_week)
+    ]
+
+    operators_final = []
+    for name, bucket in by_operator.items():
+        totals = _finish(bucket)
+        operators_final.append({
+            "operator": name,
+            **totals,
+            "contribution_pct": round(bucket["parts"] / overall["parts"] * 100, 1) if overall["parts"] > 0 else 0.0,
+            "weeks": [
+                {"week": w, **_finish(by_operator_week[(name, w)])}
+                for w in sorted(by_week) if (name, w) in by_operator_week
+            ],
+        })
+    operators_final.sort(key=lambda x: x["total_parts"], reverse=True)
+
+    trend_final = [
+        {"date": d.strftime("%Y-%m-%d"), "week": iso_week_label(d), **_finish(by_day[d])}
+        for d in sorted(by_day)
+    ]
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "overall": _finish(overall),
+        "weeks": weeks_final,
+        "operators": operators_final,
+        "daily_trend": trend_final,
+    }
@@ -0,0 +1,174 @@
+"""Operator skill matrix behind /metrics/suggest-operator.
+
+OperatorSkill keeps, per board machine name x part x operator, the number of
+calculated runs and the sums of their OEE and quality. Calculation applies
+the difference between a report's old and new metrics (and report deletion
+subtracts them), with atomic `runs = runs + ?` upserts, so concurrent
+recalculations of different reports can update the same rows safely.
+
+Suggestions rank in SQL by the same score as before:
+avg OEE x avg quality x min(runs, 5).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, tuple_
+from sqlmodel import Session, select
+
+from .catalog import normalize_machine_name
+from .db import Oeemetric, OperatorSkill
+
+SkillKey = Tuple[str, str, str]  # (machine, part_number, operator)
+
+
+def skill_key(machine: Optional[str], part: Optional[str], operator: Optional[str]) -> Optional[SkillKey]:
+    if not machine or not part or not operator or not operator.strip():
+        return None
+    return normalize_machine_name(machine), part.strip(), operator.strip()
+
+
+def _accumulate(totals: Dict[SkillKey, list], key: Optional[SkillKey], runs: int, oee_sum: float, quality_sum: float):
+    if key is None:
+        return
+    row = totals.setdefault(key, [0, 0.0, 0.0])
+    row[0] += runs
+    row[1] += oee_sum
+    row[2] += quality_sum
+
+
+def report_contributions(session: Session, report_id: int) -> Dict[SkillKey, list]:
+    """What the report's stored metrics currently add to the matrix."""
+    rows = session.exec(
+        select(
+            Oeemetric.machine, Oeemetric.part_number, Oeemetric.operator,
+            func.count(), func.coalesce(func.sum(Oeemetric.oee), 0), func.coalesce(func.sum(Oeemetric.quality), 0),
+        )
+        .where(Oeemetric.report_id == report_id)
+        .group_by(Oeemetric.machine, Oeemetric.part_number, Oeemetric.operator)
+    ).all()
+    totals: Dict[SkillKey, list] = {}
+    for machine, part, operator, runs, oee_sum, quality_sum in rows:
+        _accumulate(totals, skill_key(machine, part, operator), runs, oee_sum, quality_sum)
+    return totals
+
+
+def metric_contributions(metrics: Iterable[Oeemetric]) -> Dict[SkillKey, list]:
+    totals: Dict[SkillKey, list] = {}
+    for m in metrics:
+        _accumulate(totals, skill_key(m.machine, m.part_number, m.operator), 1, m.oee or 0, m.quality or 0)
+    return totals
+
+
+def apply_skill_delta(session: Session, old: Dict[SkillKey, list], new: Dict[SkillKey, list]):
+    """Move the matrix from `old` to `new` contributions (caller commits)."""
+    rows = []
+    for key in set(old) | set(new):
+        o, n = old.get(key, (0, 0.0, 0.0)), new.get(key, (0, 0.0, 0.0))
+        delta = (n[0] - o[0], n[1] - o[1], n[2] - o[2])
+        if delta != (0, 0.0, 0.0):
+            rows.append({"machine": key[0], "part_number": key[1], "operator": key[2],
+                         "runs": delta[0], "oee_sum": delta[1], "quality_sum": delta[2]})
+    if not rows:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    table = OperatorSkill.__table__
+    for i in range(0, len(rows), 500):
+        stmt = insert(table).values(rows[i:i + 500])
+        session.exec(stmt.on_conflict_do_update(
+            index_elements=["machine", "part_number", "operator"],
+            set_={
+                "runs": table.c.runs + stmt.excluded.runs,
+                "oee_sum": table.c.oee_sum + stmt.excluded.oee_sum,
+                "quality_sum": table.c.quality_sum + stmt.excluded.quality_sum,
+            },
+        ))
+    keys = [(r["machine"], r["part_number"], r["operator"]) for r in rows]
+    session.exec(delete(OperatorSkill).where(
+        tuple_(OperatorSkill.machine, OperatorSkill.part_number, OperatorSkill.operator).in_(keys),
+        OperatorSkill.runs <= 0,
+    ))
+
+
+def rebuild_skills(session: Session) -> int:
+    """Refill the matrix from all stored metrics (migration / repair)."""
+    rows = session.exec(
+        select(
+            Oeemetric.machine, Oeemetric.part_number, Oeemetric.operator,
+            func.count(), func.coalesce(func.sum(Oeemetric.oee), 0), func.coalesce(func.sum(Oeemetric.quality), 0),
+        ).group_by(Oeemetric.machine, Oeemetric.part_number, Oeemetric.operator)
+    ).all()
+    totals: Dict[SkillKey, list] = {}
+    for machine, part, operator, runs, oee_sum, quality_sum in rows:
+        _accumulate(totals, skill_key(machine, part, operator), runs, oee_sum, quality_sum)
+    session.exec(delete(OperatorSkill))
+    for (machine, part, operator), (runs, oee_sum, quality_sum) in totals.items():
+        session.add(OperatorSkill(machine=machine, part_number=part, operator=operator,
+                                  runs=runs, oee_sum=oee_sum, quality_sum=quality_sum))
+    return len(totals)
+
+
+def _score():
+    experience = case((OperatorSkill.runs < 5, OperatorSkill.runs), else_=5)
+    avg_oee = OperatorSkill.oee_sum / OperatorSkill.runs
+    avg_quality = OperatorSkill.quality_sum / OperatorSkill.runs
+    return avg_oee, avg_quality, avg_oee * avg_quality * experience
+
+
+def _suggestion(operator, avg_oee, avg_quality, runs, score) -> dict:
+    return {
+        "operator": operator,
+        "avg_oee": round(avg_oee or 0, 4),
+        "avg_quality": round(avg_quality or 0, 4),
+        "historical_runs": runs,
+        "score": round(score or 0, 4),
+    }
+
+
+def suggest(session: Session, machine: str, part: str, limit: Optional[int] = None) -> List[dict]:
+    """Operators ranked for one board machine and part (one indexed lookup)."""
+    avg_oee, avg_quality, score = _score()
+    stmt = (
+        select(OperatorSkill.operator, avg_oee, avg_quality, OperatorSkill.runs, score)
+        .where(OperatorSkill.machine == normalize_machine_name(machine), OperatorSkill.part_number == part.strip())
+        .where(OperatorSkill.runs > 0)
+        .order_by(score.desc(), OperatorSkill.operator)
+    )
+    if limit:
+        stmt = stmt.limit(limit)
+    return [_suggestion(*row) for row in session.exec(stmt).all()]
+
+
+def suggest_many(session: Session, pairs: List[Tuple[str, str]], limit: Optional[int] = None) -> Dict[Tuple[str, str], List[dict]]:
+    """Ranked operators for many (machine, part) pairs in one query; keyed by the
+    pairs as given."""
+    wanted: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    for machine, part in pairs:
+        wanted.setdefault((normalize_machine_name(machine), part.strip()), []).append((machine, part))
+    result: Dict[Tuple[str, str], List[dict]] = {pair: [] for pair in pairs}
+    if not wanted:
+        return result
+
+    avg_oee, avg_quality, score = _score()
+    rank = func.row_number().over(
+        partition_by=(OperatorSkill.machine, OperatorSkill.part_number),
+        order_by=(score.desc(), OperatorSkill.operator),
+    ).label("rank")
+    ranked = (
+        select(OperatorSkill.machine, OperatorSkill.part_number, OperatorSkill.operator,
+               avg_oee.label("avg_oee"), avg_quality.label("avg_quality"), OperatorSkill.runs, score.label("score"), rank)
+        .where(tuple_(OperatorSkill.machine, OperatorSkill.part_number).in_(list(wanted)))
+        .where(OperatorSkill.runs > 0)
+        .subquery()
+    )
+    stmt = select(*ranked.c).order_by(ranked.c.machine, ranked.c.part_number, ranked.c.rank)
+    if limit:
+        stmt = stmt.where(ranked.c.rank <= limit)
+    for machine, part, operator, oee, quality, runs, value, _ in session.exec(stmt).all():
+        suggestion = _suggestion(operator, oee, quality, runs, value)
+        for pair in wanted[(machine, part)]:
+            result[pair].append(suggestion)
+    return result
@@ -0,0 +1,77 @@
+"""Frozen /weekly/summary results for closed ISO weeks.
+
+A week is closed once its Sunday is in the past. The first request for a
+closed Monday-Sunday range computes the summary and stores it together with
+the week's current WeekVersion; later requests return the stored payload.
+
+Anything that rewrites metrics in a week (calculation, report deletion, and
+through recalculation every rate change) calls `invalidate_weeks`, which bumps
+the version. A snapshot built from data read before a bump carries the old
+version, so it can never be served afterwards, even if it was written late.
+"""
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import WeeklySnapshot, WeekVersion
+
+
+def week_start(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def closed_week(start_date: date, end_date: date, today: Optional[date] = None) -> Optional[date]:
+    """Monday of the range if it is exactly one ISO week that has already ended."""
+    today = today or date.today()
+    if start_date.weekday() == 0 and end_date == start_date + timedelta(days=6) and end_date < today:
+        return start_date
+    return None
+
+
+def shift_key(shift: Optional[str]) -> str:
+    return "All" if not shift or shift.lower() == "all" else shift
+
+
+def invalidate_weeks(session: Session, dates: Iterable[date]):
+    """Bump the version of every week containing one of `dates` (caller commits)."""
+    weeks = {week_start(d) for d in dates if d}
+    if not weeks:
+        return
+    existing = {v.week_start: v for v in session.exec(select(WeekVersion).where(WeekVersion.week_start.in_(weeks))).all()}
+    for week in weeks:
+        version = existing.get(week) or WeekVersion(week_start=week, version=0)
+        version.version += 1
+        session.add(version)
+
+
+async def load_snapshot(session: AsyncSession, week: date, shift: str):
+    """(payload or None, current week version)."""
+    current = (await session.exec(select(WeekVersion.version).where(WeekVersion.week_start == week))).first() or 0
+    snapshot = (await session.exec(
+        select(WeeklySnapshot).where(WeeklySnapshot.week_start == week, WeeklySnapshot.shift == shift)
+    )).first()
+    if snapshot is not None and snapshot.version == current:
+        return json.loads(snapshot.payload), current
+    return None, current
+
+
+async def store_snapshot(session: AsyncSession, week: date, shift: str, version: int, payload: Dict[str, Any]):
+    snapshot = (await session.exec(
+        select(WeeklySnapshot).where(WeeklySnapshot.week_start == week, WeeklySnapshot.shift == shift)
+    )).first()
+    if snapshot is None:
+        snapshot = WeeklySnapshot(week_start=week, shift=shift, version=version, payload="")
+    elif snapshot.version > version:
+        return
+    snapshot.version = version
+    snapshot.payload = json.dumps(payload)
+    session.add(snapshot)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Another request stored the same week first
+        await session.rollback()
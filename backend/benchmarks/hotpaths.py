@@ -0,0 +1,186 @@
+"""Micro-benchmarks for the OEE hot paths on synthetic data.
+
+Times, against a throwaway SQLite file filled by benchmarks.synthetic:
+  - calculate_report_metrics_logic (first pass over every report, then repeats on one)
+  - upload_report parsing of a standard CSV
+  - /metrics/stats (get_dashboard_stats) and /metrics/machine-parts-history
+  - every /analytics/* endpoint
+  - /weekly/summary (get_weekly_summary) and /weekly/trend
+
+Endpoints go through the ASGI app (TestClient), so routing, validation and
+serialization are included. The real database is never touched.
+
+Usage (from backend/):
+    python -m benchmarks.hotpaths
+    python -m benchmarks.hotpaths --reports 60 --entries 400 --repeat 10 --json after.json
+    python -m benchmarks.hotpaths --json after.json --compare before.json
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import UploadFile
+
+from app.database import get_async_session, get_session
+from app.engine_config import build_async_engine, build_engine
+from app.main import app
+from app.routers.metrics import calculate_report_metrics_logic
+from app.routers.reports import upload_report
+
+from .synthetic import Scale, add_scale_arguments, generate, generate_rows, report_csv, scale_from_args
+
+
+def timed(fn: Callable[[], object], repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": len(runs),
+        "min_ms": round(min(runs), 3),
+        "median_ms": round(statistics.median(runs), 3),
+        "max_ms": round(max(runs), 3),
+    }
+
+
+def _endpoints(info: dict) -> Dict[str, tuple]:
+    """name -> (path, params) for every read endpoint under test."""
+    window = {"start_date": info["first_date"].isoformat(), "end_date": info["last_date"].isoformat()}
+    part, operator = info["sample_part"], info["sample_operator"]
+    endpoints = {"metrics/stats": ("/metrics/stats", {}), "metrics/machine-parts-history": ("/metrics/machine-parts-history", {})}
+    for group in ("shift", "part", "machine", "operator"):
+        endpoints[f"analytics/compare?group_by={group}"] = ("/analytics/compare", {"group_by": group, **window})
+    endpoints.update({
+        "analytics/quality": ("/analytics/quality", window),
+        "analytics/quality?group_by=machine": ("/analytics/quality", {"group_by": "machine", **window}),
+        "analytics/downtime": ("/analytics/downtime", window),
+        "analytics/history": ("/analytics/history", {"limit": 500, **window}),
+        "analytics/part-performance": ("/analytics/part-performance", {"part_number": part, **window}),
+        "analytics/debug": ("/analytics/debug", {}),
+        "analytics/operator-breakdown": ("/analytics/operator-breakdown", {"operator": operator, **window}),
+        "weekly/summary": ("/weekly/summary", {"shift": "All", **window}),
+        "weekly/trend": ("/weekly/trend", {"shift": "All", **window}),
+    })
+    return endpoints
+
+
+def run_suite(scale: Scale, repeat: int = 5, workdir: str = None) -> dict:
+    """Build the dataset in `workdir` (a temp dir by default) and time every hot path."""
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = build_engine(url)
+        async_engine = build_async_engine(url)
+        SQLModel.metadata.create_all(engine)
+
+        def override_session():
+            with Session(engine) as session:
+                yield session
+
+        async def override_async_session():
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                yield session
+
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides[get_session] = override_session
+        app.dependency_overrides[get_async_session] = override_async_session
+        try:
+            results = {}
+            started = time.perf_counter()
+            with Session(engine) as session:
+                info = generate(session, scale)
+            results["generate"] = {"runs": 1, "median_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+            # First pass fills Oeemetric for the read endpoints
+            started = time.perf_counter()
+            metrics_written = 0
+            with Session(engine) as session:
+                for report_id in info["report_ids"]:
+                    metrics_written += calculate_report_metrics_logic(report_id, session)[0]
+            results["calculate_all_reports"] = {"runs": 1, "median_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+            with Session(engine) as session:
+                first_report = info["report_ids"][0]
+                results["calculate_report_metrics_logic"] = timed(
+                    lambda: calculate_report_metrics_logic(first_report, session), repeat
+                )
+
+            rows = generate_rows(scale)[0]
+            csv_bytes = report_csv(rows)
+            info["sample_part"] = rows[0]["part_number"]
+            info["sample_operator"] = rows[0]["operator"]
+
+            def parse_upload():
+                with Session(engine) as session:
+                    upload_report(UploadFile(file=io.BytesIO(csv_bytes), filename="bench.csv"), session)
+            results["upload_report"] = timed(parse_upload, repeat)
+
+            client = TestClient(app)
+            for name, (path, params) in _endpoints(info).items():
+                response = client.get(path, params=params)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{name} returned {response.status_code}: {response.text[:200]}")
+                results[name] = timed(lambda: client.get(path, params=params), repeat)
+                results[name]["response_bytes"] = len(response.content)
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+            engine.dispose()
+
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "scale": asdict(scale),
+        "dataset": {
+            "reports": len(info["report_ids"]), "entries": info["entries"], "rates": info["rates"],
+            "part_machine_pairs": info["part_machine_pairs"], "metrics": metrics_written,
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def print_results(report: dict, baseline: dict = None):
+    d = report["dataset"]
+    print(f"dataset: {d['reports']} reports, {d['entries']} entries, {d['rates']} rates, {d['metrics']} metrics")
+    old = (baseline or {}).get("results", {})
+    for name, r in report["results"].items():
+        line = f"  {r['median_ms']:10.2f} ms  {name}"
+        if name in old and old[name].get("median_ms"):
+            line += f"  ({r['median_ms'] / old[name]['median_ms']:.2f}x vs baseline)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OEE hot-path micro-benchmarks on synthetic data")
+    add_scale_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare medians against")
+    args = parser.parse_args()
+
+    report = run_suite(scale_from_args(args), repeat=args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
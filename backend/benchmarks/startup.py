@@ -0,0 +1,111 @@
+"""Startup-time benchmark for the API.
+
+Measures:
+  1. `python -X importtime -c "import app.main"`: total import time and the
+     heaviest top-level modules, plus whether pandas/numpy/openpyxl were
+     pulled in at boot (they should only load on first upload/export).
+  2. Time from launching uvicorn to the first 200 from /health.
+
+The server runs against a throwaway SQLite file so the real database is never
+touched (startup applies migrations).
+
+Usage (from backend/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+
+def measure_imports(top: int = 15) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|", 2)
+        # Nesting is shown by two spaces per level after the single separator space
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        rows.append({"module": raw_name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000, "depth": depth})
+
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == "app.main"), None)
+    top_level = sorted((r for r in rows if r["depth"] <= 1), key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+    loaded = {r["module"] for r in rows}
+    return {
+        "total_ms": total,
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in loaded],
+        "top": [{"module": r["module"], "cumulative_ms": r["cumulative_ms"]} for r in top_level],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_health(timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn to the first successful /health response."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{Path(tmp) / 'bench.db'}")
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                        if resp.status == 200:
+                            return time.perf_counter() - started
+                except OSError:
+                    time.sleep(0.01)
+            raise TimeoutError("server did not answer /health in time")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="number of /health cold starts")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    health = [measure_first_health() for _ in range(args.runs)]
+    results = {
+        "imports": imports,
+        "first_health_s": {"runs": [round(h, 3) for h in health], "median": round(statistics.median(health), 3)},
+    }
+
+    print(f"import app.main: {imports['total_ms']:.1f} ms")
+    print(f"heavy modules at boot: {', '.join(imports['heavy_modules_loaded']) or 'none'}")
+    for r in imports["top"]:
+        print(f"  {r['cumulative_ms']:9.1f} ms  {r['module']}")
+    print(f"first /health: median {results['first_health_s']['median']:.3f} s over {args.runs} run(s)")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
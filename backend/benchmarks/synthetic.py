@@ -0,0 +1,237 @@
+"""Synthetic production data at configurable scale.
+
+Builds reports, report entries and rates that look like the real plant data:
+parts run on a few machines each, operators rotate across shifts, most runs
+are STANDARD with some combo/team modes, and rate coverage has gaps (some
+part/machine pairs have no rate, some rates only start partway through the
+date range), so the fallback paths in the calculation get exercised too.
+
+Used by benchmarks.hotpaths; can also fill a scratch database directly:
+    python -m benchmarks.synthetic --db scratch.db --reports 50
+"""
+import argparse
+import csv
+import io
+import json
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlmodel import Session, SQLModel, select
+
+from app.catalog import rebuild_catalog
+from app.db import ProductionReport, RateEntry, ReportEntry, RunMode
+
+RUN_MODES = [
+    ("STANDARD", "Standard Operation"),
+    ("COMBO_1OP_2PRESS", "1 Operator running 2 Presses"),
+    ("COMBO_1OP_3PRESS", "1 Operator running 3 Presses"),
+    ("TEAM_2OP_4MOLDS", "2 Operators running 4 Molds"),
+]
+# Relative frequency of each run mode on the floor
+RUN_MODE_WEIGHTS = [85, 8, 4, 3]
+SHIFTS = ["1st Shift", "2nd Shift", "3rd Shift"]
+DOWNTIME_REASONS = ["Mold Change", "Low Air", "Material Shortage", "Breakdown", "Quality Hold", "No Operator"]
+# Columns of a standard (non-raw) upload file, in the order the parser expects
+CSV_COLUMNS = ["Date", "Shift", "Operator", "Machine", "Part #", "Job", "Good", "Scrap", "Run Time", "Downtime"]
+
+
+@dataclass
+class Scale:
+    reports: int = 20
+    entries_per_report: int = 200
+    parts: int = 120
+    machines: int = 40
+    operators: int = 60
+    rate_coverage: float = 0.85   # share of part/machine pairs that have a rate
+    late_rate_share: float = 0.1  # share of rates starting after the first report date
+    start: date = date(2025, 1, 6)
+    seed: int = 42
+
+
+def machine_names(count: int) -> List[str]:
+    """Mostly injection presses, a tenth assembly cells, with the coded names uploads use."""
+    assy = max(1, count // 10)
+    return [f"INJ{i:02d}" for i in range(1, count - assy + 1)] + [f"ASY{i:02d}" for i in range(1, assy + 1)]
+
+
+def ensure_run_modes(session: Session) -> Dict[str, int]:
+    existing = {m.name: m.id for m in session.exec(select(RunMode)).all()}
+    for name, description in RUN_MODES:
+        if name not in existing:
+            mode = RunMode(name=name, description=description)
+            session.add(mode)
+            session.flush()
+            existing[name] = mode.id
+    session.commit()
+    return existing
+
+
+def _routing(rng: random.Random, scale: Scale, machines: List[str]) -> Dict[str, List[str]]:
+    """Each part runs on one to three machines."""
+    return {
+        f"P-{i:05d}": rng.sample(machines, k=min(len(machines), rng.randint(1, 3)))
+        for i in range(1, scale.parts + 1)
+    }
+
+
+def _rates(rng: random.Random, scale: Scale, routing: Dict[str, List[str]], modes: Dict[str, int]) -> List[RateEntry]:
+    rates = []
+    span = max(1, scale.reports)
+    for part, machines in routing.items():
+        for machine in machines:
+            if rng.random() >= scale.rate_coverage:
+                continue  # gap: no rate for this pair at all
+            start = scale.start - timedelta(days=365)
+            if rng.random() < scale.late_rate_share:
+                start = scale.start + timedelta(days=rng.randrange(span))
+            seconds = round(rng.uniform(8, 90), 1)
+            rates.append(RateEntry(
+                part_number=part, machine=machine, run_mode_id=modes["STANDARD"],
+                ideal_cycle_time_seconds=seconds, ideal_units_per_hour=round(3600 / seconds, 2),
+                start_date=start, active=True,
+            ))
+            if rng.random() < 0.2:
+                combo = rng.choice(RUN_MODES[1:])[0]
+                rates.append(RateEntry(
+                    part_number=part, machine=machine, run_mode_id=modes[combo],
+                    ideal_cycle_time_seconds=round(seconds * 1.3, 1), start_date=start, active=True,
+                ))
+    return rates
+
+
+def generate_rows(scale: Scale) -> List[List[dict]]:
+    """Entry rows grouped per report, without touching the database."""
+    rng = random.Random(scale.seed)
+    machines = machine_names(scale.machines)
+    routing = _routing(rng, scale, machines)
+    parts = list(routing)
+    operators = [f"Operator {i:03d}" for i in range(1, scale.operators + 1)]
+    mode_names = [m[0] for m in RUN_MODES]
+
+    reports = []
+    for r in range(scale.reports):
+        day = scale.start + timedelta(days=r)
+        rows = []
+        for _ in range(scale.entries_per_report):
+            part = rng.choice(parts)
+            run_time = round(rng.uniform(180, 480), 1)
+            downtime = round(rng.uniform(0, 90), 1) if rng.random() < 0.6 else 0.0
+            good = int(run_time * rng.uniform(0.5, 3.0))
+            events = None
+            if downtime:
+                split = rng.uniform(0.2, 0.8)
+                events = [
+                    {"reason": rng.choice(DOWNTIME_REASONS), "minutes": round(downtime * split, 1)},
+                    {"reason": rng.choice(DOWNTIME_REASONS), "minutes": round(downtime * (1 - split), 1)},
+                ]
+            rows.append({
+                "date": day,
+                "shift": rng.choice(SHIFTS),
+                "operator": rng.choice(operators),
+                "machine": rng.choice(routing[part]),
+                "part_number": part,
+                "job": f"SO{rng.randrange(10000, 99999)}",
+                "run_mode": rng.choices(mode_names, weights=RUN_MODE_WEIGHTS)[0],
+                "good_count": good,
+                "reject_count": int(good * rng.uniform(0, 0.05)),
+                "run_time_min": run_time,
+                "downtime_min": downtime,
+                "downtime_events": events,
+            })
+        reports.append(rows)
+    return reports
+
+
+def generate(session: Session, scale: Scale) -> dict:
+    """Write rates, reports and entries for `scale`; returns ids and counts."""
+    rng = random.Random(scale.seed + 1)
+    modes = ensure_run_modes(session)
+    routing = _routing(random.Random(scale.seed), scale, machine_names(scale.machines))
+    rates = _rates(rng, scale, routing, modes)
+    session.bulk_save_objects(rates)
+
+    report_ids = []
+    entry_count = 0
+    for i, rows in enumerate(generate_rows(scale)):
+        report = ProductionReport(filename=f"synthetic_{i:04d}.csv", uploaded_at=datetime(2025, 1, 1) + timedelta(days=i))
+        session.add(report)
+        session.flush()
+        report_ids.append(report.id)
+        session.bulk_save_objects([
+            ReportEntry(
+                report_id=report.id, date=row["date"], shift=row["shift"], operator=row["operator"],
+                machine=row["machine"], part_number=row["part_number"], job=row["job"],
+                run_mode_id=modes[row["run_mode"]],
+                planned_production_time_min=row["run_time_min"] + row["downtime_min"],
+                run_time_min=row["run_time_min"], downtime_min=row["downtime_min"],
+                total_count=row["good_count"] + row["reject_count"],
+                good_count=row["good_count"], reject_count=row["reject_count"],
+                downtime_events=json.dumps(row["downtime_events"]) if row["downtime_events"] else None,
+            )
+            for row in rows
+        ])
+        entry_count += len(rows)
+    # Derived tables the upload/rate paths keep current
+    rebuild_catalog(session)
+    session.commit()
+
+    return {
+        "report_ids": report_ids,
+        "entries": entry_count,
+        "rates": len(rates),
+        "part_machine_pairs": sum(len(m) for m in routing.values()),
+        "first_date": scale.start,
+        "last_date": scale.start + timedelta(days=max(0, scale.reports - 1)),
+    }
+
+
+def report_csv(rows: List[dict]) -> bytes:
+    """Render entry rows as a standard upload file (run/down time in minutes)."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row["date"].isoformat(), row["shift"], row["operator"], row["machine"], row["part_number"],
+            row["job"], row["good_count"], row["reject_count"], row["run_time_min"], row["downtime_min"],
+        ])
+    return out.getvalue().encode("utf-8")
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    defaults = Scale()
+    parser.add_argument("--reports", type=int, default=defaults.reports)
+    parser.add_argument("--entries", type=int, default=defaults.entries_per_report, help="entries per report")
+    parser.add_argument("--parts", type=int, default=defaults.parts)
+    parser.add_argument("--machines", type=int, default=defaults.machines)
+    parser.add_argument("--operators", type=int, default=defaults.operators)
+    parser.add_argument("--rate-coverage", type=float, default=defaults.rate_coverage)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def scale_from_args(args) -> Scale:
+    return Scale(
+        reports=args.reports, entries_per_report=args.entries, parts=args.parts,
+        machines=args.machines, operators=args.operators, rate_coverage=args.rate_coverage, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a SQLite file with synthetic OEE data")
+    parser.add_argument("--db", required=True, help="SQLite file to create or extend")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    from app.engine_config import build_engine
+    engine = build_engine(f"sqlite:///{args.db}")
+    SQLModel.metadata.create_all(engine)
+    scale = scale_from_args(args)
+    with Session(engine) as session:
+        info = generate(session, scale)
+    print(json.dumps({"scale": asdict(scale), "reports": len(info["report_ids"]), "entries": info["entries"], "rates": info["rates"]}, default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
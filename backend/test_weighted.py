@@ -1,24 +1,32 @@
 import sys
 import os
 import json
+import asyncio
 from datetime import date
-from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
 from app.routers.weekly import get_weekly_summary
 from app.db import Oeemetric, ProductionReport
 
-# Setup in-memory DB
-engine = create_engine("sqlite:///:memory:")
-SQLModel.metadata.create_all(engine)
+# Setup in-memory DB (the weekly summary runs on the async session)
+engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
 
 def test_weighted_calculation():
+    asyncio.run(_weighted_calculation())
+
+async def _weighted_calculation():
     print("Testing Weighted Average Logic...")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
     
-    with Session(engine) as session:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         # Create Dummy Report
         report = ProductionReport(filename="test.csv", upload_date=date(2023, 1, 1))
         session.add(report)
-        session.commit()
-        session.refresh(report)
+        await session.commit()
+        await session.refresh(report)
         
         # Case 1: High OEE, Low Volume
         m1 = Oeemetric(
@@ -42,10 +50,10 @@ def test_weighted_calculation():
         
         session.add(m1)
         session.add(m2)
-        session.commit()
+        await session.commit()
         
         # Run Calculation
-        result = get_weekly_summary(
+        result = await get_weekly_summary(
             start_date=date(2023, 1, 1),
             end_date=date(2023, 1, 7),
             shift="All",
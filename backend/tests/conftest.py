@@ -0,0 +1,78 @@
+"""Shared fixtures: one database and one TestClient per test module.
+
+`engine` is an in-memory SQLite database created from the models. Modules
+that also read through the async engine (analytics, weekly) are marked
+`async_db` and get a temporary file instead, opened by both engines.
+`client` points the app's session dependencies at that database and removes
+every dependency override when the module ends, even after a failure.
+"""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool, StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.main import app
+from app.database import get_async_session, get_session
+from app.db import User
+from app.routers.auth import get_current_user
+
+MANAGER = User(id=1, email="mgr@example.com", hashed_password="x", role="manager")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "async_db: database file shared by the sync and async engines")
+
+
+@pytest.fixture(scope="module")
+def engine(request, tmp_path_factory):
+    if request.node.get_closest_marker("async_db"):
+        path = tmp_path_factory.mktemp("db") / "test.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def async_engine(engine):
+    assert engine.url.database, "mark the module async_db to read through the async engine"
+    # NullPool: an idle pooled aiosqlite connection can hold the lock the sync engine needs
+    return create_async_engine(f"sqlite+aiosqlite:///{engine.url.database}", poolclass=NullPool)
+
+
+@pytest.fixture(scope="module")
+def client(request, engine):
+    def override_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    if request.node.get_closest_marker("async_db"):
+        async_engine = request.getfixturevalue("async_engine")
+
+        async def override_async_session():
+            async with AsyncSession(async_engine) as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = override_async_session
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="module")
+def login(client):
+    """`login(user)` makes the module's requests run as `user` (a manager by default)."""
+    def login(user: User = MANAGER):
+        app.dependency_overrides[get_current_user] = lambda: user
+    return login
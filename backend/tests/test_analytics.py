@@ -0,0 +1,131 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import Oeemetric, ProductionReport
+from app.dimensions import assign_dimensions
+from app.distributions import QUANTILES, group_distributions
+from app.operators import DEFAULT_EXCLUDED_OPERATORS, is_excluded, load_patterns, mark_excluded
+
+# /analytics/ reads through the async engine
+pytestmark = pytest.mark.async_db
+
+def _metric(operator, oee, part="P1", shift="1st Shift", day=date(2025, 1, 7)):
+    return Oeemetric(report_id=1, date=day, operator=operator, part_number=part, shift=shift, oee=oee,
+                     availability=1.0, performance=oee, quality=1.0, good_count=100, reject_count=0, run_time_min=60)
+
+@pytest.fixture(scope="module", autouse=True)
+def metrics(engine, login):
+    login()
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.commit()
+        metrics = [_metric("Alice", 0.9), _metric("Alice", 0.7), _metric("Bob", 0.6),
+                   _metric("Brown, Shirley", 0.99), _metric(None, 0.5)]
+        mark_excluded(session, metrics)
+        session.add_all(metrics)
+        session.commit()
+
+def test_exclusion_patterns_match_name_variants(engine):
+    with Session(engine) as session:
+        patterns = load_patterns(session)
+    assert len(patterns) == 2
+    for name in ("Shirley Brown", "Brown,Shirley", "brown shirley (QA)", "Elliot Ison"):
+        assert is_excluded(name, patterns)
+    assert not is_excluded("Shirley Browning", patterns)
+    assert not is_excluded(None, patterns)
+
+def test_operator_views_skip_flagged_metrics(client):
+    names = [row["name"] for row in client.get("/analytics/compare", params={"group_by": "operator"}).json()]
+    assert names == ["Alice", "Bob"]
+    # Other groupings keep every metric
+    shifts = client.get("/analytics/compare", params={"group_by": "shift"}).json()
+    assert shifts[0]["sample_size"] == 5
+
+    data = client.get("/analytics/part-performance", params={"part_number": "P1"}).json()
+    assert [o["operator"] for o in data["operators"]] == ["Alice", "Bob"]
+    assert data["total_runs"] == 3
+    alice = data["operators"][0]
+    assert (alice["average_oee"], alice["sample_size"]) == (0.8, 2)
+    assert alice["distribution"] == {"min": 0.7, "q1": 0.75, "median": 0.8, "q3": 0.85, "p90": 0.88, "max": 0.9}
+    assert data["global_distribution"]["median"] == 0.7 and data["global_average_oee"] == round(2.2 / 3, 4)
+
+def test_changing_the_list_reflags_stored_metrics(client, engine):
+    response = client.put("/settings/excluded_operators", json={"value": json.dumps(["Bob", "bob"])})
+    assert response.status_code == 200
+    names = [row["name"] for row in client.get("/analytics/compare", params={"group_by": "operator"}).json()]
+    assert names == ["Brown, Shirley", "Alice"]
+
+    assert client.put("/settings/excluded_operators", json={"value": "Bob"}).status_code == 400
+    client.put("/settings/excluded_operators", json={"value": json.dumps(DEFAULT_EXCLUDED_OPERATORS)})
+    with Session(engine) as session:
+        assert set(session.exec(select(Oeemetric.operator).where(Oeemetric.excluded == True)).all()) == {"Brown, Shirley"}
+
+def test_quality_pareto_in_sql(client, engine):
+    day = date(2025, 2, 3)
+    with Session(engine) as session:
+        for part, shift, machine, reject in (("P1", "1st Shift", "INJ01", 30), ("P2", "1st Shift", "INJ01", 10),
+                                             ("P3", "2nd Shift", "INJ02", 0), ("P1", "2nd Shift", "INJ02", 10)):
+            m = _metric("Carol", 0.8, part=part, shift=shift, day=day)
+            m.machine, m.good_count, m.reject_count = machine, 100 - reject, reject
+            session.add(m)
+        session.commit()
+    window = {"start_date": "2025-02-01", "end_date": "2025-02-28"}
+
+    rows = client.get("/analytics/quality", params={"limit": 2, **window}).json()
+    assert [(r["part_number"], r["total_rejects"], r["total_produced"], r["reject_rate"]) for r in rows] == \
+        [("P1", 40, 200, 20.0), ("P2", 10, 100, 10.0)]
+    # Shares are of all rejects in the window, not just the rows returned
+    assert [(r["reject_share"], r["cumulative_share"]) for r in rows] == [(80.0, 80.0), (20.0, 100.0)]
+
+    rows = client.get("/analytics/quality", params={"group_by": "machine", **window}).json()
+    assert [(r["machine"], r["total_rejects"]) for r in rows] == [("INJ01", 40), ("INJ02", 10)]
+    rows = client.get("/analytics/quality", params={"group_by": "shift", **window}).json()
+    assert [(r["name"], r["cumulative_share"]) for r in rows] == [("1st Shift", 80.0), ("2nd Shift", 100.0)]
+
+def test_operator_breakdown_single_query(client, engine):
+    with Session(engine) as session:
+        metrics = []
+        for name, oee, parts, part, shift in (("Smith, Dana", 1.0, 10, "P1", "1st Shift"), ("Dana Smith", 0.5, 90, "P1", "1st Shift"),
+                                              ("Dana Smith", 0.6, 100, "P2", "2nd Shift")):
+            m = _metric(name, oee, part=part, shift=shift, day=date(2025, 3, 3))
+            m.good_count = parts
+            metrics.append(m)
+        assign_dimensions(session, metrics)
+        session.add_all(metrics)
+        session.commit()
+
+    # Either spelling finds all three runs
+    data = client.get("/analytics/operator-breakdown", params={"operator": "Dana Smith"}).json()
+    shifts = {s["name"]: s for s in data["shift_performance"]}
+    assert shifts["1st Shift"] == {"name": "1st Shift", "oee": 0.75, "weighted_oee": 0.55, "samples": 2, "total_parts": 100}
+    assert shifts["2nd Shift"]["samples"] == 1
+    assert [(p["name"], p["oee"], p["samples"]) for p in data["part_performance"]] == [("P1", 0.75, 2), ("P2", 0.6, 1)]
+
+    assert client.get("/analytics/operator-breakdown", params={"operator": "Nobody"}).json() == \
+        {"shift_performance": [], "part_performance": []}
+
+def test_history_accepts_the_name_compare_returns(client):
+    window = {"start_date": "2025-03-01", "end_date": "2025-03-31"}
+    names = [row["name"] for row in client.get("/analytics/compare", params={"group_by": "operator", **window}).json()]
+    assert len(names) == 1
+    for operator in names + ["Smith, Dana"]:
+        rows = client.get("/analytics/history", params={"operator": operator}).json()
+        assert sorted(r["oee"] for r in rows) == [0.5, 0.6, 1.0]
+
+def test_group_distributions_match_numpy_percentiles():
+    import numpy as np
+    rng = np.random.default_rng(7)
+    values = rng.random(500)
+    keys = [int(k) for k in rng.integers(0, 9, 500)]
+    stats = group_distributions(keys, values)
+    for key in set(keys):
+        expected = np.percentile(values[np.array(keys) == key], [0, 25, 50, 75, 90, 100])
+        got = [stats[key][name] for name, _ in QUANTILES]
+        assert np.allclose(got, np.round(expected, 4))
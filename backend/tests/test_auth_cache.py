@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import timedelta
+
+import pytest
+from sqlmodel import Session
+
+from app.db import User
+from app.routers.auth import create_access_token, principal_cache, get_password_hash
+
+def _headers(email):
+    token = create_access_token({"sub": email}, expires_delta=timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="module", autouse=True)
+def users(engine):
+    principal_cache.clear()
+    with Session(engine) as session:
+        session.add(User(email="admin@test", hashed_password=get_password_hash("x"), role="admin"))
+        session.add(User(email="viewer@test", hashed_password=get_password_hash("x"), role="viewer"))
+        session.commit()
+    yield
+    principal_cache.clear()
+
+def test_principal_served_from_cache(client):
+    hits = principal_cache.hits
+    assert client.get("/auth/me", headers=_headers("viewer@test")).json()["role"] == "viewer"
+    assert client.get("/auth/me", headers=_headers("viewer@test")).json()["role"] == "viewer"
+    assert principal_cache.hits == hits + 1
+
+def test_update_user_invalidates_cached_principal(client):
+    client.get("/auth/me", headers=_headers("viewer@test"))
+    users = client.get("/auth/users", headers=_headers("admin@test")).json()
+    viewer_id = next(u["id"] for u in users if u["email"] == "viewer@test")
+
+    response = client.put(f"/auth/users/{viewer_id}", json={"role": "supervisor"}, headers=_headers("admin@test"))
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=_headers("viewer@test")).json()["role"] == "supervisor"
+
+def test_delete_user_invalidates_cached_principal(client, engine):
+    with Session(engine) as session:
+        session.add(User(email="temp@test", hashed_password="x", role="viewer"))
+        session.commit()
+    assert client.get("/auth/me", headers=_headers("temp@test")).status_code == 200
+    users = client.get("/auth/users", headers=_headers("admin@test")).json()
+    temp_id = next(u["id"] for u in users if u["email"] == "temp@test")
+
+    assert client.delete(f"/auth/users/{temp_id}", headers=_headers("admin@test")).status_code == 200
+    assert client.get("/auth/me", headers=_headers("temp@test")).status_code == 401
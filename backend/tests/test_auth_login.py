@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+import pytest
+from sqlmodel import Session, select
+
+from app.db import User
+from app.routers import auth
+
+@pytest.fixture(scope="module", autouse=True)
+def legacy_user(engine):
+    with Session(engine) as session:
+        # Stored with a lower cost than the configured BCRYPT_ROUNDS
+        legacy = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode("utf-8")
+        session.add(User(email="sup@test", hashed_password=legacy, role="supervisor"))
+        session.commit()
+
+def test_login_rejects_bad_password(client):
+    response = client.post("/auth/login", data={"username": "sup@test", "password": "wrong"})
+    assert response.status_code == 401
+
+def test_login_rehashes_when_cost_changes(client, engine):
+    before = auth.password_hash_stats()["completed"]
+    response = client.post("/auth/login", data={"username": "sup@test", "password": "secret"})
+    assert response.status_code == 200
+    assert response.json()["role"] == "supervisor"
+    # verify + rehash both ran on the bcrypt executor
+    assert auth.password_hash_stats()["completed"] >= before + 2
+
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.email == "sup@test")).first()
+        assert not auth.password_needs_rehash(user.hashed_password)
+        assert auth.verify_password("secret", user.hashed_password)
+
+def test_queue_limit_rejects_when_full(client, monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_QUEUE_LIMIT", 0)
+    response = client.post("/auth/login", data={"username": "sup@test", "password": "secret"})
+    assert response.status_code == 503
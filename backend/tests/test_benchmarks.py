@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import Scale, generate_rows
+from benchmarks.hotpaths import run_suite
+
+SMALL = Scale(reports=2, entries_per_report=20, parts=10, machines=5, operators=6)
+
+def test_generator_is_deterministic_per_seed():
+    assert generate_rows(SMALL) == generate_rows(SMALL)
+    rows = generate_rows(SMALL)
+    assert [len(r) for r in rows] == [20, 20]
+    assert {row["run_mode"] for r in rows for row in r} <= {"STANDARD", "COMBO_1OP_2PRESS", "COMBO_1OP_3PRESS", "TEAM_2OP_4MOLDS"}
+
+def test_suite_times_every_hot_path():
+    report = run_suite(SMALL, repeat=1)
+    assert report["dataset"]["entries"] == 40
+    assert report["dataset"]["metrics"] > 0
+    for name in ("calculate_report_metrics_logic", "upload_report", "metrics/stats",
+                 "analytics/quality", "analytics/downtime", "weekly/summary"):
+        assert report["results"][name]["median_ms"] >= 0
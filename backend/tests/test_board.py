@@ -0,0 +1,117 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.database import get_session
+from app.db import User, Setting
+from app.migrations import MIGRATIONS
+
+manager = User(id=1, email="mgr@example.com", password_hash="x", role="manager")
+supervisor = User(id=2, email="sup@example.com", password_hash="x", role="supervisor", shift_scope="2nd Shift")
+
+@pytest.fixture(scope="module")
+def patch(client, login):
+    def patch(changes, since=None, user=manager):
+        login(user)
+        return client.patch("/board/", json={"changes": changes, "since": since})
+    return patch
+
+def test_create_and_partial_update(patch):
+    res = patch([
+        {"kind": "machine", "key": "inj-1", "data": {"name": "Injection 1", "status": "RUNNING"}},
+        {"kind": "machine_shift", "key": "inj-1:1st Shift", "data": {"operator": "Alice"}},
+    ])
+    assert res.status_code == 200
+    body = res.json()
+    revision = body["revision"]
+    assert {(r["kind"], r["key"], r["version"]) for r in body["records"]} == {("machine", "inj-1", 1), ("machine_shift", "inj-1:1st Shift", 1)}
+
+    # Only the changed field is sent; the rest of the record is kept
+    res = patch([{"kind": "machine", "key": "inj-1", "version": 1, "data": {"status": "MAINT", "notes": "leak"}}])
+    record = res.json()["records"][0]
+    assert record["version"] == 2 and res.json()["revision"] == revision + 1
+    assert record["data"] == {"name": "Injection 1", "status": "MAINT", "notes": "leak"}
+
+    # null removes a field
+    record = patch([{"kind": "machine", "key": "inj-1", "version": 2, "data": {"notes": None}}]).json()["records"][0]
+    assert "notes" not in record["data"]
+
+def test_stale_version_conflicts_without_writing(client, patch):
+    board = client.get("/board/").json()
+    machine = next(r for r in board["records"] if r["key"] == "inj-1")
+    res = patch([
+        {"kind": "machine_shift", "key": "inj-1:1st Shift", "version": 1, "data": {"operator": "Bob"}},
+        {"kind": "machine", "key": "inj-1", "version": machine["version"] - 1, "data": {"status": "RUNNING"}},
+    ])
+    assert res.status_code == 409
+    conflicts = res.json()["detail"]["conflicts"]
+    assert [c["key"] for c in conflicts] == ["inj-1"] and conflicts[0]["version"] == machine["version"]
+    # All or nothing: the valid change was not applied either
+    after = {r["key"]: r for r in client.get("/board/").json()["records"]}
+    assert after["inj-1:1st Shift"]["data"]["operator"] == "Alice"
+    assert client.get("/board/").json()["revision"] == board["revision"]
+
+    # Creating a record that already exists is a conflict too
+    assert patch([{"kind": "machine", "key": "inj-1", "data": {"status": "RUNNING"}}]).status_code == 409
+
+    # One patch may touch a record only once
+    res = patch([
+        {"kind": "machine", "key": "inj-1", "version": machine["version"], "data": {"status": "RUNNING"}},
+        {"kind": "machine", "key": "inj-1", "version": machine["version"], "data": {"status": "DOWN"}},
+    ])
+    assert res.status_code == 400
+    assert client.get("/board/").json()["revision"] == board["revision"]
+
+def test_diff_since_revision_includes_deletes(client, patch):
+    base = client.get("/board/").json()["revision"]
+    patch([{"kind": "notes", "key": "1st Shift", "data": {"topIssues": "Dryer down"}}])
+    shift_record = next(r for r in client.get("/board/").json()["records"] if r["key"] == "inj-1:1st Shift")
+    patch([{"kind": "machine_shift", "key": "inj-1:1st Shift", "version": shift_record["version"], "delete": True}])
+
+    diff = client.get("/board/", params={"since": base}).json()
+    assert [(r["key"], r["deleted"]) for r in diff["records"]] == [("1st Shift", False), ("inj-1:1st Shift", True)]
+    assert all(r["key"] != "inj-1:1st Shift" for r in client.get("/board/").json()["records"])
+
+    # A save with `since` returns the other writers' changes as well
+    res = patch([{"kind": "notes", "key": "2nd Shift", "data": {"actions": "Restock"}}], since=base)
+    assert {r["key"] for r in res.json()["records"]} == {"1st Shift", "inj-1:1st Shift", "2nd Shift"}
+
+def test_supervisor_limited_to_own_shift(patch):
+    res = patch([{"kind": "machine_shift", "key": "inj-1:3rd Shift", "data": {"operator": "Eve"}}], user=supervisor)
+    assert res.status_code == 403
+    res = patch([{"kind": "machine_shift", "key": "inj-1:2nd Shift", "data": {"operator": "Eve"}}], user=supervisor)
+    assert res.status_code == 200
+    operator = User(id=3, email="op@example.com", password_hash="x", role="operator")
+    assert patch([{"kind": "notes", "key": "2nd Shift", "version": 1, "data": {}}], user=operator).status_code == 403
+
+def test_migration_imports_legacy_blob(client, monkeypatch):
+    legacy_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(legacy_engine)
+    state = {
+        "currentShift": "Day Shift",
+        "categories": [{"id": "cat-a", "name": "Injection", "machines": [
+            {"id": "m1", "name": "Injection 1", "status": "RUNNING", "operator": "Old"},
+            {"id": "m2", "name": "Injection 2", "status": "MAINT", "shiftOperators": {"Day Shift": "Ann", "2nd Shift": "Ben"}},
+        ]}],
+        "shiftNotes": {"topIssues": "x", "materialShortages": "", "escalations": "", "actions": "", "generalNotes": ""},
+    }
+    migrate = dict((n, fn) for n, _, fn in MIGRATIONS)[10]
+    with Session(legacy_engine) as session:
+        session.add(Setting(key="production_board_state", value=json.dumps(state)))
+        session.commit()
+        migrate(session)
+        session.commit()
+
+    monkeypatch.setitem(app.dependency_overrides, get_session, lambda: Session(legacy_engine))
+    records = {(r["kind"], r["key"]): r["data"] for r in client.get("/board/").json()["records"]}
+    assert records[("board", "main")] == {"currentShift": "1st Shift", "categoryOrder": ["cat-a"]}
+    assert records[("category", "cat-a")]["machineOrder"] == ["m1", "m2"]
+    assert records[("machine_shift", "m1:1st Shift")] == {"operator": "Old"}
+    assert records[("machine_shift", "m2:1st Shift")] == {"operator": "Ann"}
+    assert records[("notes", "1st Shift")]["topIssues"] == "x"
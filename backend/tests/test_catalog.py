@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+from sqlmodel import Session, select
+
+from app.db import MachinePart, ProductionReport, ReportEntry, RateEntry
+from app.catalog import add_pairs, machine_parts_cache, normalize_machine_name, prune_pairs, rebuild_catalog
+from app.routers.metrics import calculate_report_metrics_logic
+
+def test_normalize_machine_name():
+    assert normalize_machine_name("ASY01") == "Assy 1"
+    assert normalize_machine_name(" inj34 ") == "Inj 34"
+    assert normalize_machine_name("CMP09") == "Cmp 9"
+    assert normalize_machine_name("INSP1") == "Insp 1"
+    assert normalize_machine_name("Press A") == "Press A"
+
+def test_writes_keep_catalog_current(client, engine):
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P2", machine="INJ02", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        add_pairs(session, [("INJ02", "P2")])
+        session.commit()
+        for machine in ("INJ01", "Inj 1"):
+            session.add(ReportEntry(report_id=1, date=date(2025, 1, 7), operator="Op1", machine=machine, part_number="P1 ",
+                                    shift="1st Shift", planned_production_time_min=60, run_time_min=60, downtime_min=0,
+                                    total_count=80, good_count=80, reject_count=0))
+        add_pairs(session, [("INJ01", "P1 "), ("Inj 1", "P1 "), ("INJ01", "P1 "), (None, "P3"), ("INJ03", " ")])
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+
+    history = client.get("/metrics/machine-parts-history").json()
+    assert history == {"Inj 1": ["P1"], "Inj 2": ["P2"]}
+    # Unchanged catalog: served from the cache
+    hits = machine_parts_cache.hits
+    assert client.get("/metrics/machine-parts-history").json() == history
+    assert machine_parts_cache.hits == hits + 1
+
+    # Removing the rate drops its pair; P1 stays while entries/metrics still use it
+    with Session(engine) as session:
+        rate = session.exec(select(RateEntry)).one()
+        session.delete(rate)
+        assert prune_pairs(session, [("INJ02", "P2"), ("INJ01", "P1 ")]) == 1
+        session.commit()
+    assert client.get("/metrics/machine-parts-history").json() == {"Inj 1": ["P1"]}
+
+def test_rebuild_matches_sources(engine):
+    with Session(engine) as session:
+        session.exec(MachinePart.__table__.delete())
+        session.commit()
+        assert rebuild_catalog(session) == 2
+        session.commit()
+        assert sorted(session.exec(select(MachinePart.machine_raw)).all()) == ["INJ01", "Inj 1"]
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import Oeemetric, Operator, Part, ProductionReport, RateEntry, ReportEntry
+from app.dimensions import operator_key, operator_name, resolve
+from app.routers.metrics import calculate_report_metrics_logic
+
+# /analytics/ reads through the async engine
+pytestmark = pytest.mark.async_db
+
+def _entry(operator, part, good, shift="1st Shift"):
+    return ReportEntry(report_id=1, date=date(2025, 1, 7), operator=operator, machine="INJ01", part_number=part, job="J-1",
+                       shift=shift, planned_production_time_min=60, run_time_min=60, downtime_min=0,
+                       total_count=good, good_count=good, reject_count=0)
+
+@pytest.fixture(scope="module", autouse=True)
+def report(engine, login):
+    login()
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P1", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.commit()
+        session.add_all([_entry("Lopez,Maria", "P1", 100), _entry("Maria  Lopez", "P1", 80, shift="2nd Shift"),
+                         _entry("Sam Jones", "P1", 50), _entry("S Jones", "P1", 40, shift="2nd Shift")])
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+
+def test_normalization(engine):
+    assert operator_key("Lopez,Maria") == operator_key(" maria LOPEZ ") == "lopez maria"
+    assert operator_name("Lopez, Maria") == "Maria Lopez"
+    assert operator_name("2765  Carter, Evan") == "2765 Carter, Evan"
+    assert operator_key("2765 Carter, Evan") == operator_key("2765 Evan Carter")
+    assert operator_key("Unknown") == operator_key("Any") == ""
+    with Session(engine) as session:
+        ids = resolve(session, "part", ["P1", " p1", "P 2", "p  2", "Unknown"])
+        session.rollback()
+    assert ids["P1"] == ids[" p1"] and ids["P 2"] == ids["p  2"] and "Unknown" not in ids
+
+def test_calculation_links_metrics_to_dimensions(engine):
+    with Session(engine) as session:
+        metrics = session.exec(select(Oeemetric).where(Oeemetric.operator.in_(["Lopez,Maria", "Maria  Lopez"]))).all()
+        assert len(metrics) == 2
+        assert len({m.operator_id for m in metrics}) == 1
+        assert {m.part_id for m in metrics} == {session.exec(select(Part.id).where(Part.key == "P1")).one()}
+        assert session.get(Operator, metrics[0].operator_id).name == "Maria Lopez"
+        assert all(m.job_id is not None for m in metrics)
+
+def test_compare_groups_spellings_together(client):
+    rows = client.get("/analytics/compare", params={"group_by": "operator"}).json()
+    assert [(r["name"], r["sample_size"]) for r in rows] == [("Maria Lopez", 2), ("Sam Jones", 1), ("S Jones", 1)]
+
+def test_alias_merges_spellings(client, engine):
+    with Session(engine) as session:
+        sam, s = (session.exec(select(Operator.id).where(Operator.key == k)).one() for k in ("jones sam", "jones s"))
+
+    response = client.post(f"/dimensions/operator/{sam}/aliases", json={"names": ["S Jones", "Jones, Samuel"]})
+    assert response.status_code == 200
+    assert response.json()["merged_ids"] == [s]
+    assert response.json()["aliases"] == ["jones s", "jones samuel"]
+
+    with Session(engine) as session:
+        assert session.get(Operator, s) is None
+        assert resolve(session, "operator", ["Samuel Jones"]) == {"Samuel Jones": sam}
+    rows = client.get("/analytics/compare", params={"group_by": "operator"}).json()
+    assert ("Sam Jones", 2) in [(r["name"], r["sample_size"]) for r in rows]
+    assert client.get("/dimensions/shift").status_code == 404
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.engine_config import build_engine, effective_settings
+
+def test_sqlite_pragmas_applied(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+    engine = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    info = effective_settings(engine)
+    assert info["dialect"] == "sqlite"
+    assert info["actual"]["journal_mode"] == "wal"
+    assert info["actual"]["synchronous"] == 1  # NORMAL
+    assert info["actual"]["busy_timeout"] == 1234
+    assert info["actual"]["cache_size"] == -64000
+
+def test_postgres_pool_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "7")
+    # No connection is made until first use
+    engine = build_engine("postgresql://user:pw@localhost/oee")
+    info = effective_settings(engine)
+    assert info["configured"]["pool_pre_ping"] is True
+    assert info["pool"]["size"] == 3
+    assert engine.pool._max_overflow == 7
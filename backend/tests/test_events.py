@@ -0,0 +1,101 @@
+import sys
+import os
+import json
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import ChangeEvent, ProductionReport, ReportEntry, RateEntry
+from app.events import Broadcaster, broadcaster, event_stream, publish
+from app.routers.metrics import calculate_report_metrics_logic
+
+# The broadcaster polls through the async engine
+pytestmark = pytest.mark.async_db
+
+@pytest.fixture(scope="module", autouse=True)
+def hub_engine(async_engine):
+    broadcaster.engine = async_engine
+    yield
+    broadcaster.engine = None
+
+def publish_and_commit(engine, type, data, commit=True):
+    with Session(engine) as session:
+        publish(session, type, data)
+        if commit:
+            session.commit()
+        else:
+            session.rollback()
+
+def test_commit_wakes_local_subscribers(engine, async_engine):
+    async def scenario():
+        hub = Broadcaster(poll_seconds=30)  # far longer than the wait below: only the wake can deliver
+        hub.engine = async_engine
+        queue = hub.subscribe()
+        await asyncio.sleep(0.05)  # poller reads the starting id
+        # Writes happen in threadpool endpoints; the commit hook must wake the loop from there
+        import app.events as events
+        events.broadcaster, previous = hub, events.broadcaster
+        try:
+            await asyncio.to_thread(publish_and_commit, engine, "rolled_back", {}, False)
+            await asyncio.to_thread(publish_and_commit, engine, "rates_changed", {"part_numbers": ["P1"]})
+            item = await asyncio.wait_for(queue.get(), 2)
+        finally:
+            events.broadcaster = previous
+            hub.unsubscribe(queue)
+        return item
+
+    item = asyncio.run(scenario())
+    assert item["type"] == "rates_changed" and item["data"] == {"part_numbers": ["P1"]}
+
+def test_other_worker_events_arrive_by_polling(engine, async_engine):
+    async def scenario():
+        hub = Broadcaster(poll_seconds=0.05)
+        hub.engine = async_engine
+        first, second = hub.subscribe(), hub.subscribe()
+        await asyncio.sleep(0.1)
+        # Written by "another process": no wake, only the poll finds it
+        with Session(engine) as session:
+            session.add(ChangeEvent(type="report_deleted", payload=json.dumps({"report_id": 7})))
+            session.commit()
+        items = [await asyncio.wait_for(q.get(), 2) for q in (first, second)]
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        return items
+
+    items = asyncio.run(scenario())
+    assert [i["data"] for i in items] == [{"report_id": 7}, {"report_id": 7}]
+
+def test_stream_replays_missed_events(engine):
+    with Session(engine) as session:
+        last = session.exec(select(ChangeEvent.id).order_by(ChangeEvent.id.desc())).first()
+    publish_and_commit(engine, "board", {"revision": 1, "records": [{"kind": "machine", "key": "m1", "version": 2, "deleted": False}]})
+
+    async def scenario():
+        stream = event_stream(after_id=last)
+        chunks = [await stream.__anext__() for _ in range(2)]
+        await stream.aclose()
+        return chunks
+
+    retry, replayed = asyncio.run(scenario())
+    assert retry.startswith("retry:")
+    lines = replayed.strip().split("\n")
+    assert lines[0] == f"id: {last + 1}" and lines[1] == "event: board"
+    assert json.loads(lines[2][len("data: "):])["records"][0]["key"] == "m1"
+
+def test_calculation_publishes_in_same_transaction(engine):
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P1", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.commit()
+        report_id = session.exec(select(ProductionReport.id)).first()
+        session.add(ReportEntry(report_id=report_id, date=date(2025, 1, 7), operator="Op1", machine="INJ01", part_number="P1",
+                                shift="1st Shift", planned_production_time_min=60, run_time_min=60, downtime_min=0,
+                                total_count=80, good_count=80, reject_count=0))
+        session.commit()
+        calculate_report_metrics_logic(report_id, session)
+        event = session.exec(select(ChangeEvent).where(ChangeEvent.type == "report_calculated")).one()
+    assert json.loads(event.payload) == {"report_id": report_id, "metrics": 1, "start_date": "2025-01-07", "end_date": "2025-01-07"}
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import Machine, Oeemetric, ProductionReport, RateEntry, ReportEntry
+from app.machines import MachineRegistry
+from app.routers.metrics import calculate_report_metrics_logic
+
+@pytest.fixture(scope="module", autouse=True)
+def as_manager(login):
+    login()
+
+def test_spellings_resolve_to_one_machine(engine):
+    with Session(engine) as session:
+        registry = MachineRegistry(session)
+        inj = registry.resolve("INJ34")
+        assert registry.resolve("Inj 34") == inj
+        assert registry.resolve(" inj34") == inj
+        assert registry.lookup("ASY01") is None
+        assy = registry.resolve("ASY01")
+        session.commit()
+
+        # A fresh registry finds the stored machines
+        registry = MachineRegistry(session)
+        assert registry.lookup("Assy 1") == assy
+        assert registry.types[inj] == "injection"
+        assert registry.types[assy] == "assembly"
+        assert registry.names[inj] == "Inj 34"
+
+def test_calculate_matches_rates_by_machine_id(engine):
+    with Session(engine) as session:
+        registry = MachineRegistry(session)
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P5", machine="INJ05", machine_id=registry.resolve("INJ05"),
+                              start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        # Same part on an assembly machine runs at a different rate
+        session.add(RateEntry(part_number="P5", machine="ASY05", machine_id=registry.resolve("ASY05"),
+                              start_date=date(2024, 1, 1), ideal_cycle_time_seconds=18))
+        session.commit()
+        for machine, machine_id in (("Inj 5", registry.resolve("Inj 5")), ("inj05", None)):
+            session.add(ReportEntry(report_id=1, date=date(2025, 1, 7), operator="Op1", machine=machine, machine_id=machine_id,
+                                    part_number="P5", shift="1st Shift", planned_production_time_min=60, run_time_min=60,
+                                    downtime_min=0, total_count=40, good_count=40, reject_count=0))
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+
+        inj5 = registry.lookup("INJ05")
+        # The unlinked row is linked during calculation and both aggregate into one metric
+        assert set(session.exec(select(ReportEntry.machine_id).where(ReportEntry.report_id == 1)).all()) == {inj5}
+        metric = session.exec(select(Oeemetric).where(Oeemetric.report_id == 1)).one()
+        assert metric.machine_id == inj5
+        assert round(metric.performance, 4) == 0.4  # 80 parts in 120 min at 36 s, not the assembly rate
+
+def test_update_and_merge_machines(client, engine):
+    with Session(engine) as session:
+        inj5 = MachineRegistry(session).lookup("INJ05")
+        duplicate = MachineRegistry(session).resolve("Press 5")
+        session.commit()
+
+    response = client.put(f"/machines/{inj5}", json={"aliases": ["Assy 5"]})
+    assert response.status_code == 409
+    response = client.put(f"/machines/{inj5}", json={"display_name": "600T Inj 5", "machine_type": "bogus"})
+    assert response.status_code == 400
+
+    response = client.post(f"/machines/{inj5}/merge", json={"source_ids": [duplicate]})
+    assert response.status_code == 200
+    assert "Press 5" in response.json()["aliases"]
+
+    with Session(engine) as session:
+        assert session.get(Machine, duplicate) is None
+        assert MachineRegistry(session).lookup("press5") == inj5
+    names = [m["display_name"] for m in client.get("/machines/").json()]
+    assert "Inj 5" in names
@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import ChangeEvent, Oeemetric, ProductionReport, RateEntry, ReportEntry, WeekVersion
+from app.routers import metrics as metrics_router
+from app.routers.metrics import calculate_report_metrics_logic
+
+def entry(part, day, operator="Op1"):
+    return ReportEntry(report_id=1, date=day, operator=operator, machine="INJ01", part_number=part, shift="1st Shift",
+                       planned_production_time_min=60, run_time_min=60, downtime_min=0,
+                       total_count=80, good_count=80, reject_count=0)
+
+def metrics(session):
+    return {m.part_number: (m.id, m.oee) for m in session.exec(select(Oeemetric)).all()}
+
+def test_recalculation_writes_only_changed_rows(engine):
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P1", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.add(RateEntry(part_number="P2", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.commit()
+        # P1 runs in the week of Jan 6, P2 and P3 in the week of Jan 13
+        session.add_all([entry("P1", date(2025, 1, 7)), entry("P2", date(2025, 1, 14)), entry("P3", date(2025, 1, 14))])
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+        first = metrics(session)
+        assert first["P1"][1] == 0.8
+
+        # Nothing changed: no writes, no event, no stale weeks
+        versions = {v.week_start: v.version for v in session.exec(select(WeekVersion)).all()}
+        calculate_report_metrics_logic(1, session)
+        assert metrics(session) == first
+        assert len(session.exec(select(ChangeEvent)).all()) == 1
+        assert {v.week_start: v.version for v in session.exec(select(WeekVersion)).all()} == versions
+
+        # A rate change updates its row in place; the other week is untouched
+        rate = session.exec(select(RateEntry).where(RateEntry.part_number == "P1")).one()
+        rate.ideal_cycle_time_seconds = 18
+        session.add(rate)
+        p3 = session.exec(select(ReportEntry).where(ReportEntry.part_number == "P3")).one()
+        session.delete(p3)
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+        after = metrics(session)
+        assert after["P1"] == (first["P1"][0], 0.4)
+        assert after["P2"] == first["P2"]
+        assert "P3" not in after
+        assert session.get(WeekVersion, date(2025, 1, 6)).version == versions[date(2025, 1, 6)] + 1
+        assert session.get(WeekVersion, date(2025, 1, 13)).version == versions[date(2025, 1, 13)] + 1
+
+        # The last entries gone: the stored metrics go too
+        for e in session.exec(select(ReportEntry)).all():
+            session.delete(e)
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+        assert metrics(session) == {}
+
+def test_failed_save_rolls_back_and_raises(engine, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("publish failed")
+
+    monkeypatch.setattr(metrics_router, "publish", fail)
+    with Session(engine) as session:
+        session.add(entry("P1", date(2025, 2, 4)))
+        session.commit()
+        versions = {v.week_start: v.version for v in session.exec(select(WeekVersion)).all()}
+        with pytest.raises(RuntimeError):
+            calculate_report_metrics_logic(1, session)
+        # Neither the metric nor the week invalidation was kept
+        assert metrics(session) == {}
+        assert {v.week_start: v.version for v in session.exec(select(WeekVersion)).all()} == versions
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+from datetime import date
+
+from fastapi import BackgroundTasks
+from sqlmodel import Session
+
+from app.db import ProductionReport, ReportEntry
+from app import metrics_export
+from app.metrics_export import RECALC_QUEUED, Histogram, render
+from app.routers import rates
+
+def _sample(text, prefix):
+    line = next(l for l in text.splitlines() if l.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+def test_exposition_has_route_histogram_pool_and_cache(client):
+    client.get("/health")
+    response = client.get("/metrics-export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert "# TYPE oee_http_request_duration_seconds histogram" in text
+    assert _sample(text, 'oee_http_request_duration_seconds_count{method="GET",route="/health",status="200"}') >= 1
+    assert 'oee_db_pool_checked_out{engine="sync"}' in text
+    assert 'oee_cache_hit_ratio{cache="principals"}' in text
+    assert "oee_recalc_queue_depth 0" in text
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("test_hist_seconds", "test", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5):
+        h.observe(v)
+    lines = h.render()
+    assert 'test_hist_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_hist_seconds_bucket{le="1.0"} 2' in lines
+    assert 'test_hist_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_hist_seconds_count 3" in lines
+    metrics_export._metrics.remove(h)
+
+def test_recalc_queue_depth_and_duration(engine, monkeypatch):
+    monkeypatch.setattr(rates, "engine", engine)
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.commit()
+        session.add(ReportEntry(report_id=1, date=date(2025, 1, 1), part_number="P1"))
+        session.commit()
+
+    tasks = BackgroundTasks()
+    depth = RECALC_QUEUED.value()
+    rates.schedule_recalc(tasks, "P1")
+    assert RECALC_QUEUED.value() == depth + 1
+    asyncio.run(tasks())
+    assert RECALC_QUEUED.value() == depth
+    assert "oee_recalc_duration_seconds_count" in render()
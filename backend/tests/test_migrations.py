@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, create_engine, select
+
+from app.db import RunMode, User, RateEntry
+from app.migrations import run_migrations, current_version, latest_version
+
+def test_fresh_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    logs = run_migrations(engine)
+    assert all(line.startswith("APPLIED") for line in logs)
+    assert current_version(engine) == latest_version()
+
+    with Session(engine) as session:
+        names = set(session.exec(select(RunMode.name)).all())
+        assert {"STANDARD", "COMBO_1OP_2PRESS"} <= names
+        assert session.exec(select(User)).first() is not None
+        assert session.exec(select(RateEntry)).first() is not None
+
+    # Second start is a single version check and applies nothing
+    assert run_migrations(engine) == []
+
+def test_upgrades_legacy_schema_without_losing_data(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE productionreport (id INTEGER PRIMARY KEY, filename VARCHAR NOT NULL, uploaded_by INTEGER, uploaded_at DATETIME)"))
+        conn.execute(text("CREATE TABLE reportentry (id INTEGER PRIMARY KEY, report_id INTEGER NOT NULL, date DATE NOT NULL, operator VARCHAR, machine VARCHAR, part_number VARCHAR)"))
+        conn.execute(text("CREATE TABLE rateentry (id INTEGER PRIMARY KEY, part_number VARCHAR, machine VARCHAR, start_date DATE NOT NULL, active BOOLEAN)"))
+        conn.execute(text("CREATE TABLE \"user\" (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL)"))
+        conn.execute(text("CREATE TABLE oeemetric (id INTEGER PRIMARY KEY, report_id INTEGER NOT NULL, date DATE NOT NULL, oee FLOAT, diagnostics_json VARCHAR)"))
+        conn.execute(text("INSERT INTO oeemetric (id, report_id, date, oee, diagnostics_json) VALUES (1, 1, '2024-01-01', 0.5, '{\"good_count\": 90, \"reject_count\": 10, \"run_time_min\": 60}')"))
+        conn.execute(text("INSERT INTO productionreport (id, filename) VALUES (1, 'old.csv')"))
+        conn.execute(text("INSERT INTO reportentry (id, report_id, date, machine, part_number) VALUES (1, 1, '2024-01-01', 'INJ01', 'P1')"))
+        conn.execute(text("INSERT INTO rateentry (id, part_number, machine, start_date, active) VALUES (1, 'P1', 'Inj 1', '2024-01-01', 1)"))
+        conn.execute(text("INSERT INTO \"user\" (id, email, hashed_password) VALUES (1, 'a@b', 'x')"))
+
+    run_migrations(engine)
+    assert current_version(engine) == latest_version()
+
+    insp = inspect(engine)
+    entry_cols = {c["name"] for c in insp.get_columns("reportentry")}
+    assert {"job", "downtime_events", "run_mode_id"} <= entry_cols
+    assert {"cavity_count", "entry_mode", "run_mode_id"} <= {c["name"] for c in insp.get_columns("rateentry")}
+    assert {"role", "shift_scope", "allowed_pages"} <= {c["name"] for c in insp.get_columns("user")}
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT part_number FROM reportentry WHERE id = 1")).scalar() == "P1"
+        # Volumes promoted out of diagnostics_json
+        assert tuple(conn.execute(text("SELECT good_count, reject_count, run_time_min FROM oeemetric WHERE id = 1")).one()) == (90, 10, 60.0)
+        # Existing users/rates mean nothing is seeded
+        assert conn.execute(text("SELECT COUNT(*) FROM \"user\"")).scalar() == 1
+        # Both spellings linked to one registered machine
+        entry_machine = conn.execute(text("SELECT machine_id FROM reportentry WHERE id = 1")).scalar()
+        assert entry_machine is not None
+        assert conn.execute(text("SELECT machine_id FROM rateentry WHERE id = 1")).scalar() == entry_machine
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlmodel import Session
+
+from app.db import ProductionReport, ReportEntry, RateEntry, Oeemetric
+
+# Reaches the async analytics router as well as the sync ones
+pytestmark = pytest.mark.async_db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def rows(engine):
+    with Session(engine) as session:
+        # Same uploaded_at on some reports to exercise the id tiebreaker
+        base = datetime(2025, 1, 1, 6, 0)
+        for i in range(12):
+            session.add(ProductionReport(filename=f"r{i}.csv", uploaded_at=base + timedelta(days=i // 3)))
+        session.commit()
+        for i in range(25):
+            session.add(ReportEntry(report_id=1, date=date(2025, 1, 5), part_number=f"P{i}"))
+            session.add(RateEntry(part_number=f"P{i}", machine="INJ34", start_date=date(2025, 1, 1)))
+            session.add(Oeemetric(report_id=1, date=date(2025, 1, 1) + timedelta(days=i % 5), operator="Op", oee=0.5))
+        session.commit()
+
+def _walk(client, url, params):
+    items, cursor, pages = [], None, 0
+    while True:
+        query = dict(params)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(url, params=query)
+        assert response.status_code == 200
+        items.extend(response.json())
+        pages += 1
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return items, pages
+
+def test_entries_pages_cover_all_rows_in_order(client):
+    items, pages = _walk(client, "/reports/1/entries", {"limit": 10})
+    assert pages == 3
+    ids = [e["id"] for e in items]
+    assert ids == sorted(ids) and len(set(ids)) == 25
+
+def test_entries_unpaginated_by_default(client):
+    response = client.get("/reports/1/entries")
+    assert len(response.json()) == 25
+    assert "x-next-cursor" not in response.headers
+
+def test_reports_newest_first_with_ties(client):
+    items, _ = _walk(client, "/reports/", {"limit": 5})
+    assert len(items) == 12
+    keys = [(r["uploaded_at"], r["id"]) for r in items]
+    assert keys == sorted(keys, reverse=True)
+
+def test_rates_keyset_matches_id_desc(client):
+    items, pages = _walk(client, "/rates/", {"limit": 7})
+    assert pages == 4
+    ids = [r["id"] for r in items]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 25
+
+def test_history_cursor_on_date_and_id(client):
+    items, _ = _walk(client, "/analytics/history", {"limit": 4})
+    assert len(items) == 25
+    keys = [(m["date"], m["id"]) for m in items]
+    assert keys == sorted(keys, reverse=True)
+
+def test_invalid_cursor_rejected(client):
+    response = client.get("/rates/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
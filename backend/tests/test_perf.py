@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.db import User, ProductionReport, ReportEntry
+from app.perf import PerfMiddleware, instrument_engine, perf_summary, reset
+from app.routers.auth import create_access_token, principal_cache, get_password_hash
+
+def _headers(email):
+    token = create_access_token({"sub": email}, expires_delta=timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="module", autouse=True)
+def entries(engine):
+    instrument_engine(engine)
+    principal_cache.clear()
+    with Session(engine) as session:
+        session.add(User(email="admin@test", hashed_password=get_password_hash("x"), role="admin"))
+        session.add(User(email="viewer@test", hashed_password=get_password_hash("x"), role="viewer"))
+        session.add(ProductionReport(filename="r.csv"))
+        session.commit()
+        for i in range(7):
+            session.add(ReportEntry(report_id=1, date=date(2025, 1, 1), part_number=f"P{i}"))
+        session.commit()
+    reset()
+    yield
+    principal_cache.clear()
+
+def _route(summary, label):
+    return next(r for r in summary["routes"] if r["route"] == label)
+
+def test_records_route_template_statements_and_rows(client):
+    for _ in range(3):
+        assert client.get("/reports/1/entries").status_code == 200
+    stats = _route(perf_summary(), "GET /reports/{report_id}/entries")
+    assert stats["total_requests"] == 3
+    assert stats["avg_statements"] == 1
+    assert stats["avg_rows"] == 7
+    assert stats["avg_response_bytes"] > 0
+    assert stats["wall_ms"]["p50"] <= stats["wall_ms"]["p99"]
+
+def test_debug_perf_is_admin_only(client):
+    assert client.get("/debug/perf", headers=_headers("viewer@test")).status_code == 403
+    response = client.get("/debug/perf", headers=_headers("admin@test"))
+    assert response.status_code == 200
+    assert any(r["route"] == "GET /reports/{report_id}/entries" for r in response.json()["routes"])
+
+def test_server_timing_header(engine):
+    mini = FastAPI()
+
+    @mini.get("/count")
+    def count():
+        with Session(engine) as session:
+            return {"n": len(session.exec(select(ReportEntry)).all())}
+
+    response = TestClient(PerfMiddleware(mini, server_timing=True)).get("/count")
+    timing = response.headers["server-timing"]
+    assert "app;dur=" in timing and "db;dur=" in timing
+    assert '1 statements, 7 rows' in timing
+
+def test_event_streams_and_failed_statements(engine):
+    from fastapi.responses import StreamingResponse
+    from sqlalchemy import text
+
+    mini = FastAPI()
+
+    @mini.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["data: x\n\n"]), media_type="text/event-stream")
+
+    @mini.get("/broken")
+    def broken():
+        with Session(engine) as session:
+            session.exec(text("SELECT * FROM no_such_table"))
+
+    reset()
+    perf_client = TestClient(PerfMiddleware(mini), raise_server_exceptions=False)
+    assert perf_client.get("/stream").status_code == 200
+    assert perf_client.get("/broken").status_code == 500
+    assert [r["route"] for r in perf_summary()["routes"]] == ["GET /broken"]
+    with engine.connect() as conn:
+        assert not conn.info.get("perf_started")
@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date, datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import ProductionReport, RateAudit, RateEntry, ReportEntry, RunMode, User
+from app.routers import rates
+
+@pytest.fixture(scope="module")
+def recalculated():
+    """Report id lists handed to the background recalculation, instead of running it."""
+    calls = []
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rates, "run_reports_recalc_background", calls.append)
+        yield calls
+
+@pytest.fixture(scope="module", autouse=True)
+def run_modes(engine, login, recalculated):
+    login()
+    with Session(engine) as session:
+        session.add(RunMode(id=1, name="STANDARD"))
+        session.add(RunMode(id=2, name="AUTOMATION"))
+        session.add(User(id=1, email="mgr@example.com", hashed_password="x", role="manager"))
+        session.commit()
+
+@pytest.fixture(scope="module")
+def upload(client):
+    def upload(csv: str):
+        response = client.post("/rates/upload", files={"file": ("rates.csv", csv, "text/csv")})
+        assert response.status_code == 202, response.text
+        return response.json()
+    return upload
+
+SHEET = (
+    "PartNumber,Workstation,StandardRatePPH,Cavities,RunMode,start_date\n"
+    "P1,INJ01,100,2,,2024-01-01\n"
+    "P1,INJ01,120,2,Automation,2024-01-01\n"
+    "P2,INJ02,,1,,2024-01-01\n"
+)
+
+def test_reupload_updates_in_place_and_recalculates_each_report_once(engine, upload, recalculated):
+    with Session(engine) as session:
+        # One report runs both parts, another only P2
+        session.add(ProductionReport(id=1, filename="a.csv"))
+        session.add(ProductionReport(id=2, filename="b.csv"))
+        for report_id, part in ((1, "P1"), (1, "P2"), (2, "P2")):
+            session.add(ReportEntry(report_id=report_id, date=date(2024, 2, 1), shift="1", operator="Ann Lee",
+                                    machine="INJ01", part_number=part, run_time_min=60, good_count=10))
+        session.commit()
+
+    first = upload(SHEET)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (3, 0, 0)
+    assert first["reports_recalculated"] == 2
+    assert recalculated[-1] == [1, 2]
+
+    # The same sheet again changes nothing
+    again = upload(SHEET)
+    assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 3)
+    assert again["reports_recalculated"] == 0
+    assert len(recalculated) == 1
+
+    # A new rate for P1 under another spelling of its machine updates that row
+    changed = upload(
+        "PartNumber,Workstation,StandardRatePPH,Cavities,start_date\n"
+        "p1,Inj 1,150,2,2024-01-01\n"
+    )
+    assert (changed["inserted"], changed["updated"], changed["unchanged"]) == (0, 1, 0)
+    assert recalculated[-1] == [1]
+
+    with Session(engine) as session:
+        rows = session.exec(select(RateEntry).order_by(RateEntry.id)).all()
+        assert len(rows) == 3
+        standard = rows[0]
+        assert standard.part_number == "P1" and standard.run_mode_id == 1
+        assert standard.ideal_units_per_hour == 150
+        assert standard.ideal_cycle_time_seconds == 24
+        assert rows[1].run_mode_id == 2 and rows[1].ideal_units_per_hour == 120
+        assert rows[2].ideal_cycle_time_seconds is None and rows[2].cavity_count == 1
+        audits = session.exec(select(RateAudit).where(RateAudit.rate_entry_id == standard.id)).all()
+        assert {a.field_name for a in audits} == {"ideal_units_per_hour", "ideal_cycle_time_seconds"}
+
+def test_sheet_repeating_a_key_keeps_the_last_row(engine, upload):
+    result = upload(
+        "PartNumber,Workstation,StandardRatePPH,start_date\n"
+        "P9,INJ09,50,2024-03-01\n"
+        "P9,Inj 9,60,2024-03-01\n"
+    )
+    assert result["inserted"] == 1
+    with Session(engine) as session:
+        rate = session.exec(select(RateEntry).where(RateEntry.part_number == "P9")).one()
+        assert rate.ideal_units_per_hour == 60
+
+def test_sheet_without_start_date_updates_the_current_rate(engine, upload, monkeypatch):
+    sheet = "PartNumber,Workstation,StandardRatePPH\nP7,INJ07,{}\n"
+    upload("PartNumber,Workstation,StandardRatePPH,start_date\nP7,INJ07,70,2022-01-01\nP7,INJ07,80,2023-01-01\n")
+
+    class Later(datetime):
+        @classmethod
+        def today(cls):
+            return cls(2030, 6, 1)
+
+    assert upload(sheet.format(100))["updated"] == 1
+    # A later day: still the same row, not a new one dated that day
+    monkeypatch.setattr(rates, "datetime", Later)
+    result = upload(sheet.format(110))
+    assert (result["inserted"], result["updated"]) == (0, 1)
+    with Session(engine) as session:
+        stored = session.exec(select(RateEntry).where(RateEntry.part_number == "P7").order_by(RateEntry.start_date)).all()
+        assert [(r.start_date, r.ideal_units_per_hour) for r in stored] == [(date(2022, 1, 1), 70), (date(2023, 1, 1), 110)]
+
+    # A part with no rate yet starts today
+    assert upload("PartNumber,Workstation,StandardRatePPH\nP8,INJ08,90\n")["inserted"] == 1
+    with Session(engine) as session:
+        assert session.exec(select(RateEntry.start_date).where(RateEntry.part_number == "P8")).one() == date(2030, 6, 1)
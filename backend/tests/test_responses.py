@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+from datetime import date
+
+import pytest
+from sqlmodel import Session
+
+from app.db import ProductionReport, ReportEntry
+
+
+@pytest.fixture(scope="module", autouse=True)
+def entries(engine):
+    with Session(engine) as session:
+        report = ProductionReport(filename="bulk.csv")
+        session.add(report)
+        session.commit()
+        session.refresh(report)
+        for i in range(200):
+            session.add(ReportEntry(
+                report_id=report.id,
+                date=date(2025, 1, 5),
+                operator=f"Op {i % 7}",
+                machine="INJ34",
+                part_number="P-100",
+                good_count=i,
+                reject_count=1,
+                total_count=i + 1,
+                raw_row_json=json.dumps({"row": i}),
+            ))
+        session.commit()
+
+def test_entries_serialized_with_orjson(client):
+    response = client.get("/reports/1/entries")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 200
+    # Stable ordering and ISO dates, same shape as the old response_model output
+    assert [e["id"] for e in data] == sorted(e["id"] for e in data)
+    assert data[0]["date"] == "2025-01-05"
+    assert data[0]["raw_row_json"] == json.dumps({"row": 0})
+
+def test_large_payload_is_gzipped(client):
+    response = client.get("/reports/1/entries", headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("content-encoding") == "gzip"
+
+def test_small_payload_not_gzipped(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
@@ -2,17 +2,23 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from fastapi.testclient import TestClient
-
-
+import pytest
 from sqlmodel import Session, select
-from app.main import app
-from app.database import get_session, engine
 from app.db import RunMode, RateEntry, ReportEntry
-
-client = TestClient(app)
-
-def test_list_run_modes():
+from app.migrations import run_migrations
+from app.routers import rates as rates_router
+
+@pytest.fixture(scope="module", autouse=True)
+def run_modes(engine, login):
+    # The migrations seed the run modes, as on server startup
+    run_migrations(engine)
+    login()
+    # Creating a rate queues a recalculation on its own session
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rates_router, "engine", engine)
+        yield
+
+def test_list_run_modes(client):
     response = client.get("/rates/run-modes")
     if response.status_code != 200:
         print(f"FAILED: Status {response.status_code}")
@@ -25,7 +31,7 @@ def test_list_run_modes():
     assert "STANDARD" in names
     assert "COMBO_1OP_2PRESS" in names
 
-def test_create_rate_with_run_mode():
+def test_create_rate_with_run_mode(client):
     # 1. Create a Rate with a specific Run Mode
     payload = {
         "job": "TEST-RM-001",
@@ -63,7 +69,7 @@ def test_create_rate_with_run_mode():
     assert rate["run_mode_id"] == 2
     assert rate["part_number"] == "RM-PART-123"
 
-def test_rate_fallback_logic():
+def test_rate_fallback_logic(client):
     # Setup: 
     # Rate A: Standard (ID 1) -> 20s
     # Rate B: Combo (ID 2) -> 30s
@@ -148,33 +154,3 @@ def test_rate_fallback_logic():
     # E. Target Mode 2, Wrong Machine (Strict) -> Should NOT match
     match = match_rate_candidate(candidates, target_mode=2, target_machine_norm="wrong-machine", strict_machine=True)
     assert match is None
-
-
-
-if __name__ == "__main__":
-    try:
-        print("Starting test_list_run_modes...")
-        test_list_run_modes()
-        print("test_list_run_modes PASSED")
-        
-        print("Starting test_create_rate_with_run_mode...")
-        test_create_rate_with_run_mode()
-        print("test_create_rate_with_run_mode PASSED")
-        
-        print("Starting test_rate_fallback_logic...")
-        test_rate_fallback_logic()
-        print("test_rate_fallback_logic PASSED")
-        
-        print("ALL TESTS PASSED")
-    except AssertionError as e:
-        import traceback
-        traceback.print_exc()
-        print(f"TEST FAILED: {e}")
-        exit(1)
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"ERROR: {e}")
-        exit(1)
-
-
@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session, select
+
+from app.db import OperatorSkill, ProductionReport, ReportEntry, RateEntry
+from app.routers.metrics import calculate_report_metrics_logic
+from app.skills import rebuild_skills
+
+def entry(report_id, operator, machine, good, reject=0, run=60):
+    return ReportEntry(report_id=report_id, date=date(2025, 1, 7), operator=operator, machine=machine, part_number="P1",
+                       shift="1st Shift", planned_production_time_min=60, run_time_min=run, downtime_min=60 - run,
+                       total_count=good + reject, good_count=good, reject_count=reject)
+
+@pytest.fixture(scope="module", autouse=True)
+def reports(engine):
+    with Session(engine) as session:
+        session.add(RateEntry(part_number="P1", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.add(ProductionReport(filename="a.csv"))
+        session.add(ProductionReport(filename="b.csv"))
+        session.commit()
+        session.add_all([entry(1, "Alice", "INJ01", 100), entry(1, "Bob", "INJ01", 50, 10, run=50)])
+        session.add_all([entry(2, "Alice", "Inj 1", 90)])
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+        calculate_report_metrics_logic(2, session)
+
+def skills(engine):
+    with Session(engine) as session:
+        return {(s.machine, s.operator): (s.runs, round(s.oee_sum, 6), round(s.quality_sum, 6)) for s in session.exec(select(OperatorSkill)).all()}
+
+def test_recalculation_replaces_contributions(engine):
+    before = skills(engine)
+    assert before[("Inj 1", "Alice")][0] == 2 and before[("Inj 1", "Bob")][0] == 1
+    with Session(engine) as session:
+        calculate_report_metrics_logic(1, session)
+        calculate_report_metrics_logic(1, session)
+    assert skills(engine) == before
+    with Session(engine) as session:
+        assert rebuild_skills(session) == 2
+        session.commit()
+    assert skills(engine) == before
+
+def test_suggest_ranks_in_sql(client):
+    ranked = client.get("/metrics/suggest-operator", params={"machine": "Inj 1", "part": "P1"}).json()
+    assert [r["operator"] for r in ranked] == ["Alice", "Bob"]
+    alice = ranked[0]
+    assert alice["historical_runs"] == 2
+    assert abs(alice["score"] - alice["avg_oee"] * alice["avg_quality"] * 2) < 1e-3
+    # Coded and display names find the same row
+    assert client.get("/metrics/suggest-operator", params={"machine": "INJ01", "part": "P1", "limit": 1}).json() == ranked[:1]
+
+def test_batch_suggestions(client):
+    res = client.post("/metrics/suggest-operators", json={"pairs": [
+        {"machine": "Inj 1", "part": "P1"}, {"machine": "Cmp 3", "part": "P1"}, {"machine": "INJ1", "part": "P1"},
+    ], "limit": 1})
+    body = res.json()
+    assert [b["machine"] for b in body] == ["Inj 1", "Cmp 3", "INJ1"]
+    assert [s["operator"] for s in body[0]["suggestions"]] == ["Alice"]
+    assert body[1]["suggestions"] == [] and body[2]["suggestions"] == body[0]["suggestions"]
+
+def test_report_delete_subtracts(client, engine, login):
+    from app.db import User
+    login(User(id=1, email="a@x", password_hash="x", role="admin"))
+    assert client.delete("/reports/1").status_code == 204
+    assert set(skills(engine)) == {("Inj 1", "Alice")} and skills(engine)[("Inj 1", "Alice")][0] == 1
@@ -0,0 +1,11 @@
+import sys
+import os
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_app_import_does_not_load_pandas():
+    # Fresh interpreter: other tests may already have pandas in sys.modules
+    code = "import sys, app.main; print(sorted(m for m in ('pandas', 'numpy', 'openpyxl') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date, timedelta
+
+import pytest
+from sqlmodel import Session, select
+from sqlalchemy import text
+
+from app.db import ProductionReport, ReportEntry, RateEntry, WeeklySnapshot, WeekVersion
+from app.routers.metrics import calculate_report_metrics_logic
+from app.snapshots import closed_week
+
+# /weekly/ reads through the async engine
+pytestmark = pytest.mark.async_db
+
+WEEK = {"start_date": "2025-01-06", "end_date": "2025-01-12"}
+
+@pytest.fixture(scope="module", autouse=True)
+def report(engine):
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.add(RateEntry(part_number="P1", machine="INJ01", start_date=date(2024, 1, 1), ideal_cycle_time_seconds=36))
+        session.commit()
+        session.add(ReportEntry(report_id=1, date=date(2025, 1, 7), operator="Op1", machine="INJ01", part_number="P1",
+                                shift="1st Shift", planned_production_time_min=60, run_time_min=60, downtime_min=0,
+                                total_count=80, good_count=80, reject_count=0))
+        session.commit()
+        calculate_report_metrics_logic(1, session)
+
+def test_closed_week_detection():
+    assert closed_week(date(2025, 1, 6), date(2025, 1, 12), today=date(2025, 1, 13)) == date(2025, 1, 6)
+    assert closed_week(date(2025, 1, 6), date(2025, 1, 12), today=date(2025, 1, 12)) is None
+    assert closed_week(date(2025, 1, 5), date(2025, 1, 11), today=date(2025, 2, 1)) is None
+
+def test_snapshot_served_until_week_changes(client, engine):
+    first = client.get("/weekly/summary", params=WEEK).json()
+    assert first["overall"]["total_parts"] == 80
+    with Session(engine) as session:
+        assert session.exec(select(WeeklySnapshot)).first().shift == "All"
+
+    # Out-of-band edit without invalidation: the frozen week is not recomputed
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE oeemetric SET oee = 0.1"))
+    assert client.get("/weekly/summary", params=WEEK).json() == first
+
+    # Recalculating a report in that week bumps its version and drops the snapshot
+    with Session(engine) as session:
+        before = session.get(WeekVersion, date(2025, 1, 6)).version
+        calculate_report_metrics_logic(1, session)
+        assert session.get(WeekVersion, date(2025, 1, 6)).version == before + 1
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE oeemetric SET oee = 0.25"))
+    assert client.get("/weekly/summary", params=WEEK).json()["overall"]["simple_oee"] == 0.25
+
+def test_shift_snapshots_are_separate(client, engine):
+    client.get("/weekly/summary", params={**WEEK, "shift": "2nd Shift"})
+    with Session(engine) as session:
+        shifts = set(session.exec(select(WeeklySnapshot.shift)).all())
+    assert {"All", "2nd Shift"} <= shifts
+
+def test_open_week_is_not_snapshotted(client, engine):
+    monday = date.today() - timedelta(days=date.today().weekday())
+    client.get("/weekly/summary", params={"start_date": monday.isoformat(), "end_date": (monday + timedelta(days=6)).isoformat()})
+    with Session(engine) as session:
+        assert session.exec(select(WeeklySnapshot).where(WeeklySnapshot.week_start == monday)).first() is None
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date
+
+import pytest
+from sqlmodel import Session
+
+from app.db import ProductionReport, Oeemetric
+
+# /weekly/ reads through the async engine
+pytestmark = pytest.mark.async_db
+
+def _metric(day, operator, oee, good, shift="1st Shift"):
+    return Oeemetric(report_id=1, date=day, operator=operator, shift=shift, oee=oee,
+                     good_count=good, reject_count=0, run_time_min=60)
+
+@pytest.fixture(scope="module", autouse=True)
+def metrics(engine):
+    with Session(engine) as session:
+        session.add(ProductionReport(filename="r.csv"))
+        session.commit()
+        # ISO week 2025-W02 (Mon 6 Jan) and 2025-W03 (Mon 13 Jan)
+        session.add(_metric(date(2025, 1, 6), "Op1", 1.0, 1))
+        session.add(_metric(date(2025, 1, 7), "Op1", 0.5, 1000))
+        session.add(_metric(date(2025, 1, 14), "Op2", 0.8, 100))
+        session.add(_metric(date(2025, 1, 14), "Op1", 0.4, 100, shift="2nd Shift"))
+        session.commit()
+
+def test_weeks_operators_and_days_weighted_in_sql(client):
+    data = client.get("/weekly/trend", params={"end_date": "2025-01-19", "weeks": 3}).json()
+    assert data["start_date"] == "2024-12-30"
+    weeks = {w["week"]: w for w in data["weeks"]}
+    assert set(weeks) == {"2025-W02", "2025-W03"}
+    # (1*1 + 0.5*1000) / 1001, not the simple mean of 0.75
+    assert abs(weeks["2025-W02"]["weighted_oee"] - 0.5005) < 0.001
+    assert weeks["2025-W02"]["simple_oee"] == 0.75
+    assert weeks["2025-W03"]["week_start"] == "2025-01-13"
+
+    op1 = next(o for o in data["operators"] if o["operator"] == "Op1")
+    assert [w["week"] for w in op1["weeks"]] == ["2025-W02", "2025-W03"]
+    assert op1["total_parts"] == 1101
+    assert [d["date"] for d in data["daily_trend"]] == ["2025-01-06", "2025-01-07", "2025-01-14"]
+    assert data["overall"]["count"] == 4
+
+def test_shift_filter(client):
+    data = client.get("/weekly/trend", params={"start_date": "2025-01-01", "end_date": "2025-01-31", "shift": "2nd Shift"}).json()
+    assert data["overall"]["count"] == 1
+    assert data["operators"][0]["operator"] == "Op1"
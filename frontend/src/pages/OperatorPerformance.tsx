@@ -162,6 +162,12 @@ const OperatorPerformance: React.FC = () => {
                                                     <Text>{(val * 100).toFixed(1)}%</Text>
                                                 </div>
                                             )
+                                        },
+                                        {
+                                            title: 'Weighted OEE',
+                                            dataIndex: 'weighted_oee',
+                                            key: 'weighted_oee',
+                                            render: (val: number) => <Text>{(val * 100).toFixed(1)}%</Text>
                                         }
                                     ]}
                                 />
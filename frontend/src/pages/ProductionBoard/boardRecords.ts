@@ -0,0 +1,122 @@
+import { BoardChange, BoardRecord } from '../../services/api';
+import { ProductionBoardState, DEFAULT_BOARD_STATE, ProductionMachine } from './types';
+
+// Board state is stored server-side as small records (see backend/app/routers/board.py):
+//   board/main                  { currentShift, categoryOrder }
+//   category/<id>               { name, machineOrder }
+//   machine/<id>                { name, status, notes, part, sinceTime }
+//   machine_shift/<id>:<shift>  { operator }
+//   notes/<shift>               ShiftNotes
+// Saving diffs the new state against the last known records, so each save only
+// sends the records that actually changed, with the version they were based on.
+
+export type RecordMap = Map<string, BoardRecord>;
+
+export const recordId = (kind: string, key: string) => `${kind}/${key}`;
+
+const MACHINE_FIELDS = ['name', 'status', 'notes', 'part', 'sinceTime'] as const;
+
+export const mergeRecords = (known: RecordMap, records: BoardRecord[]): RecordMap => {
+    const next = new Map(known);
+    records.forEach(r => {
+        const id = recordId(r.kind, r.key);
+        if (r.deleted) next.delete(id);
+        else next.set(id, r);
+    });
+    return next;
+};
+
+export const recordsToState = (known: RecordMap): ProductionBoardState => {
+    const board = known.get(recordId('board', 'main'));
+    if (!board) return DEFAULT_BOARD_STATE;
+
+    const currentShift = board.data.currentShift || '1st Shift';
+    const shiftOperators: Record<string, Record<string, string>> = {};
+    known.forEach(r => {
+        if (r.kind !== 'machine_shift') return;
+        const split = r.key.lastIndexOf(':');
+        const machineId = r.key.slice(0, split);
+        (shiftOperators[machineId] = shiftOperators[machineId] || {})[r.key.slice(split + 1)] = r.data.operator;
+    });
+
+    const categories = (board.data.categoryOrder || [])
+        .map((catId: string) => known.get(recordId('category', catId)))
+        .filter(Boolean)
+        .map((cat: BoardRecord) => ({
+            id: cat.key,
+            name: cat.data.name,
+            machines: (cat.data.machineOrder || [])
+                .map((macId: string) => known.get(recordId('machine', macId)))
+                .filter(Boolean)
+                .map((mac: BoardRecord): ProductionMachine => ({
+                    id: mac.key,
+                    ...mac.data,
+                    name: mac.data.name,
+                    status: mac.data.status,
+                    shiftOperators: shiftOperators[mac.key] || {},
+                    operator: shiftOperators[mac.key]?.[currentShift],
+                })),
+        }));
+
+    const notes = known.get(recordId('notes', currentShift));
+    return {
+        categories,
+        shiftNotes: { ...DEFAULT_BOARD_STATE.shiftNotes, ...(notes?.data || {}) },
+        currentShift,
+        lastUpdated: new Date().toISOString(),
+    };
+};
+
+const stateToRecords = (state: ProductionBoardState): Map<string, { kind: BoardRecord['kind']; key: string; data: Record<string, any> }> => {
+    const out = new Map();
+    const put = (kind: BoardRecord['kind'], key: string, data: Record<string, any>) => {
+        out.set(recordId(kind, key), { kind, key, data });
+    };
+    put('board', 'main', { currentShift: state.currentShift, categoryOrder: state.categories.map(c => c.id) });
+    state.categories.forEach(cat => {
+        put('category', cat.id, { name: cat.name, machineOrder: cat.machines.map(m => m.id) });
+        cat.machines.forEach(mac => {
+            const data: Record<string, any> = {};
+            MACHINE_FIELDS.forEach(f => {
+                if (mac[f] !== undefined) data[f] = mac[f];
+            });
+            put('machine', mac.id, data);
+            Object.entries(mac.shiftOperators || {}).forEach(([shift, operator]) => {
+                if (operator) put('machine_shift', `${mac.id}:${shift}`, { operator });
+            });
+        });
+    });
+    put('notes', state.currentShift, state.shiftNotes);
+    return out;
+};
+
+export const diffState = (known: RecordMap, state: ProductionBoardState): BoardChange[] => {
+    const next = stateToRecords(state);
+    const changes: BoardChange[] = [];
+
+    next.forEach(({ kind, key, data }, id) => {
+        const current = known.get(id);
+        if (!current) {
+            // Don't create empty notes just because a shift was viewed
+            if (kind === 'notes' && Object.values(data).every(v => !v)) return;
+            changes.push({ kind, key, data });
+            return;
+        }
+        const patch: Record<string, any> = {};
+        Object.entries(data).forEach(([field, value]) => {
+            if (JSON.stringify(current.data[field]) !== JSON.stringify(value)) patch[field] = value;
+        });
+        Object.keys(current.data).forEach(field => {
+            if (!(field in data)) patch[field] = null;
+        });
+        if (Object.keys(patch).length) changes.push({ kind, key, version: current.version, data: patch });
+    });
+
+    // Only the current shift's notes are part of the state, so other shifts' notes are kept
+    known.forEach((record, id) => {
+        if (record.kind !== 'notes' && !next.has(id)) {
+            changes.push({ kind: record.kind, key: record.key, version: record.version, delete: true });
+        }
+    });
+    return changes;
+};
@@ -1,9 +1,9 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { message } from 'antd';
-import api from '../../services/api';
+import api, { boardService, BoardRecord } from '../../services/api';
 import { ProductionBoardState, DEFAULT_BOARD_STATE, MachineStatus, ProductionCategory, ShiftNotes, ProductionMachine } from './types';
-
-const SETTING_KEY = 'production_board_state';
+import { RecordMap, diffState, mergeRecords, recordId, recordsToState } from './boardRecords';
+import { subscribeChangeEvents } from '../../services/events';
 
 export const useBoardState = () => {
     const [state, setState] = useState<ProductionBoardState | null>(null);
@@ -19,41 +19,24 @@ export const useBoardState = () => {
     const [machinePartsHistory, setMachinePartsHistory] = useState<Record<string, string[]>>({});
     const [manualAllowedParts, setManualAllowedParts] = useState<Record<string, string[]>>({});
 
+    // Last records seen from the server; saves are diffed against these
+    const knownRef = useRef<RecordMap>(new Map());
+    const revisionRef = useRef<number>(0);
+
+    const applyRecords = (revision: number, records: BoardRecord[], replace = false) => {
+        knownRef.current = mergeRecords(replace ? new Map() : knownRef.current, records);
+        revisionRef.current = Math.max(revisionRef.current, revision);
+        setState(recordsToState(knownRef.current));
+    };
+
     const fetchState = useCallback(async () => {
         setLoading(true);
         try {
-            // Fetch Board State
-            const stateResponse = await api.get(`/settings/${SETTING_KEY}`).catch(() => null);
-            if (stateResponse && stateResponse.data && stateResponse.data.value) {
-                const loaded = JSON.parse(stateResponse.data.value);
-                // Migrate: rename 'Day Shift' → '1st Shift'
-                if (loaded.currentShift === 'Day Shift') {
-                    loaded.currentShift = '1st Shift';
-                }
-                // Migrate old operator field → shiftOperators
-                if (loaded.categories) {
-                    loaded.categories = loaded.categories.map((cat: any) => ({
-                        ...cat,
-                        machines: cat.machines.map((mac: any) => {
-                            if (!mac.shiftOperators) {
-                                mac.shiftOperators = {};
-                                if (mac.operator) {
-                                    // Assign old operator to current shift
-                                    mac.shiftOperators[loaded.currentShift || '1st Shift'] = mac.operator;
-                                }
-                            }
-                            // Also migrate any 'Day Shift' key
-                            if (mac.shiftOperators['Day Shift']) {
-                                mac.shiftOperators['1st Shift'] = mac.shiftOperators['1st Shift'] || mac.shiftOperators['Day Shift'];
-                                delete mac.shiftOperators['Day Shift'];
-                            }
-                            // Set operator to current shift's value for UI
-                            mac.operator = mac.shiftOperators[loaded.currentShift || '1st Shift'];
-                            return mac;
-                        })
-                    }));
-                }
-                setState(loaded);
+            // Fetch Board State (legacy single-setting boards are imported by the server migration)
+            const board = await boardService.get().catch(() => null);
+            if (board) {
+                revisionRef.current = 0;
+                applyRecords(board.revision, board.records, true);
             } else {
                 setState(DEFAULT_BOARD_STATE);
             }
@@ -108,28 +91,49 @@ export const useBoardState = () => {
 
     useEffect(() => {
         fetchState();
-        // Option to poll every X seconds could go here for "real-time"
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, []);
+
+    // Live updates: pull only the records other users changed
+    useEffect(() => {
+        const refreshPartsHistory = () => {
+            api.get('/metrics/machine-parts-history')
+                .then(res => res.data && setMachinePartsHistory(res.data))
+                .catch(() => undefined);
+        };
+        return subscribeChangeEvents({
+            board: (data) => {
+                if (data.revision <= revisionRef.current) return;
+                boardService.get(revisionRef.current)
+                    .then(latest => applyRecords(latest.revision, latest.records))
+                    .catch(() => undefined);
+            },
+            report_calculated: refreshPartsHistory,
+            report_deleted: refreshPartsHistory,
+            resync: () => fetchState(),
+        });
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, []);
 
     const saveState = async (newState: ProductionBoardState) => {
+        const changes = diffState(knownRef.current, newState);
         setState(newState); // Optimistic update
+        if (!changes.length) return;
         setSaving(true);
         try {
-            // Include automatic lastUpdated timestamp
-            const stateToSave = {
-                ...newState,
-                lastUpdated: new Date().toISOString()
-            };
-            await api.put(`/settings/${SETTING_KEY}`, {
-                value: JSON.stringify(stateToSave),
-                description: 'State for the Production Status Board'
-            });
-            // Update local state with the new timestamp silently
-            setState(stateToSave);
-        } catch (error) {
-            message.error('Failed to save board state');
-            console.error(error);
+            // Response carries everything changed since our revision, including other supervisors' edits
+            const result = await boardService.patch(changes, revisionRef.current);
+            applyRecords(result.revision, result.records);
+        } catch (error: any) {
+            if (error?.response?.status === 409) {
+                message.warning('The board was changed by someone else - reloaded the latest version');
+            } else {
+                message.error('Failed to save board state');
+                console.error(error);
+            }
+            const latest = await boardService.get(revisionRef.current).catch(() => null);
+            if (latest) applyRecords(latest.revision, latest.records);
+            else setState(recordsToState(knownRef.current));
         } finally {
             setSaving(false);
         }
@@ -189,7 +193,10 @@ export const useBoardState = () => {
                 operator: mac.shiftOperators?.[shift]
             }))
         }));
-        saveState({ ...state, currentShift: shift, categories: updatedCategories });
+        // Shift notes are kept per shift; show the new shift's own notes
+        const notes = knownRef.current.get(recordId('notes', shift));
+        const shiftNotes = { ...DEFAULT_BOARD_STATE.shiftNotes, ...(notes?.data || {}) };
+        saveState({ ...state, currentShift: shift, categories: updatedCategories, shiftNotes });
     };
 
     // Clear all operators for a category (current shift only, keep parts)
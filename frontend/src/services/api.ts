@@ -79,6 +79,11 @@ export const rateService = {
         const response = await api.get('/rates', { params: { limit } });
         return response.data;
     },
+    // Keyset-paginated fetch for lazy loading; pass back nextCursor to continue
+    getRatesPage: async (cursor?: string | null, limit: number = 200) => {
+        const response = await api.get('/rates', { params: { limit, cursor: cursor || undefined } });
+        return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    },
     createRate: async (data: any) => {
         const response = await api.post('/rates/', data);
         return response.data;
@@ -140,6 +145,10 @@ export const reportService = {
         const response = await api.get('/reports/');
         return response.data;
     },
+    getReportsPage: async (cursor?: string | null, limit: number = 50) => {
+        const response = await api.get('/reports/', { params: { limit, cursor: cursor || undefined } });
+        return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    },
     updateReport: async (id: number, filename: string) => {
         const response = await api.put(`/reports/${id}`, { filename });
         return response.data;
@@ -185,6 +194,48 @@ export const settingsService = {
     }
 };
 
+export interface BoardRecord {
+    kind: 'board' | 'category' | 'machine' | 'machine_shift' | 'notes';
+    key: string;
+    version: number;
+    revision: number;
+    deleted: boolean;
+    data: Record<string, any>;
+    updated_by?: string;
+}
+
+export interface BoardChange {
+    kind: BoardRecord['kind'];
+    key: string;
+    version?: number;  // version the edit is based on; omit to create
+    data?: Record<string, any>;  // fields to set; null removes a field
+    delete?: boolean;
+}
+
+export interface BoardResponse {
+    revision: number;
+    records: BoardRecord[];
+}
+
+export const boardService = {
+    get: async (since?: number) => {
+        const response = await api.get<BoardResponse>('/board/', { params: { since } });
+        return response.data;
+    },
+    patch: async (changes: BoardChange[], since?: number) => {
+        const response = await api.patch<BoardResponse>('/board/', { changes, since });
+        return response.data;
+    }
+};
+
+export const metricsService = {
+    // Ranked operators for many board machine/part pairs in one request
+    suggestOperators: async (pairs: { machine: string; part: string }[], limit?: number) => {
+        const response = await api.post('/metrics/suggest-operators', { pairs, limit });
+        return response.data as { machine: string; part: string; suggestions: any[] }[];
+    }
+};
+
 export const analyticsService = {
     getComparison: async (groupBy: string = 'shift', startDate?: string, endDate?: string, shifts?: string[]) => {
         const response = await api.get('/analytics/compare', {
@@ -197,10 +248,11 @@ export const analyticsService = {
         });
         return response.data;
     },
-    getQualityAnalysis: async (limit: number = 10, startDate?: string, endDate?: string, shifts?: string[]) => {
+    getQualityAnalysis: async (limit: number = 10, startDate?: string, endDate?: string, shifts?: string[], groupBy: string = 'part') => {
         const response = await api.get('/analytics/quality', {
             params: {
                 limit,
+                group_by: groupBy,
                 start_date: startDate,
                 end_date: endDate,
                 shifts: shifts && shifts.length > 0 ? shifts : undefined
@@ -252,6 +304,16 @@ export const analyticsService = {
             }
         });
         return response.data;
+    },
+    getWeeklyTrend: async (weeks: number = 26, endDate?: string, shift: string = 'All') => {
+        const response = await api.get('/weekly/trend', {
+            params: {
+                weeks,
+                end_date: endDate,
+                shift
+            }
+        });
+        return response.data;
     }
 
 };
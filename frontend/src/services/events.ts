@@ -0,0 +1,14 @@
+import api from './api';
+
+// Server-sent change events from /events/. Each event only says what changed;
+// handlers re-fetch the affected data. EventSource reconnects on its own and
+// the server replays anything missed (or sends `resync`).
+export type ChangeEventType = 'board' | 'report_calculated' | 'report_deleted' | 'rates_changed' | 'resync';
+
+export const subscribeChangeEvents = (handlers: Partial<Record<ChangeEventType, (data: any) => void>>) => {
+    const source = new EventSource(`${api.defaults.baseURL}/events/`);
+    Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, (event) => handler?.(JSON.parse((event as MessageEvent).data)));
+    });
+    return () => source.close();
+};